@@ -4,97 +4,55 @@ CineGen AI - Backend Flask CORRIGIDO
 ✅ Todas as queries usando graph_table
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import oracledb
-import oci
-from langchain_community.chat_models import ChatOCIGenAI
-from langchain_core.messages import HumanMessage
-import numpy as np
 import json
+import base64
+import io
 from datetime import datetime
+import time
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from db import get_db_connection, pool_stats
+import repository
+from repository import repository_stats
+from genai import (stream_llm_response, generate_embedding, get_cached_llm_response, LLMCacheLookup,
+                   embedding_cache, llm_cache)
+from vector_index import VECTOR_BACKENDS, VECTOR_CONFIG, resolve_backend, search_vectors
+from graph_engine import (graph_engine_enabled, get_cowatch_graph, record_watch, rank_neighbors,
+                          sql_customer_overlap)
+import item_similarity
+from media_assets import media_assets
+from response_cache import response_cache
+from customer_profile import profile_cache
+from network_expansion import (NETWORK_CONFIG, MemoryGraphSource, SQLGraphSource, expand_network,
+                               level_to_3d, network_stats)
+from watch_ingest import INGEST_CONFIG, FORMATS, detect_format, iter_events, ingest
+from customer_ids import CUSTOMER_ID_CONFIG, allocator, validate_customer, insert_customer, import_customers
+from watch_buffer import write_behind_enabled, get_watch_buffer, watch_buffer_stats
+from hybrid_search import SIGNALS, FUSION_METHODS, HYBRID_CONFIG, hybrid_search
+from text_index import lexical_search, text_index_stats
+import metrics
+from capabilities import capabilities
+from movie_catalog import SORTS, loaded_catalog, movie_catalog_stats
 
 app = Flask(__name__)
 CORS(app)
 
-# ==================== CONFIGURAÇÃO ====================
-try:
-    oracledb.init_oracle_client()
-    print("✓ Oracle Thick Mode habilitado")
-except Exception as e:
-    print(f"⚠️  Thick mode não disponível: {e}")
-
-CONFIG_PROFILE = "DEFAULT"
-try:
-    config = oci.config.from_file('~/.oci/config', CONFIG_PROFILE)
-    compartment_id = os.getenv('OCI_COMPARTMENT_ID', '')
-    model_id = os.getenv('OCI_MODEL_ID', '')
-    print("✓ OCI Config carregado")
-except Exception as e:
-    print(f"⚠️  Erro ao carregar OCI config: {e}")
-    config = None
-    compartment_id = ''
-    model_id = ''
-
-DB_CONFIG = {
-    'user': os.getenv('DB_USER', ''),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'dsn': os.getenv('DB_DSN', '')
-}
-
-SCHEMA = ''  # Schema do Property Graph
-GRAPH_NAME = f'{SCHEMA}.movie_graph'  # Nome completo do grafo
-
-def get_db_connection():
-    try:
-        return oracledb.connect(**DB_CONFIG)
-    except Exception as e:
-        print(f"❌ Erro ao conectar ao banco: {e}")
-        raise
-
-
-def get_llm_response(prompt_text, temperature=0.7, max_tokens=300):
-    chat = ChatOCIGenAI(
-        model_id=model_id,
-        service_endpoint="",
-        compartment_id=compartment_id,
-        provider="meta",
-        model_kwargs={
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "frequency_penalty": 0,
-            "presence_penalty": 0,
-            "top_p": 0.75
-        },
-        auth_profile=CONFIG_PROFILE
-    )
-    messages = [HumanMessage(content=prompt_text)]
-    response = chat.invoke(messages)
-    return response.content
 
+@app.before_request
+def start_request_metrics():
+    # Regra da rota ('/api/customers/<int:customer_id>'), não a URL: cardinalidade fixa
+    metrics.begin_request(request.url_rule.rule if request.url_rule else 'unmatched', request.method)
 
-def generate_embedding(text):
-    try:
-        generative_ai_inference_client = oci.generative_ai_inference.GenerativeAiInferenceClient(
-            config=config,
-            service_endpoint="",
-            retry_strategy=oci.retry.NoneRetryStrategy(),
-            timeout=(10, 240)
-        )
-        embed_text_detail = oci.generative_ai_inference.models.EmbedTextDetails()
-        embed_text_detail.serving_mode = oci.generative_ai_inference.models.OnDemandServingMode(
-            model_id=""
-        )
-        embed_text_detail.inputs = [text]
-        embed_text_detail.truncate = "END"
-        embed_text_detail.compartment_id = compartment_id
-        embed_text_response = generative_ai_inference_client.embed_text(embed_text_detail)
-        return embed_text_response.data.embeddings[0]
-    except Exception as e:
-        print(f"Erro ao gerar embedding: {e}")
-        return np.random.rand(1024).tolist()
+
+@app.after_request
+def finish_request_metrics(response):
+    return metrics.finish_request(response)
 
 
 def parse_genres(genres_data):
@@ -117,104 +75,353 @@ def to_iso(value):
         return str(value)
 
 
+def fetch_movies_by_ids(cursor, movie_ids):
+    """Hidrata MOVIES (catálogo em memória ou uma query) + poster (cache de MEDIA_ASSETS) de uma lista de ids"""
+    if not movie_ids:
+        return {}
+    catalog = loaded_catalog()
+    if catalog is not None:
+        rows = [(m['id'], m['title'], m['summary'], m['genres'], m['rating'])
+                for m in catalog.hydrate(movie_ids).values()]
+    else:
+        rows = repository.fetch_all(cursor, 'movies.by_ids', ids=movie_ids)
+    assets = media_assets.resolve(cursor, [row[0] for row in rows])
+    return {row[0]: tuple(row) + (assets.get(row[0], {}).get('poster_url'),) for row in rows}
+
+
+def memory_graph_recommendations(cursor, customer_id, limit):
+    """
+    Recomendações do grafo em memória no formato de graph_recommendations
+    (movie_id, title, summary, rating, genres, similar_users) + posters por id.
+    Devolve (None, None) se o motor estiver desligado ou indisponível.
+    """
+    if not graph_engine_enabled():
+        return None, None
+    try:
+        with metrics.stage('graph_rank', 'memory'):
+            ranked = get_cowatch_graph().recommend(customer_id, limit=limit)
+    except Exception as e:
+        print(f"⚠️  Grafo em memória indisponível, usando PGQL: {e}")
+        return None, None
+    metrics.set_path('memory')
+
+    movies = fetch_movies_by_ids(cursor, [movie_id for movie_id, _ in ranked])
+    rows = []
+    posters = {}
+    for movie_id, similar_users in ranked:
+        movie = movies.get(movie_id)
+        if movie is None:
+            continue
+        rows.append((movie[0], movie[1], movie[2], movie[4], movie[3], similar_users))
+        posters[movie_id] = movie[5]
+    return rows, posters
+
+
+def attach_genres(cursor, rows):
+    """Linhas dos statements recommendations.* com GENRES (catálogo em memória ou uma query) antes de similar_users"""
+    movie_ids = [row[0] for row in rows]
+    catalog = loaded_catalog()
+    if catalog is not None:
+        genres = {movie_id: movie['genres'] for movie_id, movie in catalog.hydrate(movie_ids).items()}
+    else:
+        genres = {row[0]: row[2] for row in repository.fetch_all(cursor, 'movies.labels_by_ids', ids=movie_ids)}
+    return [(*row[:4], genres.get(row[0]), row[4]) for row in rows]
+
+
+def graph_recommendations(cursor, customer_id, limit):
+    """
+    (linhas, posters por id, método) de co-visualização: grafo em memória, PGQL
+    (se o probe achou o Property Graph) ou SQL relacional, com as linhas sempre em
+    (movie_id, title, summary, rating, genres, similar_users)
+    """
+    rows, posters = memory_graph_recommendations(cursor, customer_id, limit)
+    if rows is not None:
+        return rows, posters, 'in_memory_graph'
+
+    method = 'property_graph_pgql'
+    if capabilities.use('graph', cursor):
+        # O MATCH não exclui o que o cliente já assistiu: busca o dobro e filtra pelo perfil
+        profile = profile_cache.get(customer_id, cursor)
+        watched_movies = set(profile.watched_ids.tolist()) if profile else set()
+        try:
+            metrics.set_path('pgql')
+            candidates = repository.fetch_all(cursor, 'recommendations.pgql',
+                                              {'cust_id': customer_id, 'limit': limit * 2}, rows=limit * 2)
+            rows = [row for row in candidates if row[0] not in watched_movies][:limit]
+            capabilities.succeeded('graph')
+        except Exception as pgql_error:
+            print(f"⚠️  Erro PGQL, usando fallback SQL: {pgql_error}")
+            capabilities.failed('graph', pgql_error)
+
+    if rows is None:
+        # SQL tradicional: sem Property Graph (probe) ou com o circuito aberto
+        metrics.set_path('fallback')
+        method = 'sql_fallback'
+        rows = repository.fetch_all(cursor, 'recommendations.sql', {'cust_id': customer_id, 'limit': limit},
+                                    rows=limit)
+    rows = attach_genres(cursor, rows)
+
+    # Posters em lote (depois do GRAPH_TABLE / SQL)
+    assets = media_assets.resolve(cursor, [row[0] for row in rows])
+    return rows, {movie_id: asset.get('poster_url') for movie_id, asset in assets.items()}, method
+
+
+def invalidate_customer_responses(customer_id, movie_id=None):
+    """Derruba as respostas e o snapshot de perfil que dependem do cliente (e do filme) alterado"""
+    profile_cache.invalidate(customer_id)
+    tags = ['customers', f'customer:{customer_id}']
+    if movie_id is not None:
+        tags.append(f'movie:{movie_id}')
+    response_cache.invalidate(*tags)
+
+
+def movie_tags(view_args, payload):
+    return [f"movie:{movie['id']}" for movie in payload.get('data', [])]
+
+
+def network_tags(view_args, payload):
+    # Nós 'c101' / 'm42': qualquer visualização de um deles muda a rede
+    return [('customer:' if node['id'][0] == 'c' else 'movie:') + node['id'][1:] for node in payload.get('nodes', [])]
+
+
+def after_watch(customer_id, movie_id):
+    """Propaga uma visualização recém-commitada para as estruturas em memória"""
+    after_watches([(customer_id, movie_id)])
+
+
+def invalidate_watch_responses(pairs):
+    """Derruba snapshots de perfil e respostas dos clientes/filmes de um lote de visualizações"""
+    customers = sorted({customer_id for customer_id, _ in pairs})
+    movies = sorted({movie_id for _, movie_id in pairs})
+    for customer_id in customers:
+        profile_cache.invalidate(customer_id)
+    response_cache.invalidate('customers', *[f'customer:{c}' for c in customers], *[f'movie:{m}' for m in movies])
+
+
+def after_watches(pairs):
+    """Mesma propagação para um lote: uma invalidação de cache com todas as tags"""
+    invalidate_watch_responses(pairs)
+    try:
+        for customer_id, movie_id in pairs:
+            record_watch(customer_id, movie_id)
+            item_similarity.record_watch(customer_id, movie_id)
+    except Exception as e:
+        print(f"⚠️  Erro ao atualizar estruturas em memória: {e}")
+
+
+def customer_neighbors(cursor, customer_id, k, metric='jaccard'):
+    """[(cust_id, nome, score, filmes em comum)]: matriz em memória ou a mesma conta no banco"""
+    if graph_engine_enabled():
+        ranked = get_cowatch_graph().similar_customers(customer_id, k, metric)
+    else:
+        ranked = rank_neighbors(*sql_customer_overlap(cursor, customer_id), k=k, metric=metric)
+    if not ranked:
+        return []
+    names = repository.fetch_value_map(cursor, 'customers.names_by_ids', ids=[cust_id for cust_id, _, _ in ranked])
+    return [(cust_id, names.get(cust_id, f'Cliente {cust_id}'), score, common) for cust_id, score, common in ranked]
+
+
+def watch_pairs(events):
+    return [(e['cust_id'], e['movie_id']) for e in events]
+
+
+def watch_buffer():
+    """Buffer de write-behind; na primeira chamada reaplica o log e sobe o worker"""
+    # Pendentes só invalidam caches (o perfil mostra o overlay do buffer); grafo e
+    # similaridade recebem a aresta no flush, e só as que o banco aceitou. Rejeitadas
+    # invalidam de novo o que foi montado com elas enquanto estavam pendentes
+    return get_watch_buffer(
+        on_flush=lambda events: after_watches(watch_pairs(events)),
+        on_replay=lambda events: invalidate_watch_responses(watch_pairs(events)),
+        on_reject=lambda events: invalidate_watch_responses(watch_pairs(events))
+    )
+
+
+def movie_exists(movie_id):
+    """Filme no catálogo em memória; fora dele (filme novo ou sem catálogo) confere no banco"""
+    catalog = loaded_catalog()
+    if catalog is not None and catalog.positions([movie_id])[0] >= 0:
+        return True
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        return repository.fetch_one(cursor, 'movies.labels_by_ids', ids=[movie_id]) is not None
+
+
+def encode_cursor(after, scope):
+    """
+    Token opaco de continuação + busca/filtros a que pertence. 'after' é o último
+    MOVIE_ID da página no catálogo ou a posição no ranking numa busca ou ordenação.
+    """
+    raw = json.dumps({'after': int(after), 'search': scope}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, scope):
+    if not token:
+        return 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        after_id = int(data['after'])
+    except Exception:
+        raise ValueError('cursor inválido')
+    if data.get('search', '') != scope:
+        raise ValueError('cursor pertence a outra busca')
+    return after_id
+
+
+def cursor_scope(search_query, sort, filters):
+    """Só a busca no catálogo por MOVIE_ID (tokens antigos continuam valendo); senão busca + ordem + filtros"""
+    if sort == 'id' and not filters:
+        return search_query
+    return json.dumps({'search': search_query, 'sort': sort, **filters}, sort_keys=True, separators=(',', ':'))
+
+
+def movie_filters(args):
+    """genre / min_rating / year da query string, só os informados"""
+    filters = {}
+    if args.get('genre'):
+        filters['genre'] = args['genre'].strip()
+    if args.get('min_rating'):
+        filters['min_rating'] = float(args['min_rating'])
+    if args.get('year'):
+        filters['year'] = int(args['year'])
+    return filters
+
+
+def movie_watch_counts(cursor, movie_ids):
+    """Contagens pré-agregadas: grau no grafo em memória ou um único GROUP BY para a página"""
+    if not movie_ids:
+        return {}
+    if graph_engine_enabled():
+        return get_cowatch_graph().watch_counts(movie_ids)
+    catalog = loaded_catalog()
+    if catalog is not None:
+        # Contagens da última carga/refresh do catálogo (atraso de até MOVIE_CATALOG_REFRESH_SECONDS)
+        return catalog.counts(movie_ids)
+    return repository.fetch_value_map(cursor, 'movies.watch_counts', ids=movie_ids)
+
+
+MOVIES_TOTAL_TTL_SECONDS = int(os.getenv('MOVIES_TOTAL_TTL_SECONDS', 300))
+_movies_total_cache = {}
+
+
+def count_movies(cursor):
+    """COUNT(*) do catálogo, reaproveitado por MOVIES_TOTAL_TTL_SECONDS"""
+    catalog = loaded_catalog()
+    if catalog is not None:
+        return len(catalog)
+    cached = _movies_total_cache.get('catalog')
+    if cached and time.time() - cached[1] < MOVIES_TOTAL_TTL_SECONDS:
+        return cached[0]
+    total = repository.fetch_scalar(cursor, 'movies.count')
+    _movies_total_cache['catalog'] = (total, time.time())
+    return total
+
+
 # ==================== ENDPOINTS  ====================
 
 @app.route('/api/movies', methods=['GET'])
+@response_cache.cached('movies', tags=movie_tags)
 def get_movies():
-    conn = None
-    cursor = None
+    """
+    Catálogo: paginação por keyset em MOVIE_ID. Busca: ranking BM25 do índice
+    textual. Nos dois casos a próxima página vem de ?cursor=<next_cursor>.
+    O total do catálogo só é calculado com ?include_total=1 (e fica em cache).
+    Filtros genre/min_rating/year e sort=rating|year|popular vêm do catálogo em
+    memória, que também monta as páginas sem ler MOVIES no banco.
+    """
     try:
         limit = min(int(request.args.get('limit', 20)), 100)
-        offset = max(int(request.args.get('offset', 0)), 0)
         search_query = (request.args.get('search', '') or '').strip()
+        include_total = request.args.get('include_total', '0') in ('1', 'true')
+        sort = request.args.get('sort', 'id')
+        if sort not in SORTS:
+            return jsonify({'success': False, 'error': f'sort inválido. Use: {", ".join(SORTS)}'}), 400
+        try:
+            filters = movie_filters(request.args)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'min_rating e year devem ser numéricos'}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        where_clause = ""
-        params_page = {'offset': offset, 'limit': limit}
-        params_count = {}
-
-        if search_query:
-            where_clause = "WHERE UPPER(m.TITLE) LIKE UPPER(:search) OR UPPER(m.SUMMARY) LIKE UPPER(:search)"
-            like = f'%{search_query}%'
-            params_page['search'] = like
-            params_count['search'] = like
+        catalog = loaded_catalog()
+        if catalog is None and (filters or sort != 'id'):
+            return jsonify({'success': False, 'error': 'Filtros e ordenação exigem o catálogo em memória'}), 400
 
-        has_media = False
+        scope = cursor_scope(search_query, sort, filters)
         try:
-            query = f"""
-                SELECT
-                    m.MOVIE_ID, m.TITLE, m.GENRES, m.SUMMARY,
-                    NVL(m.RATING, 0) as RATING, NVL(m.YEAR, 2024) as YEAR,
-                    (SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE w WHERE w.MOVIE_ID = m.MOVIE_ID) as WATCH_COUNT,
-                    p.ASSET_URL AS POSTER_URL,
-                    t.ASSET_URL AS TRAILER_URL
-                FROM {SCHEMA}.MOVIES m
-                LEFT JOIN {SCHEMA}.MEDIA_ASSETS p ON p.MOVIE_ID = m.MOVIE_ID AND p.ASSET_TYPE = 'poster_url'
-                LEFT JOIN {SCHEMA}.MEDIA_ASSETS t ON t.MOVIE_ID = m.MOVIE_ID AND t.ASSET_TYPE = 'trailer_url'
-                {where_clause}
-                ORDER BY m.MOVIE_ID
-                OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
-            """
-            cursor.execute(query, params_page)
-            has_media = True
-        except Exception as e:
-            print(f"⚠️  Query com MEDIA_ASSETS falhou, usando fallback. Motivo: {e}")
-            query = f"""
-                SELECT m.MOVIE_ID, m.TITLE, m.GENRES, m.SUMMARY,
-                       NVL(m.RATING, 0) as RATING, NVL(m.YEAR, 2024) as YEAR,
-                       (SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE w WHERE w.MOVIE_ID = m.MOVIE_ID) as WATCH_COUNT
-                FROM {SCHEMA}.MOVIES m
-                {where_clause}
-                ORDER BY m.MOVIE_ID
-                OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
-            """
-            cursor.execute(query, params_page)
-            has_media = False
-
-        movies = []
-        for row in cursor:
-            movie = {
-                'id': row[0],
-                'title': row[1],
-                'genres': parse_genres(row[2]),
-                'summary': row[3] if row[3] else 'Sem descrição',
-                'rating': float(row[4] or 0),
-                'year': int(row[5] or 2024),
-                'watchCount': int(row[6] or 0)
-            }
-            if has_media:
-                movie['poster_url'] = row[7]
-                movie['trailer_url'] = row[8]
-            movies.append(movie)
-
-        count_query = f"SELECT COUNT(*) FROM {SCHEMA}.MOVIES m {where_clause}"
-        cursor.execute(count_query, params_count)
-        total = cursor.fetchone()[0]
+            after = decode_cursor(request.args.get('cursor'), scope)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        scores = {}
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            if search_query:
+                hits = lexical_search(cursor, search_query)
+                if filters:
+                    kept = set(catalog.filter_ids([movie_id for movie_id, _ in hits], **filters))
+                    hits = [hit for hit in hits if hit[0] in kept]
+                page = hits[after:after + limit]
+                has_more = len(hits) > after + limit
+                next_after = after + len(page)
+                scores = dict(page)
+                movie_ids = [movie_id for movie_id, _ in page]
+                total = len(hits) if include_total else None
+            elif catalog is not None:
+                movie_ids, has_more, next_after, total = catalog.browse(after, limit, sort, **filters)
+                total = total if include_total else None
+            else:
+                rows = repository.fetch_all(cursor, 'movies.page', {'after_id': after, 'limit': limit + 1},
+                                            rows=limit + 1)
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                movie_ids = [row[0] for row in rows]
+                next_after = movie_ids[-1] if movie_ids else after
+                total = count_movies(cursor) if include_total else None
+
+            if catalog is not None:
+                by_id = catalog.hydrate(movie_ids)
+                rows = [(m['id'], m['title'], m['genres'], m['summary'], m['rating'], m['year'])
+                        for m in (by_id.get(movie_id) for movie_id in movie_ids) if m is not None]
+            elif search_query:
+                by_id = repository.fetch_map(cursor, 'movies.cards_by_ids', ids=movie_ids)
+                rows = [by_id[movie_id] for movie_id in movie_ids if movie_id in by_id]
+
+            watch_counts = movie_watch_counts(cursor, movie_ids)
+
+            # Posters/trailers: cache de MEDIA_ASSETS, no máximo uma query
+            assets = media_assets.resolve(cursor, movie_ids)
+            has_media = media_assets.available
+
+            movies = []
+            for row in rows:
+                movie = {
+                    'id': row[0],
+                    'title': row[1],
+                    'genres': parse_genres(row[2]),
+                    'summary': row[3] if row[3] else 'Sem descrição',
+                    'rating': float(row[4] or 0),
+                    'year': int(row[5] or 2024),
+                    'watchCount': watch_counts.get(row[0], 0)
+                }
+                if search_query:
+                    movie['score'] = scores[row[0]]
+                if has_media:
+                    movie_assets = assets.get(row[0], {})
+                    movie['poster_url'] = movie_assets.get('poster_url')
+                    movie['trailer_url'] = movie_assets.get('trailer_url')
+                movies.append(movie)
 
         return jsonify({
             'success': True,
             'data': movies,
             'count': len(movies),
             'total': total,
+            'has_more': has_more,
+            'next_cursor': encode_cursor(next_after, scope) if has_more else None,
             'search_query': search_query if search_query else None
         })
     except Exception as e:
         print(f"❌ Erro em /api/movies: {e}")
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
-    finally:
-        try:
-            if cursor:
-                cursor.close()
-        except:
-            pass
-        try:
-            if conn:
-                conn.close()
-        except:
-            pass
 
 
 @app.route('/api/search/vector', methods=['POST'])
@@ -227,62 +434,115 @@ def vector_search():
         if not query_text:
             return jsonify({'success': False, 'error': 'Query required'}), 400
 
-        query_embedding = generate_embedding(query_text)
+        backend = (data.get('backend') or VECTOR_CONFIG['backend']).strip()
+        if backend not in VECTOR_BACKENDS:
+            return jsonify({'success': False, 'error': f'Backend inválido. Use: {", ".join(VECTOR_BACKENDS)}'}), 400
+        backend = resolve_backend(backend)
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        query_embedding = generate_embedding(query_text)
 
-        try:
-            embedding_array = f"[{','.join(map(str, query_embedding))}]"
-            query = f"""
-                SELECT m.MOVIE_ID, m.TITLE, m.SUMMARY, m.GENRES, m.RATING,
-                       VECTOR_DISTANCE(mv.EMBEDDING, TO_VECTOR(:query_vec), COSINE) as distance,
-                       ma.ASSET_URL as POSTER_URL
-                FROM {SCHEMA}.MOVIES m
-                JOIN {SCHEMA}.MOVIE_VECTORS mv ON m.MOVIE_ID = mv.MOVIE_ID
-                LEFT JOIN {SCHEMA}.MEDIA_ASSETS ma ON m.MOVIE_ID = ma.MOVIE_ID AND ma.ASSET_TYPE = 'poster_url'
-                ORDER BY distance ASC
-                FETCH FIRST :top_k ROWS ONLY
-            """
-            cursor.execute(query, {'query_vec': embedding_array, 'top_k': top_k})
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            hits = None
+            # FAISS roda no processo; os backends Oracle dependem das funções vetoriais do banco
+            in_database = backend != 'faiss'
+            if not in_database or capabilities.use('vector', cursor):
+                try:
+                    hits = search_vectors(query_embedding, top_k, backend=backend, cursor=cursor)
+                    if in_database:
+                        capabilities.succeeded('vector')
+                except Exception as e:
+                    print(f"⚠️  Busca vetorial ({backend}) falhou, usando busca textual: {e}")
+                    if in_database:
+                        capabilities.failed('vector', e)
+
+            if hits is None:
+                metrics.set_path('fallback')
+                backend = 'lexical_fallback'
+                hits = lexical_search(cursor, query_text, top_k)
+            movies = fetch_movies_by_ids(cursor, [movie_id for movie_id, _ in hits])
 
             results = []
-            for row in cursor:
+            for movie_id, score in hits:
+                row = movies.get(movie_id)
+                if row is None:
+                    continue
                 results.append({
                     'id': row[0],
                     'title': row[1],
                     'snippet': row[2][:200] + '...' if row[2] and len(row[2]) > 200 else row[2],
                     'genres': parse_genres(row[3]),
                     'rating': float(row[4]) if row[4] else 0,
-                    'score': float(1 - float(row[5])),
-                    'poster_url': row[6]
+                    'score': score,
+                    'poster_url': row[5]
                 })
-        except:
-            cursor.execute(f"""
-                SELECT m.MOVIE_ID, m.TITLE, m.SUMMARY, m.GENRES, m.RATING, 0.5 as score,
-                       ma.ASSET_URL as POSTER_URL
-                FROM {SCHEMA}.MOVIES m
-                LEFT JOIN {SCHEMA}.MEDIA_ASSETS ma ON m.MOVIE_ID = ma.MOVIE_ID AND ma.ASSET_TYPE = 'poster_url'
-                WHERE UPPER(m.TITLE) LIKE UPPER(:query) OR UPPER(m.SUMMARY) LIKE UPPER(:query)
-                FETCH FIRST :top_k ROWS ONLY
-            """, {'query': f'%{query_text}%', 'top_k': top_k})
 
-            results = []
-            for row in cursor:
-                results.append({
-                    'id': row[0],
-                    'title': row[1],
-                    'snippet': row[2][:200] + '...' if row[2] and len(row[2]) > 200 else row[2],
-                    'genres': parse_genres(row[3]),
-                    'rating': float(row[4]) if row[4] else 0,
-                    'score': float(row[5]),
-                    'poster_url': row[6]
-                })
+        return jsonify({'success': True, 'query': query_text, 'results': results, 'backend': backend})
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        cursor.close()
-        conn.close()
 
-        return jsonify({'success': True, 'query': query_text, 'results': results})
+@app.route('/api/search/hybrid', methods=['POST'])
+def search_hybrid():
+    """Vetorial + textual + grafo (com customer_id) fundidos num único ranking"""
+    try:
+        data = request.get_json() or {}
+        query_text = (data.get('query', '') or '').strip()
+        try:
+            customer_id = int(data['customer_id']) if data.get('customer_id') is not None else None
+            top_k = min(int(data.get('top_k', 10)), 100)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'customer_id e top_k devem ser inteiros'}), 400
+        fusion = data.get('fusion') or None
+        backend = data.get('backend') or None
+        signals = tuple(data.get('signals') or SIGNALS)
+
+        if not query_text and customer_id is None:
+            return jsonify({'success': False, 'error': 'query ou customer_id obrigatório'}), 400
+        if fusion and fusion not in FUSION_METHODS:
+            return jsonify({'success': False, 'error': f'Fusão inválida. Use: {", ".join(FUSION_METHODS)}'}), 400
+        if backend and backend not in VECTOR_BACKENDS:
+            return jsonify({'success': False, 'error': f'Backend inválido. Use: {", ".join(VECTOR_BACKENDS)}'}), 400
+        if any(signal not in SIGNALS for signal in signals):
+            return jsonify({'success': False, 'error': f'Sinais válidos: {", ".join(SIGNALS)}'}), 400
+
+        fused, signal_status = hybrid_search(
+            query_text,
+            customer_id=customer_id,
+            top_k=top_k,
+            fusion=fusion,
+            backend=backend,
+            signals=signals
+        )
+
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            movies = fetch_movies_by_ids(cursor, [movie_id for movie_id, _, _ in fused])
+
+        results = []
+        for movie_id, score, breakdown in fused:
+            row = movies.get(movie_id)
+            if row is None:
+                continue
+            results.append({
+                'id': row[0],
+                'title': row[1],
+                'snippet': row[2][:200] + '...' if row[2] and len(row[2]) > 200 else row[2],
+                'genres': parse_genres(row[3]),
+                'rating': float(row[4]) if row[4] else 0,
+                'poster_url': row[5],
+                'score': score,
+                'signals': breakdown
+            })
+
+        return jsonify({
+            'success': True,
+            'query': query_text,
+            'customer_id': customer_id,
+            'fusion': fusion or HYBRID_CONFIG['fusion'],
+            'signals': signal_status,
+            'results': results
+        })
     except Exception as e:
         print(f"❌ Erro: {e}")
         traceback.print_exc()
@@ -290,30 +550,19 @@ def vector_search():
 
 
 @app.route('/api/customers', methods=['GET'])
+@response_cache.cached('customers')
 def get_customers():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(f"""
-            SELECT CUST_ID, FIRSTNAME, LASTNAME, EMAIL,
-                   (SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE w WHERE w.PROMO_CUST_ID = c.CUST_ID) as movies_count
-            FROM {SCHEMA}.MOVIES_CUSTOMER c
-            ORDER BY CUST_ID
-        """)
-
-        customers = []
-        for row in cursor:
-            customers.append({
-                'id': row[0],
-                'firstname': row[1],
-                'lastname': row[2],
-                'email': row[3],
-                'movies_count': row[4]
-            })
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            rows = repository.fetch_all(cursor, 'customers.list')
 
-        cursor.close()
-        conn.close()
+        customers = [{
+            'id': row[0],
+            'firstname': row[1],
+            'lastname': row[2],
+            'email': row[3],
+            'movies_count': row[4]
+        } for row in rows]
 
         return jsonify({'success': True, 'data': customers})
     except Exception as e:
@@ -326,35 +575,22 @@ def get_customers():
 def create_customer():
     try:
         data = request.get_json() or {}
-        firstname = (data.get('firstname', '') or '').strip()
-        lastname = (data.get('lastname', '') or '').strip()
-        email = (data.get('email', '') or '').strip()
-
-        if not firstname or not lastname or not email:
-            return jsonify({'success': False, 'error': 'Nome, sobrenome e email obrigatórios'}), 400
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(f"SELECT NVL(MAX(cust_id), 100) + 1 FROM {SCHEMA}.MOVIES_CUSTOMER")
-        new_cust_id = cursor.fetchone()[0]
+        try:
+            customer = validate_customer(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
-        cursor.execute(f"""
-            INSERT INTO {SCHEMA}.MOVIES_CUSTOMER (CUST_ID, FIRSTNAME, LASTNAME, EMAIL)
-            VALUES (:cust_id, :firstname, :lastname, :email)
-        """, {'cust_id': new_cust_id, 'firstname': firstname, 'lastname': lastname, 'email': email})
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            new_cust_id = insert_customer(cursor, customer)
+            conn.commit()
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+        invalidate_customer_responses(new_cust_id)
 
         return jsonify({
             'success': True,
             'customer': {
                 'id': new_cust_id,
-                'firstname': firstname,
-                'lastname': lastname,
-                'email': email,
+                **customer,
                 'movies_count': 0
             }
         })
@@ -364,6 +600,73 @@ def create_customer():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/customers/bulk', methods=['POST'])
+def import_customers_bulk():
+    """Corpo: {"customers": [{firstname, lastname, email}, ...]}; ids vêm em blocos, INSERT em lote"""
+    try:
+        data = request.get_json() or {}
+        rows = data.get('customers') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'success': False, 'error': 'customers deve ser uma lista não vazia'}), 400
+
+        started = time.perf_counter()
+        created, errors = import_customers(
+            (row if isinstance(row, dict) else {} for row in rows),
+            batch_size=int(request.args.get('batch_size', CUSTOMER_ID_CONFIG['import_batch_size']))
+        )
+        if created:
+            response_cache.invalidate('customers')
+
+        return jsonify({
+            'success': not errors,
+            'created': len(created),
+            'ids': created,
+            'failed': len(errors),
+            'errors': errors[:100],
+            'elapsed_seconds': round(time.perf_counter() - started, 3)
+        })
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/customers/<int:customer_id>/neighbors', methods=['GET'])
+def get_customer_neighbors(customer_id):
+    """Top-K clientes mais parecidos (Jaccard ou cosseno sobre os filmes assistidos)"""
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 100)
+        metric = request.args.get('metric', 'jaccard')
+        if metric not in ('jaccard', 'cosine', 'common'):
+            return jsonify({'success': False, 'error': f'metric inválida: {metric}'}), 400
+
+        started = time.perf_counter()
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            if not profile_cache.get(customer_id, cursor):
+                return jsonify({'success': False, 'error': 'Cliente não encontrado'}), 404
+            neighbors = customer_neighbors(cursor, customer_id, k, metric)
+
+        return jsonify({
+            'success': True,
+            'customer_id': customer_id,
+            'metric': metric,
+            'method': 'memory_matrix' if graph_engine_enabled() else 'sql',
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            'data': [{
+                'id': cust_id,
+                'name': name,
+                'score': score,
+                'common_movies': common
+            } for cust_id, name, score, common in neighbors]
+        })
+    except ValueError:
+        return jsonify({'success': False, 'error': 'k deve ser inteiro'}), 400
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/customers/<int:customer_id>/watch', methods=['POST'])
 def mark_as_watched(customer_id):
     try:
@@ -374,38 +677,44 @@ def mark_as_watched(customer_id):
         if not movie_id:
             return jsonify({'success': False, 'error': 'movie_id obrigatório'}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE 
-            WHERE PROMO_CUST_ID = :cust_id AND MOVIE_ID = :movie_id
-        """, {'cust_id': customer_id, 'movie_id': movie_id})
-
-        if cursor.fetchone()[0] > 0:
-            if rating is not None:
-                cursor.execute(f"""
-                    UPDATE {SCHEMA}.WATCHED_MOVIE
-                    SET RATING_GIVEN = :rating, DAY_ID = SYSDATE
-                    WHERE PROMO_CUST_ID = :cust_id AND MOVIE_ID = :movie_id
-                """, {'rating': rating, 'cust_id': customer_id, 'movie_id': movie_id})
-                conn.commit()
-                cursor.close()
-                conn.close()
-                return jsonify({'success': True, 'message': 'Rating atualizado'})
-            else:
-                cursor.close()
-                conn.close()
+        if write_behind_enabled():
+            # Só o log local no caminho da requisição; o MERGE sai em lote no worker.
+            # Cliente e filme validados aqui, como o FK faria no caminho síncrono
+            try:
+                movie_id = int(movie_id)
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'movie_id deve ser inteiro'}), 400
+            profile = profile_cache.get(customer_id)
+            if not profile:
+                return jsonify({'success': False, 'error': 'Cliente não encontrado'}), 404
+            if not movie_exists(movie_id):
+                return jsonify({'success': False, 'error': 'Filme não encontrado'}), 404
+            already_watched = profile.has_watched(movie_id)
+            if already_watched and rating is None:
                 return jsonify({'success': False, 'error': 'Já assistiu'}), 400
+            watch_buffer().append(customer_id, movie_id, rating)
+            invalidate_watch_responses([(customer_id, movie_id)])
+            return jsonify({
+                'success': True,
+                'message': 'Rating atualizado' if already_watched else 'Marcado como assistido',
+                'write_behind': True
+            })
 
-        cursor.execute(f"""
-            INSERT INTO {SCHEMA}.WATCHED_MOVIE (PROMO_CUST_ID, MOVIE_ID, DAY_ID, RATING_GIVEN)
-            VALUES (:cust_id, :movie_id, SYSDATE, :rating)
-        """, {'cust_id': customer_id, 'movie_id': movie_id, 'rating': rating})
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            watch = {'cust_id': customer_id, 'movie_id': movie_id}
+            if repository.fetch_scalar(cursor, 'watched.exists', watch) > 0:
+                if rating is not None:
+                    repository.execute(cursor, 'watched.update_rating', {**watch, 'rating': rating})
+                    conn.commit()
+                    invalidate_customer_responses(customer_id, movie_id)
+                    return jsonify({'success': True, 'message': 'Rating atualizado'})
+                else:
+                    return jsonify({'success': False, 'error': 'Já assistiu'}), 400
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+            repository.execute(cursor, 'watched.insert', {**watch, 'rating': rating})
+            conn.commit()
+
+        after_watch(customer_id, movie_id)
 
         return jsonify({'success': True, 'message': 'Marcado como assistido'})
     except Exception as e:
@@ -414,141 +723,108 @@ def mark_as_watched(customer_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/watch/bulk', methods=['POST'])
+def bulk_watch():
+    """
+    Corpo NDJSON (padrão) ou CSV (Content-Type text/csv) com um evento por linha:
+    customer_id, movie_id, rating, timestamp. Lido em streaming, gravado em lotes.
+    """
+    try:
+        batch_size = int(request.args.get('batch_size', INGEST_CONFIG['batch_size']))
+        if batch_size < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'error': 'batch_size deve ser inteiro positivo'}), 400
+
+    try:
+        fmt = request.args.get('format') or detect_format(content_type=request.content_type)
+        if fmt not in FORMATS:
+            return jsonify({'success': False, 'error': f'format inválido: {fmt}'}), 400
+
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        report = ingest(
+            iter_events(lines, fmt),
+            batch_size=batch_size,
+            on_batch=lambda events: after_watches([(e['cust_id'], e['movie_id']) for e in events])
+        ).to_dict()
+
+        return jsonify({'success': report['failed'] == 0, **report})
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ==================== ROTAS COM PROPERTY GRAPH  ====================
 
 @app.route('/api/graph/recommendations/<int:customer_id>', methods=['GET'])
 def get_graph_recommendations(customer_id):
- 
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Primeiro: buscar filmes já assistidos pelo cliente
-        cursor.execute(f"""
-            SELECT MOVIE_ID FROM {SCHEMA}.WATCHED_MOVIE 
-            WHERE PROMO_CUST_ID = :cust_id
-        """, {'cust_id': customer_id})
-        watched_movies = {row[0] for row in cursor.fetchall()}
-        
-        
-        # Sintaxe: GRAPH_TABLE(graph MATCH pattern COLUMNS(...))
-        pgql_query = f"""
-            SELECT 
-                movie_id, 
-                title, 
-                summary, 
-                rating, 
-                similar_users
-            FROM GRAPH_TABLE ({GRAPH_NAME}
-                MATCH (c1:customer)-[:watched]->(m:movie)<-[:watched]-(c2:customer)-[:watched]->(m2:movie)
-                WHERE c1.cust_id = :cust_id 
-                  AND c2.cust_id != :cust_id
-                COLUMNS (
-                    m2.movie_id AS movie_id,
-                    m2.title AS title,
-                    m2.summary AS summary,
-                    m2.rating AS rating,
-                    COUNT(DISTINCT c2.cust_id) AS similar_users
-                )
-            )
-            GROUP BY movie_id, title, summary, rating, similar_users
-            ORDER BY similar_users DESC, rating DESC
-            FETCH FIRST 10 ROWS ONLY
-        """
-        
-        try:
-            cursor.execute(pgql_query, {'cust_id': customer_id})
-            
-            recommendations = []
-            for row in cursor:
-                movie_id = row[0]
-                
-                # Pular filmes já assistidos
-                if movie_id in watched_movies:
-                    continue
-                
-                # Buscar poster separadamente (depois do GRAPH_TABLE)
-                cursor2 = conn.cursor()
-                cursor2.execute(f"""
-                    SELECT ASSET_URL FROM {SCHEMA}.MEDIA_ASSETS 
-                    WHERE MOVIE_ID = :mid AND ASSET_TYPE = 'poster_url'
-                """, {'mid': movie_id})
-                poster_row = cursor2.fetchone()
-                poster_url = poster_row[0] if poster_row else None
-                cursor2.close()
-                
-                recommendations.append({
-                    'id': movie_id,
-                    'title': row[1],
-                    'summary': row[2][:150] + '...' if row[2] and len(row[2]) > 150 else row[2],
-                    'rating': float(row[3]) if row[3] else 0,
-                    'similar_users': int(row[4]),
-                    'poster_url': poster_url,
-                    'graph_reason': f'{row[4]} usuários com gostos similares assistiram',
-                    'recommendation_type': 'collaborative_filtering'
-                })
-                
-                # Limitar a 5 recomendações
-                if len(recommendations) >= 5:
-                    break
-            
-            cursor.close()
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'customer_id': customer_id,
-                'recommendations': recommendations,
-                'method': 'property_graph_pgql'
-            })
-            
-        except Exception as pgql_error:
-            print(f"⚠️  Erro PGQL, usando fallback SQL: {pgql_error}")
-            
-            # Fallback para SQL tradicional se PGQL falhar
-            cursor.execute(f"""
-                SELECT m2.MOVIE_ID, m2.TITLE, m2.SUMMARY, m2.RATING,
-                       COUNT(DISTINCT c2.CUST_ID) as similar_users,
-                       ma.ASSET_URL as POSTER_URL
-                FROM {SCHEMA}.WATCHED_MOVIE w1
-                JOIN {SCHEMA}.WATCHED_MOVIE w2 ON w1.MOVIE_ID = w2.MOVIE_ID
-                JOIN {SCHEMA}.MOVIES_CUSTOMER c2 ON w2.PROMO_CUST_ID = c2.CUST_ID
-                JOIN {SCHEMA}.WATCHED_MOVIE w3 ON c2.CUST_ID = w3.PROMO_CUST_ID
-                JOIN {SCHEMA}.MOVIES m2 ON w3.MOVIE_ID = m2.MOVIE_ID
-                LEFT JOIN {SCHEMA}.MEDIA_ASSETS ma ON m2.MOVIE_ID = ma.MOVIE_ID AND ma.ASSET_TYPE = 'poster_url'
-                WHERE w1.PROMO_CUST_ID = :cust_id
-                  AND c2.CUST_ID != :cust_id
-                  AND m2.MOVIE_ID NOT IN (
-                      SELECT MOVIE_ID FROM {SCHEMA}.WATCHED_MOVIE WHERE PROMO_CUST_ID = :cust_id
-                  )
-                GROUP BY m2.MOVIE_ID, m2.TITLE, m2.SUMMARY, m2.RATING, ma.ASSET_URL
-                ORDER BY similar_users DESC, m2.RATING DESC
-                FETCH FIRST 5 ROWS ONLY
-            """, {'cust_id': customer_id})
-            
-            recommendations = []
-            for row in cursor:
-                recommendations.append({
-                    'id': row[0],
-                    'title': row[1],
-                    'summary': row[2][:150] + '...' if row[2] and len(row[2]) > 150 else row[2],
-                    'rating': float(row[3]) if row[3] else 0,
-                    'similar_users': int(row[4]),
-                    'poster_url': row[5],
-                    'graph_reason': f'{row[4]} usuários similares assistiram',
-                    'recommendation_type': 'sql_fallback'
+        strategy = request.args.get('strategy', 'cowatch')
+        if strategy not in ('cowatch', 'item_similarity'):
+            return jsonify({'success': False, 'error': f'strategy inválida: {strategy}'}), 400
+
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            # Similaridade item-item pré-calculada: soma dos vizinhos dos filmes assistidos
+            if strategy == 'item_similarity':
+                # Com GRAPH_ENGINE != memory o CSR não é carregado só para ler o perfil
+                if graph_engine_enabled():
+                    watched = get_cowatch_graph().watched(customer_id)
+                else:
+                    watched = [movie_id for movie_id, in repository.fetch_all(cursor, 'watched.movie_ids',
+                                                                              {'cust_id': customer_id})]
+                ranked = item_similarity.get_item_similarity().recommend(watched, limit=5)
+                movies = fetch_movies_by_ids(cursor, [movie_id for movie_id, _ in ranked])
+                recommendations = []
+                for movie_id, score in ranked:
+                    row = movies.get(movie_id)
+                    if row is None:
+                        continue
+                    recommendations.append({
+                        'id': row[0],
+                        'title': row[1],
+                        'summary': row[2][:150] + '...' if row[2] and len(row[2]) > 150 else row[2],
+                        'rating': float(row[4]) if row[4] else 0,
+                        'similarity_score': round(score, 4),
+                        'poster_url': row[5],
+                        'graph_reason': 'Similar aos filmes que você assistiu',
+                        'recommendation_type': 'item_similarity'
+                    })
+
+                return jsonify({
+                    'success': True,
+                    'customer_id': customer_id,
+                    'recommendations': recommendations,
+                    'method': 'item_similarity'
                 })
-            
-            cursor.close()
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'customer_id': customer_id,
-                'recommendations': recommendations,
-                'method': 'sql_fallback'
-            })
-            
+
+            # Grafo em memória (CSR), PGQL ou SQL relacional, nessa ordem
+            rows, posters, method = graph_recommendations(cursor, customer_id, 5)
+
+        if method == 'sql_fallback':
+            recommendation_type, reason = 'sql_fallback', 'usuários similares assistiram'
+        else:
+            recommendation_type, reason = 'collaborative_filtering', 'usuários com gostos similares assistiram'
+
+        recommendations = [{
+            'id': row[0],
+            'title': row[1],
+            'summary': row[2][:150] + '...' if row[2] and len(row[2]) > 150 else row[2],
+            'rating': float(row[3]) if row[3] else 0,
+            'similar_users': int(row[5]),
+            'poster_url': posters.get(row[0]),
+            'graph_reason': f'{row[5]} {reason}',
+            'recommendation_type': recommendation_type
+        } for row in rows]
+
+        return jsonify({
+            'success': True,
+            'customer_id': customer_id,
+            'recommendations': recommendations,
+            'method': method
+        })
+
     except Exception as e:
         print(f"❌ Erro geral: {e}")
         traceback.print_exc()
@@ -556,37 +832,17 @@ def get_graph_recommendations(customer_id):
 
 
 @app.route('/api/graph/customer/<int:customer_id>', methods=['GET'])
+@response_cache.cached('graph_customer', tags=lambda view_args, payload: [f"customer:{view_args['customer_id']}"])
 def get_customer_graph(customer_id):
 
     try:
         limit = int(request.args.get('limit', 20))
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Info do cliente
-        cursor.execute(f"""
-            SELECT CUST_ID, FIRSTNAME || ' ' || LASTNAME as NAME
-            FROM {SCHEMA}.MOVIES_CUSTOMER
-            WHERE CUST_ID = :cust_id
-        """, {'cust_id': customer_id})
-
-        customer_row = cursor.fetchone()
-        if not customer_row:
-            cursor.close()
-            conn.close()
+        profile = profile_cache.get(customer_id)
+        if not profile:
             return jsonify({'success': False, 'error': 'Cliente não encontrado'}), 404
 
-        # Total de filmes
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE 
-            WHERE PROMO_CUST_ID = :cust_id
-        """, {'cust_id': customer_id})
-        total = cursor.fetchone()[0]
-
-        if total == 0:
-            cursor.close()
-            conn.close()
+        if profile.total_movies == 0:
             return jsonify({
                 'success': True,
                 'nodes': [],
@@ -596,46 +852,21 @@ def get_customer_graph(customer_id):
                 'message': 'Cliente ainda não assistiu filmes'
             })
 
-        # PGQL: Filmes assistidos pelo cliente
-        try:
-            pgql_movies = f"""
-                SELECT movie_id, title
-                FROM GRAPH_TABLE ({GRAPH_NAME}
-                    MATCH (c:customer)-[:watched]->(m:movie)
-                    WHERE c.cust_id = :cust_id
-                    COLUMNS (m.movie_id AS movie_id, m.title AS title)
-                )
-                FETCH FIRST :limit ROWS ONLY
-            """
-            cursor.execute(pgql_movies, {'cust_id': customer_id, 'limit': limit})
-        except:
-            # Fallback SQL
-            cursor.execute(f"""
-                SELECT m.MOVIE_ID, m.TITLE
-                FROM {SCHEMA}.WATCHED_MOVIE w
-                JOIN {SCHEMA}.MOVIES m ON w.MOVIE_ID = m.MOVIE_ID
-                WHERE w.PROMO_CUST_ID = :cust_id
-                FETCH FIRST :limit ROWS ONLY
-            """, {'cust_id': customer_id, 'limit': limit})
-
-        movies = cursor.fetchall()
+        movies = [(movie[0], movie[1]) for movie in profile.movies[:limit]]
 
         # Montar resposta
-        nodes = [{'id': customer_row[0], 'label': customer_row[1], 'type': 'customer'}]
+        nodes = [{'id': profile.cust_id, 'label': profile.name, 'type': 'customer'}]
         edges = []
 
         for movie_id, movie_title in movies:
             nodes.append({'id': movie_id, 'label': movie_title, 'type': 'movie'})
-            edges.append({'source': customer_row[0], 'target': movie_id, 'type': 'WATCHED'})
-
-        cursor.close()
-        conn.close()
+            edges.append({'source': profile.cust_id, 'target': movie_id, 'type': 'WATCHED'})
 
         return jsonify({
             'success': True,
             'nodes': nodes,
             'edges': edges,
-            'total': total,
+            'total': profile.total_movies,
             'showing': len(movies)
         })
 
@@ -646,71 +877,43 @@ def get_customer_graph(customer_id):
 
 
 @app.route('/api/graph/compare/<int:id1>/<int:id2>', methods=['GET'])
+@response_cache.cached('graph_compare', tags=lambda view_args, payload: [f"customer:{view_args['id1']}",
+                                                                         f"customer:{view_args['id2']}"])
 def compare_customers(id1, id2):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Cliente 1
-        cursor.execute(f"""
-            SELECT CUST_ID, FIRSTNAME || ' ' || LASTNAME as NAME
-            FROM {SCHEMA}.MOVIES_CUSTOMER
-            WHERE CUST_ID = :id
-        """, {'id': id1})
-        customer1_row = cursor.fetchone()
-
-        if not customer1_row:
-            cursor.close()
-            conn.close()
+        profile1 = profile_cache.get(id1)
+        if not profile1:
             return jsonify({'success': False, 'error': f'Cliente {id1} não encontrado'}), 404
 
-        # Cliente 2
-        cursor.execute(f"""
-            SELECT CUST_ID, FIRSTNAME || ' ' || LASTNAME as NAME
-            FROM {SCHEMA}.MOVIES_CUSTOMER
-            WHERE CUST_ID = :id
-        """, {'id': id2})
-        customer2_row = cursor.fetchone()
-
-        if not customer2_row:
-            cursor.close()
-            conn.close()
+        profile2 = profile_cache.get(id2)
+        if not profile2:
             return jsonify({'success': False, 'error': f'Cliente {id2} não encontrado'}), 404
 
-        # Filmes Cliente 1
-        cursor.execute(f"""
-            SELECT m.MOVIE_ID, m.TITLE
-            FROM {SCHEMA}.WATCHED_MOVIE w
-            JOIN {SCHEMA}.MOVIES m ON w.MOVIE_ID = m.MOVIE_ID
-            WHERE w.PROMO_CUST_ID = :id
-        """, {'id': id1})
-        movies1 = [{'id': row[0], 'title': row[1]} for row in cursor.fetchall()]
-        movies1_ids = {m['id'] for m in movies1}
-
-        # Filmes Cliente 2
-        cursor.execute(f"""
-            SELECT m.MOVIE_ID, m.TITLE
-            FROM {SCHEMA}.WATCHED_MOVIE w
-            JOIN {SCHEMA}.MOVIES m ON w.MOVIE_ID = m.MOVIE_ID
-            WHERE w.PROMO_CUST_ID = :id
-        """, {'id': id2})
-        movies2 = [{'id': row[0], 'title': row[1]} for row in cursor.fetchall()]
-        movies2_ids = {m['id'] for m in movies2}
-
-        # Filmes em comum
-        common_ids = movies1_ids & movies2_ids
+        customer1_row = (profile1.cust_id, profile1.name)
+        customer2_row = (profile2.cust_id, profile2.name)
+        movies1 = [{'id': movie[0], 'title': movie[1]} for movie in profile1.movies]
+        movies2 = [{'id': movie[0], 'title': movie[1]} for movie in profile2.movies]
+
+        # Filmes em comum e similaridade: linhas da matriz cliente x filme
+        if graph_engine_enabled():
+            pair = get_cowatch_graph().pair_similarity(id1, id2)
+        else:
+            common = np.intersect1d(profile1.watched_ids, profile2.watched_ids)
+            union = profile1.watched_ids.size + profile2.watched_ids.size - common.size
+            norm = float(np.sqrt(profile1.watched_ids.size * profile2.watched_ids.size))
+            pair = {
+                'common_ids': set(common.tolist()),
+                'jaccard': round(common.size / union, 4) if union else 0.0,
+                'cosine': round(common.size / norm, 4) if norm else 0.0
+            }
+        common_ids = pair['common_ids']
         common_movies = [m for m in movies1 if m['id'] in common_ids]
 
         # Filmes exclusivos
-        unique1 = [m for m in movies1 if m['id'] not in movies2_ids]
-        unique2 = [m for m in movies2 if m['id'] not in movies1_ids]
-
-        # Similaridade
-        total_unique = len(movies1_ids | movies2_ids)
-        similarity = int((len(common_ids) / total_unique * 100)) if total_unique > 0 else 0
+        unique1 = [m for m in movies1 if m['id'] not in common_ids]
+        unique2 = [m for m in movies2 if m['id'] not in common_ids]
 
-        cursor.close()
-        conn.close()
+        similarity = int(pair['jaccard'] * 100)
 
         return jsonify({
             'success': True,
@@ -731,6 +934,7 @@ def compare_customers(id1, id2):
                 'movies': common_movies
             },
             'similarity_score': similarity,
+            'similarity': {'jaccard': pair['jaccard'], 'cosine': pair['cosine']},
             'unique_to_customer1': len(unique1),
             'unique_to_customer2': len(unique2)
         })
@@ -741,285 +945,142 @@ def compare_customers(id1, id2):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def network_source(cursor):
+    if graph_engine_enabled():
+        return MemoryGraphSource(get_cowatch_graph())
+    return SQLGraphSource(cursor)
+
+
+def network_levels(cursor, customer_id, depth, fanout):
+    """Níveis do BFS já no formato 3D, um por vez"""
+    for level in expand_network(network_source(cursor), customer_id, depth, fanout=fanout):
+        yield level_to_3d(cursor, level, parse_genres)
+
+
+def network_args():
+    depth = int(request.args.get('depth', 2))
+    limit = int(request.args.get('limit', NETWORK_CONFIG['fanout']))
+    return max(0, min(depth, NETWORK_CONFIG['max_depth'])), max(1, limit)
+
+
 @app.route('/api/graph/network/<int:customer_id>', methods=['GET'])
+@response_cache.cached('graph_network', tags=network_tags)
 def get_network_graph(customer_id):
+    try:
+        depth, limit = network_args()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'depth e limit devem ser inteiros'}), 400
 
     try:
-        depth = int(request.args.get('depth', 2))
-        limit = int(request.args.get('limit', 50))
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Cliente principal
-        cursor.execute(f"""
-            SELECT CUST_ID, FIRSTNAME || ' ' || LASTNAME as NAME
-            FROM {SCHEMA}.MOVIES_CUSTOMER
-            WHERE CUST_ID = :cust_id
-        """, {'cust_id': customer_id})
-        
-        customer_row = cursor.fetchone()
-        if not customer_row:
-            cursor.close()
-            conn.close()
+        if not profile_cache.get(customer_id):
             return jsonify({'success': False, 'error': 'Cliente não encontrado'}), 404
-        
-        nodes = [{
-            'id': f'c{customer_row[0]}', 
-            'label': customer_row[1], 
-            'type': 'customer', 
-            'group': 1, 
-            'size': 12
-        }]
-        links = []
-        
-        # PGQL: Filmes do cliente
-        try:
-            pgql_movies = f"""
-                SELECT movie_id, title, genres
-                FROM GRAPH_TABLE ({GRAPH_NAME}
-                    MATCH (c:customer)-[:watched]->(m:movie)
-                    WHERE c.cust_id = :cust_id
-                    COLUMNS (
-                        m.movie_id AS movie_id,
-                        m.title AS title,
-                        m.genres AS genres
-                    )
-                )
-                FETCH FIRST :limit ROWS ONLY
-            """
-            cursor.execute(pgql_movies, {'cust_id': customer_id, 'limit': limit})
-        except:
-            # Fallback SQL
-            cursor.execute(f"""
-                SELECT m.MOVIE_ID, m.TITLE, m.GENRES
-                FROM {SCHEMA}.WATCHED_MOVIE w
-                JOIN {SCHEMA}.MOVIES m ON w.MOVIE_ID = m.MOVIE_ID
-                WHERE w.PROMO_CUST_ID = :cust_id
-                FETCH FIRST :limit ROWS ONLY
-            """, {'cust_id': customer_id, 'limit': limit})
-        
-        movies = cursor.fetchall()
-        movie_ids = [m[0] for m in movies]
-        
-        for movie_id, movie_title, genres_raw in movies:
-            genres = parse_genres(genres_raw).keys() if genres_raw else []
-            nodes.append({
-                'id': f'm{movie_id}', 
-                'label': movie_title, 
-                'type': 'movie', 
-                'group': 2, 
-                'size': 8, 
-                'genres': list(genres)[:2]
-            })
-            links.append({
-                'source': f'c{customer_row[0]}', 
-                'target': f'm{movie_id}', 
-                'value': 1
-            })
-        
-        # PGQL: Clientes similares (se depth >= 2)
-        if depth >= 2 and movie_ids:
-            try:
-                pgql_similar = f"""
-                    SELECT cust_id, name, common_count
-                    FROM GRAPH_TABLE ({GRAPH_NAME}
-                        MATCH (c1:customer)-[:watched]->(m:movie)<-[:watched]-(c2:customer)
-                        WHERE c1.cust_id = :cust_id 
-                          AND c2.cust_id != :cust_id
-                        COLUMNS (
-                            c2.cust_id AS cust_id,
-                            c2.firstname || ' ' || c2.lastname AS name,
-                            COUNT(DISTINCT m.movie_id) AS common_count
-                        )
-                    )
-                    GROUP BY cust_id, name, common_count
-                    ORDER BY common_count DESC
-                    FETCH FIRST 5 ROWS ONLY
-                """
-                cursor.execute(pgql_similar, {'cust_id': customer_id})
-            except:
-                # Fallback SQL
-                cursor.execute(f"""
-                    SELECT c2.CUST_ID, c2.FIRSTNAME || ' ' || c2.LASTNAME as NAME,
-                           COUNT(DISTINCT w1.MOVIE_ID) as common_count
-                    FROM {SCHEMA}.WATCHED_MOVIE w1
-                    JOIN {SCHEMA}.WATCHED_MOVIE w2 ON w1.MOVIE_ID = w2.MOVIE_ID
-                    JOIN {SCHEMA}.MOVIES_CUSTOMER c2 ON w2.PROMO_CUST_ID = c2.CUST_ID
-                    WHERE w1.PROMO_CUST_ID = :cust_id
-                      AND c2.CUST_ID != :cust_id
-                    GROUP BY c2.CUST_ID, c2.FIRSTNAME, c2.LASTNAME
-                    ORDER BY common_count DESC
-                    FETCH FIRST 5 ROWS ONLY
-                """, {'cust_id': customer_id})
-            
-            similar_customers = cursor.fetchall()
-            for sim_id, sim_name, common_count in similar_customers:
-                nodes.append({
-                    'id': f'c{sim_id}', 
-                    'label': sim_name, 
-                    'type': 'customer', 
-                    'group': 3, 
-                    'size': 10, 
-                    'common_movies': int(common_count)
-                })
-                links.append({
-                    'source': f'c{customer_row[0]}', 
-                    'target': f'c{sim_id}', 
-                    'value': 2
-                })
-        
-        cursor.close()
-        conn.close()
-        
-        stats = {
-            'total_nodes': len(nodes),
-            'total_links': len(links),
-            'customers': len([n for n in nodes if n['type'] == 'customer']),
-            'movies': len([n for n in nodes if n['type'] == 'movie'])
-        }
-        
+
+        nodes, links, truncated = [], [], set()
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            for level in network_levels(cursor, customer_id, depth, limit):
+                nodes += level['nodes']
+                links += level['links']
+                truncated.update(level['truncated'])
+
         return jsonify({
-            'success': True, 
-            'nodes': nodes, 
-            'links': links, 
-            'stats': stats
+            'success': True,
+            'nodes': nodes,
+            'links': links,
+            'stats': {**network_stats(nodes, links), 'depth': depth, 'truncated': sorted(truncated)}
         })
-        
+
     except Exception as e:
         print(f"❌ Erro: {e}")
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
+@app.route('/api/graph/network/<int:customer_id>/stream', methods=['GET'])
+def stream_network_graph(customer_id):
+    """Mesma rede via Server-Sent Events: um evento 'level' por nível do BFS, depois 'done'"""
+    try:
+        depth, limit = network_args()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'depth e limit devem ser inteiros'}), 400
 
     try:
-        data = request.get_json() or {}
-        message = (data.get('message', '') or '').strip()
-        customer_id = data.get('customer_id', None)
+        if not profile_cache.get(customer_id):
+            return jsonify({'success': False, 'error': 'Cliente não encontrado'}), 404
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        if not message:
-            return jsonify({'success': False, 'error': 'Message required'}), 400
+    def generate():
+        totals = {'total_nodes': 0, 'total_links': 0, 'customers': 0, 'movies': 0}
+        truncated = set()
+        try:
+            with get_db_connection() as conn, conn.cursor() as cursor:
+                for level in network_levels(cursor, customer_id, depth, limit):
+                    for key, value in network_stats(level['nodes'], level['links']).items():
+                        totals[key] += value
+                    truncated.update(level['truncated'])
+                    yield sse_event('level', level)
+            yield sse_event('done', {'stats': {**totals, 'depth': depth, 'truncated': sorted(truncated)}})
+        except Exception as e:
+            print(f"❌ Erro no stream da rede: {e}")
+            traceback.print_exc()
+            yield sse_event('error', {'error': str(e)})
 
-        graph_context = []
-        movie_recommendations = []
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-        if customer_id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
 
-            try:
-                # PGQL: Filmes assistidos
-                try:
-                    pgql_watched = f"""
-                        SELECT title, genres
-                        FROM GRAPH_TABLE ({GRAPH_NAME}
-                            MATCH (c:customer)-[:watched]->(m:movie)
-                            WHERE c.cust_id = :cust_id
-                            COLUMNS (m.title AS title, m.genres AS genres)
-                        )
-                        FETCH FIRST 5 ROWS ONLY
-                    """
-                    cursor.execute(pgql_watched, {'cust_id': customer_id})
-                except:
-                    cursor.execute(f"""
-                        SELECT m.TITLE, m.GENRES
-                        FROM {SCHEMA}.WATCHED_MOVIE w
-                        JOIN {SCHEMA}.MOVIES m ON w.MOVIE_ID = m.MOVIE_ID
-                        WHERE w.PROMO_CUST_ID = :cust_id
-                        FETCH FIRST 5 ROWS ONLY
-                    """, {'cust_id': customer_id})
-
-                watched = [row[0] for row in cursor.fetchall()]
-                if watched:
-                    graph_context.append(f"Você assistiu: {', '.join(watched)}")
+CHAT_CONTEXT_WORKERS = int(os.getenv('CHAT_CONTEXT_WORKERS', 8))
+# Cada busca de contexto do chat pega a própria conexão do pool
+_chat_executor = ThreadPoolExecutor(max_workers=CHAT_CONTEXT_WORKERS, thread_name_prefix='chat-context')
 
-                # PGQL: Recomendações do grafo
-                try:
-                    pgql_recs = f"""
-                        SELECT 
-                            movie_id,
-                            title,
-                            summary,
-                            rating,
-                            genres,
-                            similar_users
-                        FROM GRAPH_TABLE ({GRAPH_NAME}
-                            MATCH (c1:customer)-[:watched]->(m:movie)<-[:watched]-(c2:customer)-[:watched]->(m2:movie)
-                            WHERE c1.cust_id = :cust_id 
-                              AND c2.cust_id != :cust_id
-                            COLUMNS (
-                                m2.movie_id AS movie_id,
-                                m2.title AS title,
-                                m2.summary AS summary,
-                                m2.rating AS rating,
-                                m2.genres AS genres,
-                                COUNT(DISTINCT c2.cust_id) AS similar_users
-                            )
-                        )
-                        GROUP BY movie_id, title, summary, rating, genres, similar_users
-                        ORDER BY similar_users DESC, rating DESC
-                        FETCH FIRST 3 ROWS ONLY
-                    """
-                    cursor.execute(pgql_recs, {'cust_id': customer_id})
-                except:
-                    cursor.execute(f"""
-                        SELECT m2.MOVIE_ID, m2.TITLE, m2.SUMMARY, m2.RATING, m2.GENRES,
-                               COUNT(DISTINCT c2.CUST_ID) as similar_users
-                        FROM {SCHEMA}.WATCHED_MOVIE w1
-                        JOIN {SCHEMA}.WATCHED_MOVIE w2 ON w1.MOVIE_ID = w2.MOVIE_ID
-                        JOIN {SCHEMA}.MOVIES_CUSTOMER c2 ON w2.PROMO_CUST_ID = c2.CUST_ID
-                        JOIN {SCHEMA}.WATCHED_MOVIE w3 ON c2.CUST_ID = w3.PROMO_CUST_ID
-                        JOIN {SCHEMA}.MOVIES m2 ON w3.MOVIE_ID = m2.MOVIE_ID
-                        WHERE w1.PROMO_CUST_ID = :cust_id
-                          AND c2.CUST_ID != :cust_id
-                          AND m2.MOVIE_ID NOT IN (
-                              SELECT MOVIE_ID FROM {SCHEMA}.WATCHED_MOVIE 
-                              WHERE PROMO_CUST_ID = :cust_id
-                          )
-                        GROUP BY m2.MOVIE_ID, m2.TITLE, m2.SUMMARY, m2.RATING, m2.GENRES
-                        ORDER BY similar_users DESC, m2.RATING DESC
-                        FETCH FIRST 3 ROWS ONLY
-                    """, {'cust_id': customer_id})
-
-                for row in cursor.fetchall():
-                    # Buscar poster
-                    cursor2 = conn.cursor()
-                    cursor2.execute(f"""
-                        SELECT ASSET_URL FROM {SCHEMA}.MEDIA_ASSETS 
-                        WHERE MOVIE_ID = :mid AND ASSET_TYPE = 'poster_url'
-                    """, {'mid': row[0]})
-                    poster_row = cursor2.fetchone()
-                    poster_url = poster_row[0] if poster_row else None
-                    cursor2.close()
-                    
-                    movie_recommendations.append({
-                        'id': row[0],
-                        'title': row[1],
-                        'summary': row[2],
-                        'rating': float(row[3]) if row[3] else 0,
-                        'genres': parse_genres(row[4]),
-                        'similar_users': int(row[5]),
-                        'poster_url': poster_url,
-                        'graph_reason': f'Baseado em {row[5]} usuários com gostos similares'
-                    })
 
-                if movie_recommendations:
-                    titles = [m['title'] for m in movie_recommendations]
-                    graph_context.append(f"Recomendações do Property Graph: {', '.join(titles)}")
+def chat_watched_titles(customer_id):
+    """Até 5 títulos assistidos pelo cliente (snapshot do perfil)"""
+    profile = profile_cache.get(customer_id)
+    return profile.titles(5) if profile else []
 
-            except Exception as e:
-                print(f"⚠️  Erro ao buscar contexto: {e}")
-            finally:
-                cursor.close()
-                conn.close()
 
-        # Prompt para o LLM
-        context_text = "\n".join(graph_context) if graph_context else "Sem histórico"
+def chat_recommendations(customer_id):
+    """Cards de recomendação do chat (3 filmes) a partir do grafo de co-visualização"""
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        rec_rows, posters, _ = graph_recommendations(cursor, customer_id, 3)
+
+    return [{
+        'id': row[0],
+        'title': row[1],
+        'summary': row[2],
+        'rating': float(row[3]) if row[3] else 0,
+        'genres': parse_genres(row[4]),
+        'similar_users': int(row[5]),
+        'poster_url': posters.get(row[0]),
+        'graph_reason': f'Baseado em {row[5]} usuários com gostos similares'
+    } for row in rec_rows]
+
 
-        prompt = f"""Você é um assistente de cinema. Seja BREVE e NATURAL.
+def submit_chat_context(customer_id):
+    """Dispara em paralelo as duas buscas de contexto; devolve {'watched': future, 'recommendations': future}"""
+    return {
+        'watched': metrics.submit(_chat_executor, chat_watched_titles, customer_id),
+        'recommendations': metrics.submit(_chat_executor, chat_recommendations, customer_id),
+    }
+
+
+def chat_context_lines(watched, movie_recommendations):
+    graph_context = []
+    if watched:
+        graph_context.append(f"Você assistiu: {', '.join(watched)}")
+    if movie_recommendations:
+        titles = [m['title'] for m in movie_recommendations]
+        graph_context.append(f"Recomendações do Property Graph: {', '.join(titles)}")
+    return graph_context
+
+
+def build_chat_prompt(graph_context, message):
+    context_text = "\n".join(graph_context) if graph_context else "Sem histórico"
+
+    return f"""Você é um assistente de cinema. Seja BREVE e NATURAL.
 
 CONTEXTO DO USUÁRIO (via Property Graph com PGQL):
 {context_text}
@@ -1033,7 +1094,37 @@ INSTRUÇÕES:
 
 RESPOSTA:"""
 
-        llm_response = get_llm_response(prompt, temperature=0.7, max_tokens=200)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+
+    try:
+        data = request.get_json() or {}
+        message = (data.get('message', '') or '').strip()
+        customer_id = data.get('customer_id', None)
+
+        if not message:
+            return jsonify({'success': False, 'error': 'Message required'}), 400
+
+        results = {'watched': [], 'recommendations': []}
+        futures = submit_chat_context(customer_id) if customer_id else {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"⚠️  Erro ao buscar contexto ({name}): {e}")
+
+        movie_recommendations = results['recommendations']
+        graph_context = chat_context_lines(results['watched'], movie_recommendations)
+        prompt = build_chat_prompt(graph_context, message)
+
+        llm_response, cache_origin = get_cached_llm_response(
+            prompt, message, graph_context, 'chat', temperature=0.7, max_tokens=200
+        )
 
         return jsonify({
             'success': True,
@@ -1041,7 +1132,8 @@ RESPOSTA:"""
             'response': llm_response,
             'movie_cards': movie_recommendations,
             'graph_used': len(graph_context) > 0,
-            'method': 'property_graph_pgql'
+            'method': 'property_graph_pgql',
+            'cached': cache_origin
         })
 
     except Exception as e:
@@ -1050,6 +1142,65 @@ RESPOSTA:"""
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Mesmo chat de /api/chat em Server-Sent Events:
+    start -> cards (assim que o grafo responde) -> token* -> done
+    """
+    data = request.get_json() or {}
+    message = (data.get('message', '') or '').strip()
+    customer_id = data.get('customer_id', None)
+
+    if not message:
+        return jsonify({'success': False, 'error': 'Message required'}), 400
+
+    futures = submit_chat_context(customer_id) if customer_id else {}
+
+    def generate():
+        yield sse_event('start', {'message': message})
+
+        results = {'watched': [], 'recommendations': []}
+        names = {future: name for name, future in futures.items()}
+        for future in as_completed(names):
+            try:
+                results[names[future]] = future.result()
+            except Exception as e:
+                print(f"⚠️  Erro ao buscar contexto ({names[future]}): {e}")
+            if names[future] == 'recommendations' and results['recommendations']:
+                yield sse_event('cards', {'movie_cards': results['recommendations'], 'graph_used': True})
+
+        graph_context = chat_context_lines(results['watched'], results['recommendations'])
+        prompt = build_chat_prompt(graph_context, message)
+
+        lookup = LLMCacheLookup(prompt, message, graph_context, 'chat', temperature=0.7, max_tokens=200)
+        answer, cache_origin, _ = lookup.get()
+        if answer is not None:
+            yield sse_event('token', {'text': answer})
+        else:
+            chunks = []
+            try:
+                for chunk in stream_llm_response(prompt, temperature=0.7, max_tokens=200):
+                    chunks.append(chunk)
+                    yield sse_event('token', {'text': chunk})
+            except Exception as e:
+                print(f"❌ Erro no streaming do chat: {e}")
+                yield sse_event('error', {'error': str(e)})
+                return
+            answer = ''.join(chunks)
+            lookup.put(answer)
+
+        yield sse_event('done', {
+            'response': answer,
+            'graph_used': len(graph_context) > 0,
+            'method': 'property_graph_pgql',
+            'cached': cache_origin
+        })
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/chat/smart', methods=['POST'])
 def smart_chat():
     """Chat inteligente simplificado"""
@@ -1064,27 +1215,13 @@ def smart_chat():
         graph_context = []
 
         if customer_id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
             try:
-                cursor.execute(f"""
-                    SELECT m.TITLE
-                    FROM {SCHEMA}.WATCHED_MOVIE w
-                    JOIN {SCHEMA}.MOVIES m ON w.MOVIE_ID = m.MOVIE_ID
-                    WHERE w.PROMO_CUST_ID = :cust_id
-                    FETCH FIRST 5 ROWS ONLY
-                """, {'cust_id': customer_id})
-
-                watched = [row[0] for row in cursor.fetchall()]
+                watched = chat_watched_titles(customer_id)
                 if watched:
                     graph_context.append(f"Filmes assistidos: {', '.join(watched)}")
 
             except Exception as e:
                 print(f"⚠️  Erro: {e}")
-            finally:
-                cursor.close()
-                conn.close()
 
         context_text = "\n".join(graph_context) if graph_context else "Sem histórico"
 
@@ -1097,14 +1234,17 @@ PERGUNTA: {message}
 
 Responda em até 3 frases."""
 
-        llm_response = get_llm_response(prompt, temperature=0.7, max_tokens=200)
+        llm_response, cache_origin = get_cached_llm_response(
+            prompt, message, graph_context, 'chat_smart', temperature=0.7, max_tokens=200
+        )
 
         return jsonify({
             'success': True,
             'message': message,
             'response': llm_response,
             'graph_insights': graph_context,
-            'context_used': len(graph_context) > 0
+            'context_used': len(graph_context) > 0,
+            'cached': cache_origin
         })
 
     except Exception as e:
@@ -1113,18 +1253,50 @@ Responda em até 3 frases."""
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Histogramas por etapa + gauges no formato texto do Prometheus"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _pool_gauge(field):
+    stats = pool_stats()
+    return [({}, stats[field])] if stats['initialized'] else []
+
+
+metrics.register_gauge('db_pool_busy', 'Conexões emprestadas do pool', lambda: _pool_gauge('busy'))
+metrics.register_gauge('db_pool_opened', 'Conexões abertas no pool', lambda: _pool_gauge('opened'))
+metrics.register_gauge('cache_hit_rate', 'Taxa de acerto dos caches', lambda: [
+    ({'cache': name}, cache.stats().get('hit_rate', 0.0))
+    for name, cache in (('response', response_cache), ('profile', profile_cache), ('embedding', embedding_cache))
+])
+metrics.register_gauge('write_behind_pending', 'Visualizações no log ainda não gravadas no banco',
+                       lambda: [({}, watch_buffer_stats().get('pending', 0))])
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM DUAL")
-        cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return jsonify({'status': 'healthy', 'database': 'connected'})
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            repository.fetch_one(cursor, 'health.ping')
+        return jsonify({
+            'status': 'healthy',
+            'database': 'connected',
+            'pool': pool_stats(),
+            'embedding_cache': embedding_cache.stats(),
+            'llm_cache': llm_cache.stats(),
+            'profile_cache': profile_cache.stats(),
+            'media_assets': media_assets.stats(),
+            'response_cache': response_cache.stats(),
+            'text_index': text_index_stats(),
+            'write_behind': watch_buffer_stats(),
+            'customer_ids': allocator.stats(),
+            'capabilities': capabilities.stats(),
+            'statements': repository_stats(),
+            'movie_catalog': movie_catalog_stats()
+        })
     except Exception as e:
-        return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+        return jsonify({'status': 'unhealthy', 'error': str(e), 'pool': pool_stats()}), 500
 
 
 if __name__ == '__main__':
@@ -1133,4 +1305,12 @@ if __name__ == '__main__':
     print("=" * 60)
     print("🌐 Server: http://0.0.0.0:8000")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    # Com o reloader do debug só o processo filho serve requisições (e abre o log)
+    if write_behind_enabled() and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        watch_buffer()
+    try:
+        # Cada rota já começa no melhor plano; depois o probe se repete sozinho
+        capabilities.probe_all()
+    except Exception as e:
+        print(f"⚠️  Probe de recursos adiado para a primeira requisição: {e}")
+    app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,135 @@
+"""
+CineGen AI - Backfill de MOVIE_VECTORS
+✅ Lê o CSV em streaming e gera embeddings de título + descrição em lote
+✅ Grava com MERGE + executemany (um round trip por bloco)
+✅ Checkpoint em disco: depois de um crash, retoma do último bloco gravado
+
+Uso:
+    python backfill_embeddings.py --csv Dataset/netflix_titles_dataset.csv
+    python backfill_embeddings.py --restart   # ignora o checkpoint
+"""
+
+import argparse
+import json
+import time
+import csv
+import os
+
+import oracledb
+
+from db import SCHEMA, get_db_connection
+from genai import generate_embeddings, GENAI_CONFIG
+from vector_index import vector_literal
+
+DEFAULT_CSV = os.path.join('Dataset', 'netflix_titles_dataset.csv')
+DEFAULT_CHECKPOINT = os.path.join('cache', 'backfill_embeddings.checkpoint.json')
+
+
+def embedding_text(row):
+    title = (row.get('title') or '').strip()
+    description = (row.get('description') or '').strip()
+    return f"{title}. {description}" if description else title
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'last_row': -1, 'written': 0, 'skipped': 0}
+
+
+def save_checkpoint(path, state):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def load_movie_ids(cursor):
+    """Mapa título (normalizado) -> MOVIE_ID, numa única varredura de MOVIES"""
+    cursor.arraysize = 1000
+    cursor.execute(f"SELECT MOVIE_ID, TITLE FROM {SCHEMA}.MOVIES")
+    return {(title or '').strip().lower(): movie_id for movie_id, title in cursor}
+
+
+def iter_chunks(csv_path, start_row, chunk_size):
+    chunk = []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            if index <= start_row:
+                continue
+            chunk.append((index, row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_vectors(conn, cursor, rows):
+    cursor.setinputsizes(embedding=oracledb.DB_TYPE_CLOB)
+    cursor.executemany(f"""
+        MERGE INTO {SCHEMA}.MOVIE_VECTORS mv
+        USING (SELECT :movie_id AS MOVIE_ID, TO_VECTOR(:embedding) AS EMBEDDING FROM DUAL) src
+        ON (mv.MOVIE_ID = src.MOVIE_ID)
+        WHEN MATCHED THEN UPDATE SET mv.EMBEDDING = src.EMBEDDING
+        WHEN NOT MATCHED THEN INSERT (MOVIE_ID, EMBEDDING) VALUES (src.MOVIE_ID, src.EMBEDDING)
+    """, rows)
+    conn.commit()
+
+
+def backfill(csv_path, checkpoint_path, chunk_size, restart=False):
+    state = {'last_row': -1, 'written': 0, 'skipped': 0} if restart else load_checkpoint(checkpoint_path)
+    if state['last_row'] >= 0:
+        print(f"↻ Retomando após a linha {state['last_row']} ({state['written']} vetores já gravados)")
+
+    started = time.perf_counter()
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        movie_ids = load_movie_ids(cursor)
+        print(f"✓ {len(movie_ids)} filmes carregados de MOVIES")
+
+        for chunk in iter_chunks(csv_path, state['last_row'], chunk_size):
+            matched = []
+            for _, row in chunk:
+                movie_id = movie_ids.get((row.get('title') or '').strip().lower())
+                if movie_id is None:
+                    state['skipped'] += 1
+                else:
+                    matched.append((movie_id, embedding_text(row)))
+
+            if matched:
+                embeddings = generate_embeddings([text for _, text in matched])
+                write_vectors(conn, cursor, [
+                    {'movie_id': movie_id, 'embedding': vector_literal(embedding)}
+                    for (movie_id, _), embedding in zip(matched, embeddings)
+                ])
+                state['written'] += len(matched)
+
+            state['last_row'] = chunk[-1][0]
+            save_checkpoint(checkpoint_path, state)
+
+            elapsed = time.perf_counter() - started
+            print(f"  linha {state['last_row'] + 1}: {state['written']} gravados, "
+                  f"{state['skipped']} sem MOVIE_ID, {elapsed:.1f}s")
+
+    print(f"✓ Backfill concluído: {state['written']} vetores, {state['skipped']} linhas ignoradas")
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera e grava embeddings de filmes em MOVIE_VECTORS')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--chunk-size', type=int,
+                        default=GENAI_CONFIG['embed_batch_size'] * GENAI_CONFIG['embed_workers'],
+                        help='linhas por bloco (embeddings em paralelo + um executemany + commit)')
+    parser.add_argument('--restart', action='store_true', help='ignora o checkpoint e recomeça do início')
+    args = parser.parse_args()
+
+    backfill(args.csv, args.checkpoint, args.chunk_size, restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""
+CineGen AI - Benchmark offline dos endpoints (sem Autonomous DB e sem tenancy OCI)
+✅ Carrega Dataset/netflix_titles_dataset.csv + clientes e históricos sintéticos
+   (de 10k a 10M arestas; popularidade de filmes em cauda longa) no banco local
+   SQLite de local_db.py, com as mesmas tabelas
+✅ App roda inalterado: DB_BACKEND=sqlite atrás de db.get_db_connection() e
+   GENAI_STUB=1 (embedding/LLM determinísticos, com latência simulada)
+✅ Cada endpoint recebe carga concorrente (threads com o test client do Flask)
+✅ Relatório por endpoint: req/s, p50/p95/p99, erros e round trips / executes /
+   linhas por requisição (contados pelo banco local como o oracledb faria)
+✅ --json grava o resultado; --baseline compara com uma execução anterior e
+   sai com código 1 se p95 ou round trips pioraram além de --max-regression
+
+Uso:
+    python benchmark.py --edges 100000
+    python benchmark.py --edges 1000000 --concurrency 16 --requests 500 --json bench.json
+    python benchmark.py --edges 1000000 --baseline bench.json --max-regression 0.2
+    python benchmark.py --endpoints recommendations,chat --llm-latency-ms 800
+
+Os números medem o app + SQLite local: servem para comparar versões do código
+entre si, não para prever a latência do Oracle em produção.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import argparse
+import sqlite3
+import random
+import json
+import time
+import csv
+import os
+
+import numpy as np
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Dataset', 'netflix_titles_dataset.csv')
+
+BENCH_CONFIG = {
+    'edges': int(os.getenv('BENCH_EDGES', 100000)),
+    'avg_degree': int(os.getenv('BENCH_AVG_DEGREE', 20)),
+    'concurrency': int(os.getenv('BENCH_CONCURRENCY', 8)),
+    'requests': int(os.getenv('BENCH_REQUESTS', 200)),
+    'warmup': int(os.getenv('BENCH_WARMUP', 10)),
+    'seed': int(os.getenv('BENCH_SEED', 42)),
+    'embed_latency_ms': float(os.getenv('BENCH_EMBED_LATENCY_MS', 50)),
+    'llm_latency_ms': float(os.getenv('BENCH_LLM_LATENCY_MS', 300)),
+    'load_batch_size': 50000,
+    'first_customer_id': 101,
+}
+
+
+# ==================== CARGA ====================
+
+def load_movies(limit=None):
+    """(title, genres_json, summary, rating, year) do CSV da Netflix"""
+    movies = []
+    rng = random.Random(0)
+    with open(DATASET_PATH, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            genres = {genre.strip(): 1 for genre in (row.get('listed_in') or '').split(',') if genre.strip()}
+            year = int(row['release_year']) if (row.get('release_year') or '').isdigit() else 2024
+            movies.append((row['title'], json.dumps(genres), row.get('description') or '',
+                           round(rng.uniform(5.0, 9.5), 1), year))
+            if limit and len(movies) >= limit:
+                break
+    return movies
+
+
+def synthetic_edges(n_customers, n_movies, edges, seed):
+    """
+    Gera (cust_idx, movie_idx) únicos em blocos. Popularidade ~ Zipf (poucos filmes
+    hub, cauda longa) e grau dos clientes ~ lognormal em torno da média.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_movies + 1)
+    popularity = popularity[rng.permutation(n_movies)]
+    popularity /= popularity.sum()
+
+    degrees = rng.lognormal(mean=0.0, sigma=0.8, size=n_customers)
+    degrees = np.clip(np.round(degrees / degrees.mean() * edges / n_customers), 1, max(1, n_movies // 2)).astype(np.int64)
+
+    block = max(1, BENCH_CONFIG['load_batch_size'] * 20 // max(1, int(degrees.mean())))
+    for start in range(0, n_customers, block):
+        chunk = degrees[start:start + block]
+        customers = np.repeat(np.arange(start, start + chunk.size), chunk)
+        movies = rng.choice(n_movies, size=customers.size, p=popularity)
+        # Sorteio com reposição: duplicatas (cliente, filme) são descartadas
+        keys = np.unique(customers * n_movies + movies)
+        yield keys // n_movies, keys % n_movies
+
+
+def build_database(path, edges, avg_degree, seed, vectors=True):
+    """Cria o banco local do zero; devolve o resumo da carga"""
+    from local_db import create_pool
+    from genai import stub_embedding
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    create_pool(path, min=0).close()  # schema
+
+    started = time.perf_counter()
+    movies = load_movies()
+    n_movies = len(movies)
+    n_customers = max(100, edges // avg_degree)
+    first_id = BENCH_CONFIG['first_customer_id']
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA synchronous = OFF')
+    db.executemany("INSERT INTO MOVIES (MOVIE_ID, TITLE, GENRES, SUMMARY, RATING, YEAR) VALUES (?, ?, ?, ?, ?, ?)",
+                   [(i, *movie) for i, movie in enumerate(movies, 1)])
+    db.executemany("INSERT INTO MEDIA_ASSETS VALUES (?, ?, ?)",
+                   [(i, 'poster_url', f'https://posters.local/{i}.jpg') for i in range(1, n_movies + 1)] +
+                   [(i, 'trailer_url', f'https://trailers.local/{i}') for i in range(1, n_movies + 1, 2)])
+    if vectors:
+        db.executemany("INSERT INTO MOVIE_VECTORS VALUES (?, ?)", [
+            (i, json.dumps([round(x, 5) for x in stub_embedding(f'{title} {summary}')]))
+            for i, (title, _, summary, _, _) in enumerate(movies, 1)
+        ])
+    db.executemany("INSERT INTO MOVIES_CUSTOMER VALUES (?, ?, ?, ?)", [
+        (first_id + i, f'Cliente{i}', f'Sintético{i % 97}', f'cliente{i}@bench.local') for i in range(n_customers)
+    ])
+
+    written = 0
+    for customers, movie_idx in synthetic_edges(n_customers, n_movies, edges, seed):
+        rows = [(int(c) + first_id, int(m) + 1, (now - timedelta(minutes=rng.randrange(0, 730 * 1440))).isoformat(' '),
+                 rng.randint(1, 5)) for c, m in zip(customers, movie_idx)]
+        for i in range(0, len(rows), BENCH_CONFIG['load_batch_size']):
+            db.executemany("INSERT OR IGNORE INTO WATCHED_MOVIE VALUES (?, ?, ?, ?)",
+                           rows[i:i + BENCH_CONFIG['load_batch_size']])
+        written += len(rows)
+        print(f"  ↻ {written:,} arestas...", end='\r')
+    db.commit()
+    written = db.execute("SELECT COUNT(*) FROM WATCHED_MOVIE").fetchone()[0]
+    db.execute('ANALYZE')
+    db.close()
+
+    summary = {'movies': n_movies, 'customers': n_customers, 'edges': written, 'seed': seed,
+               'requested_edges': edges, 'vectors': vectors, 'load_seconds': round(time.perf_counter() - started, 1)}
+    with open(path + '.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    print(f"✓ Banco local: {n_movies} filmes, {n_customers:,} clientes, {written:,} arestas "
+          f"em {summary['load_seconds']}s ({path})")
+    return summary
+
+
+def existing_database(path, edges, avg_degree, seed):
+    """Resumo da carga anterior se ela tem a mesma escala (reaproveita o arquivo)"""
+    try:
+        with open(path + '.json', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    expected = max(100, edges // avg_degree)
+    if summary.get('requested_edges') != edges or summary.get('customers') != expected or summary.get('seed') != seed:
+        return None
+    return summary
+
+
+# ==================== CENÁRIOS ====================
+
+QUERIES = ('love story', 'war', 'family comedy', 'documentary music', 'crime thriller',
+           'space adventure', 'high school', 'true story', 'detective', 'christmas')
+
+
+def scenarios(summary):
+    """nome -> fn(rng) que devolve (método, url, json); chamar depois de importar o app"""
+    from app import encode_cursor
+
+    first_id = BENCH_CONFIG['first_customer_id']
+    last_id = first_id + summary['customers'] - 1
+    n_movies = summary['movies']
+
+    def customer(rng):
+        return rng.randint(first_id, last_id)
+
+    return {
+        'movies': lambda rng: ('GET', f"/api/movies?limit=20&cursor={encode_cursor(rng.randrange(0, n_movies - 20), '')}",
+                               None),
+        'movies_search': lambda rng: ('GET', f'/api/movies?search={rng.choice(QUERIES).split()[0]}&limit=10', None),
+        'customers': lambda rng: ('GET', '/api/customers', None),
+        'vector_search': lambda rng: ('POST', '/api/search/vector', {'query': rng.choice(QUERIES), 'top_k': 5}),
+        'hybrid_search': lambda rng: ('POST', '/api/search/hybrid',
+                                      {'query': rng.choice(QUERIES), 'customer_id': customer(rng), 'top_k': 10}),
+        'neighbors': lambda rng: ('GET', f'/api/customers/{customer(rng)}/neighbors?k=10', None),
+        'recommendations': lambda rng: ('GET', f'/api/graph/recommendations/{customer(rng)}', None),
+        'customer_graph': lambda rng: ('GET', f'/api/graph/customer/{customer(rng)}', None),
+        'compare': lambda rng: ('GET', f'/api/graph/compare/{customer(rng)}/{customer(rng)}', None),
+        'network': lambda rng: ('GET', f'/api/graph/network/{customer(rng)}?depth=2', None),
+        'chat': lambda rng: ('POST', '/api/chat', {'message': f'Quero um filme de {rng.choice(QUERIES)}',
+                                                   'customer_id': customer(rng)}),
+        'chat_smart': lambda rng: ('POST', '/api/chat/smart', {'message': f'Algo tipo {rng.choice(QUERIES)}?',
+                                                               'customer_id': customer(rng)}),
+        'watch': lambda rng: ('POST', f'/api/customers/{customer(rng)}/watch',
+                              {'movie_id': rng.randint(1, n_movies), 'rating': rng.randint(1, 5)}),
+    }
+
+
+# ==================== CARGA CONCORRENTE ====================
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 2) if values else 0.0
+
+
+def run_scenario(app, pool, name, make_request, requests, concurrency, warmup, seed):
+    rng = random.Random(seed)
+    specs = [make_request(rng) for _ in range(warmup + requests)]
+
+    def call(client, spec):
+        method, url, body = spec
+        started = time.perf_counter()
+        try:
+            response = client.open(url, method=method, json=body)
+            response.get_data()  # consome respostas em streaming
+            status = response.status_code
+        except Exception as e:
+            print(f"  ❌ {name} {url}: {e}")
+            status = 599
+        return (time.perf_counter() - started) * 1000, status
+
+    client = app.test_client()
+    for spec in specs[:warmup]:
+        call(client, spec)
+
+    before = pool.snapshot()
+    pending = iter(specs[warmup:])
+
+    def worker(_):
+        own_client = app.test_client()
+        results = []
+        for spec in pending:  # iterador compartilhado: next() de list_iterator é atômico no CPython
+            results.append(call(own_client, spec))
+        return results
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = [sample for results in executor.map(worker, range(concurrency)) for sample in results]
+    elapsed = time.perf_counter() - started
+    after = pool.snapshot()
+
+    latencies = [ms for ms, _ in samples]
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    count = len(samples) or 1
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status in samples if status >= 500),
+        'statuses': statuses,
+        'throughput': round(len(samples) / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': round(max(latencies), 2) if latencies else 0.0,
+        'round_trips_per_request': round((after['round_trips'] - before['round_trips']) / count, 2),
+        'executes_per_request': round((after['executes'] - before['executes']) / count, 2),
+        'rows_per_request': round((after['rows'] - before['rows']) / count, 1),
+    }
+
+
+def print_report(results):
+    header = f"{'endpoint':<16}{'req':>6}{'err':>5}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'RT/req':>8}{'exec':>7}{'rows':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        print(f"{name:<16}{r['requests']:>6}{r['errors']:>5}{r['throughput']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['round_trips_per_request']:>8}{r['executes_per_request']:>7}{r['rows_per_request']:>8}")
+
+
+def compare_baseline(results, baseline, max_regression):
+    """Lista de regressões (p95 e round trips por requisição) em relação ao baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p95_ms', 'round_trips_per_request'):
+            before, now = previous[metric], current[metric]
+            if before > 0 and now > before * (1 + max_regression):
+                regressions.append(f"{name}.{metric}: {before} -> {now} (+{(now / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def configure_environment(args, db_path):
+    """Antes de importar o app: banco local, GenAI stub e caches do app conforme as flags"""
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['DB_SQLITE_PATH'] = db_path
+    os.environ['DB_POOL_MAX'] = str(max(args.concurrency * 2, 4))
+    os.environ['GENAI_STUB'] = '1'
+    os.environ['GENAI_STUB_EMBED_LATENCY_MS'] = str(args.embed_latency_ms)
+    os.environ['GENAI_STUB_LLM_LATENCY_MS'] = str(args.llm_latency_ms)
+    if not args.app_caches:
+        # Mede o caminho quente (banco + grafo), não o acerto de cache da mesma URL
+        os.environ['RESPONSE_CACHE_ENABLED'] = '0'
+        os.environ['LLM_CACHE_ENABLED'] = '0'
+        os.environ['EMBED_CACHE_PATH'] = ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline dos endpoints com banco local e GenAI stub')
+    parser.add_argument('--edges', type=int, default=BENCH_CONFIG['edges'], help='visualizações sintéticas (10k a 10M)')
+    parser.add_argument('--avg-degree', type=int, default=BENCH_CONFIG['avg_degree'], help='filmes por cliente (média)')
+    parser.add_argument('--db', help='arquivo SQLite (padrão: cache/benchmark_<edges>.db)')
+    parser.add_argument('--reload', action='store_true', help='recria o banco mesmo se a escala for a mesma')
+    parser.add_argument('--no-vectors', action='store_true', help='não grava MOVIE_VECTORS (carga mais rápida)')
+    parser.add_argument('--endpoints', help='lista separada por vírgula (padrão: todos)')
+    parser.add_argument('--concurrency', type=int, default=BENCH_CONFIG['concurrency'])
+    parser.add_argument('--requests', type=int, default=BENCH_CONFIG['requests'], help='requisições por endpoint')
+    parser.add_argument('--warmup', type=int, default=BENCH_CONFIG['warmup'], help='requisições por endpoint fora da medição')
+    parser.add_argument('--seed', type=int, default=BENCH_CONFIG['seed'])
+    parser.add_argument('--embed-latency-ms', type=float, default=BENCH_CONFIG['embed_latency_ms'])
+    parser.add_argument('--llm-latency-ms', type=float, default=BENCH_CONFIG['llm_latency_ms'])
+    parser.add_argument('--app-caches', action='store_true', help='mantém cache de respostas/LLM/embeddings ligados')
+    parser.add_argument('--json', dest='json_path', help='grava config + resultados em JSON')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='piora tolerada (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join('cache', f'benchmark_{args.edges}.db')
+    # genai/db leem o ambiente no import (a carga já usa o stub_embedding)
+    configure_environment(args, db_path)
+    summary = None if args.reload else existing_database(db_path, args.edges, args.avg_degree, args.seed)
+    if summary is None:
+        print(f"→ Carregando {args.edges:,} arestas sintéticas...")
+        summary = build_database(db_path, args.edges, args.avg_degree, args.seed, vectors=not args.no_vectors)
+    else:
+        print(f"✓ Reaproveitando {db_path} ({summary['edges']:,} arestas)")
+
+    import app as flask_app
+    from db import get_pool
+
+    available = scenarios(summary)
+    names = [name.strip() for name in args.endpoints.split(',')] if args.endpoints else list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error(f"endpoints desconhecidos: {', '.join(unknown)} (use: {', '.join(available)})")
+
+    pool = get_pool()
+    results = {}
+    for i, name in enumerate(names):
+        print(f"→ {name} ({args.requests} req, {args.concurrency} threads)...")
+        results[name] = run_scenario(flask_app.app, pool, name, available[name], args.requests,
+                                     args.concurrency, args.warmup, args.seed + i)
+
+    print()
+    print_report(results)
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'dataset': summary,
+        'config': {key: getattr(args, key) for key in ('concurrency', 'requests', 'warmup', 'seed',
+                                                         'embed_latency_ms', 'llm_latency_ms', 'app_caches')},
+        'results': results
+    }
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Resultado em {args.json_path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_baseline(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"  ❌ {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"✓ Sem regressões acima de {args.max_regression:.0%} em relação a {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
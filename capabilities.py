@@ -0,0 +1,158 @@
+"""
+CineGen AI - Detecção de recursos do banco (grafo, MEDIA_ASSETS, funções vetoriais)
+✅ Probe barato por recurso no startup e de novo a cada probe_interval_seconds
+✅ Rotas perguntam capabilities.use(nome, cursor) e vão direto ao melhor plano:
+   sem o Property Graph nenhuma requisição paga mais o parse/erro do GRAPH_TABLE
+✅ Circuit breaker: failure_threshold erros seguidos no caminho principal
+   desligam o recurso; depois de open_seconds um novo probe decide se ele volta
+✅ Estado de cada recurso em /api/health e em /api/metrics
+"""
+
+import threading
+import time
+import os
+
+from db import SCHEMA, GRAPH_NAME, get_db_connection
+import metrics
+
+CAPABILITY_CONFIG = {
+    'probe_interval_seconds': int(os.getenv('CAPABILITY_PROBE_INTERVAL_SECONDS', 300)),
+    'failure_threshold': int(os.getenv('CAPABILITY_FAILURE_THRESHOLD', 3)),
+    'open_seconds': int(os.getenv('CAPABILITY_OPEN_SECONDS', 60)),
+}
+
+# Uma linha no máximo: o probe só precisa de parse + execute sem erro
+PROBES = {
+    'graph': f"""
+        SELECT cust_id FROM GRAPH_TABLE ({GRAPH_NAME}
+            MATCH (c:customer)-[:watched]->(m:movie)
+            COLUMNS (c.cust_id AS cust_id)
+        ) FETCH FIRST 1 ROWS ONLY
+    """,
+    'media_assets': f"SELECT 1 FROM {SCHEMA}.MEDIA_ASSETS FETCH FIRST 1 ROWS ONLY",
+    'vector': """
+        SELECT VECTOR_DISTANCE(TO_VECTOR('[1, 0]'), TO_VECTOR('[0, 1]'), COSINE) FROM DUAL
+    """,
+}
+
+
+class Capability:
+
+    def __init__(self, name, probe_sql):
+        self.name = name
+        self.probe_sql = probe_sql
+        self.available = None      # None = ainda não testado
+        self.next_probe_at = 0.0
+        self.failures = 0          # erros seguidos no caminho principal
+        self.last_error = None
+        self.metrics = {'probes': 0, 'probe_failures': 0, 'trips': 0, 'runtime_errors': 0}
+        self._lock = threading.Lock()
+        self._probing = False
+
+    def probe(self, cursor):
+        self.metrics['probes'] += 1
+        try:
+            with metrics.stage('capability_probe', self.name):
+                cursor.execute(self.probe_sql)
+                cursor.fetchall()
+            available, error = True, None
+        except Exception as e:
+            self.metrics['probe_failures'] += 1
+            available, error = False, str(e)
+
+        with self._lock:
+            changed = available != self.available
+            self.available = available
+            self.failures = 0
+            self.last_error = error or self.last_error
+            self.next_probe_at = time.time() + CAPABILITY_CONFIG['probe_interval_seconds']
+        if changed:
+            print(f"{'✓' if available else '⚠️ '} Recurso '{self.name}' "
+                  f"{'disponível' if available else f'indisponível, usando fallback: {error}'}")
+        return available
+
+    def use(self, cursor=None):
+        """True se o caminho principal deve ser tentado; reprova quando o probe venceu"""
+        if time.time() >= self.next_probe_at:
+            with self._lock:
+                # Só uma requisição faz o probe; as outras seguem com o estado atual
+                probe_now = not self._probing
+                self._probing = True
+            if probe_now:
+                try:
+                    if cursor is not None:
+                        self.probe(cursor)
+                    else:
+                        with get_db_connection() as conn, conn.cursor() as probe_cursor:
+                            self.probe(probe_cursor)
+                except Exception as e:
+                    # Sem conexão não dá para concluir nada: mantém o estado e tenta de novo depois
+                    print(f"⚠️  Probe de '{self.name}' falhou: {e}")
+                finally:
+                    self._probing = False
+        return bool(self.available)
+
+    def succeeded(self):
+        self.failures = 0
+
+    def failed(self, error):
+        """Erro no caminho principal; abre o circuito depois de failure_threshold seguidos"""
+        with self._lock:
+            self.metrics['runtime_errors'] += 1
+            self.failures += 1
+            self.last_error = str(error)
+            if self.failures < CAPABILITY_CONFIG['failure_threshold'] or not self.available:
+                return
+            self.available = False
+            self.failures = 0
+            self.metrics['trips'] += 1
+            self.next_probe_at = time.time() + CAPABILITY_CONFIG['open_seconds']
+        print(f"⚠️  Recurso '{self.name}' desligado após erros seguidos; novo probe em "
+              f"{CAPABILITY_CONFIG['open_seconds']}s: {error}")
+
+    def stats(self):
+        return {
+            **self.metrics,
+            'available': self.available,
+            'consecutive_failures': self.failures,
+            'next_probe_in_seconds': round(max(0.0, self.next_probe_at - time.time()), 1),
+            'last_error': self.last_error
+        }
+
+
+class CapabilityRegistry:
+
+    def __init__(self, probes=PROBES):
+        self._capabilities = {name: Capability(name, sql) for name, sql in probes.items()}
+
+    def __getitem__(self, name):
+        return self._capabilities[name]
+
+    def use(self, name, cursor=None):
+        return self._capabilities[name].use(cursor)
+
+    def succeeded(self, name):
+        self._capabilities[name].succeeded()
+
+    def failed(self, name, error):
+        self._capabilities[name].failed(error)
+
+    def probe_all(self, cursor=None):
+        """Probe imediato de todos os recursos (startup)"""
+        if cursor is None:
+            with get_db_connection() as conn, conn.cursor() as probe_cursor:
+                return self.probe_all(probe_cursor)
+        return {name: capability.probe(cursor) for name, capability in self._capabilities.items()}
+
+    def stats(self):
+        return {name: capability.stats() for name, capability in self._capabilities.items()}
+
+
+capabilities = CapabilityRegistry()
+
+metrics.register_gauge('capability_available', 'Recurso do banco em uso (1) ou em fallback (0)', lambda: [
+    ({'capability': name}, 1 if state['available'] else 0) for name, state in capabilities.stats().items()
+])
+metrics.register_gauge('capability_trips', 'Vezes que o circuit breaker desligou o recurso', lambda: [
+    ({'capability': name}, state['trips']) for name, state in capabilities.stats().items()
+])
@@ -0,0 +1,201 @@
+"""
+CineGen AI - Alocação de CUST_ID sem MAX()+1
+✅ Sequence com INCREMENT BY = tamanho do bloco; cada NEXTVAL
+   reserva um bloco inteiro e os ids saem do cache local, sem ida ao banco
+✅ Sem a sequence a alocação falha alto (SequenceMissingError) em vez de cair no
+   MAX()+1, que dá o mesmo id para dois INSERTs concorrentes
+✅ Importação em lote: ids de todos os blocos numa query + executemany por lote
+
+Uso:
+    python customer_ids.py --setup            # cria a sequence a partir do MAX atual
+    python customer_ids.py --import clientes.csv
+
+Blocos reservados e não usados viram buracos na numeração depois de um restart;
+os ids continuam únicos, só não são contíguos.
+
+Não há modo IDENTITY: o Oracle não converte uma coluna existente em IDENTITY
+(ORA-30673) e recriar MOVIES_CUSTOMER exigiria refazer o FK de WATCHED_MOVIE
+e o Property Graph que usam CUST_ID como chave.
+"""
+
+import threading
+import argparse
+import time
+import csv
+import os
+
+import oracledb
+
+from db import SCHEMA, get_db_connection
+import repository
+
+CUSTOMER_ID_CONFIG = {
+    'sequence': os.getenv('CUSTOMER_ID_SEQUENCE', 'MOVIES_CUSTOMER_SEQ'),
+    # Tem que ser igual ao INCREMENT BY da sequence
+    'block_size': int(os.getenv('CUSTOMER_ID_BLOCK_SIZE', 50)),
+    'import_batch_size': int(os.getenv('CUSTOMER_IMPORT_BATCH_SIZE', 1000)),
+}
+
+
+class SequenceMissingError(RuntimeError):
+    """Sequence de blocos ainda não criada (ORA-02289)"""
+
+
+def validate_customer(data):
+    """{'firstname', 'lastname', 'email'} sem espaços nas pontas; ValueError se faltar algum"""
+    customer = {field: (data.get(field, '') or '').strip() for field in ('firstname', 'lastname', 'email')}
+    if not all(customer.values()):
+        raise ValueError('Nome, sobrenome e email obrigatórios')
+    return customer
+
+
+class CustomerIdAllocator:
+
+    def __init__(self, sequence=None, block_size=None):
+        self.sequence = sequence or CUSTOMER_ID_CONFIG['sequence']
+        self.block_size = block_size or CUSTOMER_ID_CONFIG['block_size']
+        self._next = 0
+        self._limit = 0
+        self._lock = threading.Lock()
+        # NEXTVAL depende do nome da sequence: registrado por alocador no mesmo repositório
+        self._blocks_statement = repository.statement(f'customers.sequence_blocks.{self.sequence.lower()}', f"""
+            SELECT {SCHEMA}.{self.sequence}.NEXTVAL FROM DUAL CONNECT BY LEVEL <= :blocks
+        """, rows=None).name
+        self.metrics = {'allocated': 0, 'blocks_reserved': 0, 'sequence_missing': 0}
+
+    def _reserve_blocks(self, cursor, count):
+        """Um NEXTVAL por bloco, todos na mesma query"""
+        rows = repository.fetch_all(cursor, self._blocks_statement, {'blocks': count}, rows=count)
+        starts = sorted(int(row[0]) for row in rows)
+        self.metrics['blocks_reserved'] += len(starts)
+        return starts
+
+    def next_ids(self, cursor, count=1):
+        """count ids novos; só vai ao banco quando o bloco local acaba"""
+        with self._lock:
+            ids = list(range(self._next, min(self._limit, self._next + count)))
+            self._next += len(ids)
+            missing = count - len(ids)
+            if missing > 0:
+                try:
+                    starts = self._reserve_blocks(cursor, -(-missing // self.block_size))
+                except oracledb.DatabaseError as e:
+                    # Ids já tirados do bloco local voltam para o cache
+                    self._next -= len(ids)
+                    # ORA-02289: sequence ainda não criada; MAX()+1 aqui seria justamente a corrida
+                    if getattr(e.args[0], 'code', None) != 2289:
+                        raise
+                    self.metrics['sequence_missing'] += 1
+                    message = f"Sequence {self.sequence} não existe: rode 'python customer_ids.py --setup'"
+                    print(f"❌ {message}")
+                    raise SequenceMissingError(message) from e
+                for start in starts:
+                    take = min(self.block_size, missing)
+                    ids.extend(range(start, start + take))
+                    missing -= take
+                    self._next, self._limit = start + take, start + self.block_size
+            self.metrics['allocated'] += len(ids)
+            return ids
+
+    def stats(self):
+        return {
+            **self.metrics,
+            'block_size': self.block_size,
+            'cached_ids': max(0, self._limit - self._next)
+        }
+
+
+def insert_customer(cursor, customer):
+    """INSERT de um cliente validado; devolve o CUST_ID"""
+    cust_id = allocator.next_ids(cursor)[0]
+    repository.execute(cursor, 'customers.insert', {**customer, 'cust_id': cust_id})
+    return cust_id
+
+
+def insert_customers(conn, cursor, customers):
+    """
+    executemany de um lote de clientes validados, com batcherrors e um commit.
+    Devolve ([ids na ordem de entrada, None para as rejeitadas], {posição: erro}).
+    """
+    if not customers:
+        return [], {}
+    ids = allocator.next_ids(cursor, len(customers))
+    repository.execute_many(cursor, 'customers.insert',
+                            [{**c, 'cust_id': cust_id} for c, cust_id in zip(customers, ids)], batcherrors=True)
+    rejected = {error.offset: error.message for error in cursor.getbatcherrors()}
+    ids = [None if i in rejected else cust_id for i, cust_id in enumerate(ids)]
+    conn.commit()
+    return ids, rejected
+
+
+def import_customers(rows, batch_size=None):
+    """rows: dicts com firstname/lastname/email. Devolve (ids criados, [{'row', 'error'}])"""
+    batch_size = batch_size or CUSTOMER_ID_CONFIG['import_batch_size']
+    created, errors = [], []
+    batch, positions = [], []
+
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        def flush():
+            ids, rejected = insert_customers(conn, cursor, batch)
+            created.extend(cust_id for cust_id in ids if cust_id is not None)
+            errors.extend({'row': positions[offset], 'error': message} for offset, message in sorted(rejected.items()))
+            batch.clear()
+            positions.clear()
+
+        for position, row in enumerate(rows, 1):
+            try:
+                batch.append(validate_customer(row))
+                positions.append(position)
+            except ValueError as e:
+                errors.append({'row': position, 'error': str(e)})
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    return created, errors
+
+
+# ==================== SETUP ====================
+
+def setup_statements(cursor, sequence=None, block_size=None):
+    """CREATE SEQUENCE começando depois do maior CUST_ID existente"""
+    sequence = sequence or CUSTOMER_ID_CONFIG['sequence']
+    block_size = block_size or CUSTOMER_ID_CONFIG['block_size']
+    start = int(repository.fetch_scalar(cursor, 'customers.max_id')) + 1
+    return [f"""
+        CREATE SEQUENCE {SCHEMA}.{sequence} START WITH {start} INCREMENT BY {block_size} CACHE 20 NOCYCLE
+    """]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Alocação de CUST_ID e importação de clientes')
+    parser.add_argument('--setup', action='store_true', help='cria a sequence de blocos a partir do MAX atual')
+    parser.add_argument('--import', dest='import_path', metavar='CSV', help='CSV com firstname,lastname,email')
+    parser.add_argument('--batch-size', type=int, default=CUSTOMER_ID_CONFIG['import_batch_size'])
+    args = parser.parse_args()
+
+    if args.setup:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            for statement in setup_statements(cursor):
+                print(f"→ {' '.join(statement.split())}")
+                cursor.execute(statement)
+        print(f"✓ Sequence {CUSTOMER_ID_CONFIG['sequence']} criada (blocos de {CUSTOMER_ID_CONFIG['block_size']})")
+
+    if args.import_path:
+        started = time.perf_counter()
+        with open(args.import_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            created, errors = import_customers(
+                ({(k or '').strip().lower(): v for k, v in row.items()} for row in reader), args.batch_size)
+        for error in errors[:100]:
+            print(f"  ⚠️  linha {error['row'] + 1}: {error['error']}")
+        print(f"✓ {len(created)} clientes importados, {len(errors)} com erro "
+              f"em {time.perf_counter() - started:.1f}s")
+
+
+allocator = CustomerIdAllocator()
+
+
+if __name__ == '__main__':
+    main()
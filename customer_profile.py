@@ -0,0 +1,175 @@
+"""
+CineGen AI - Snapshot do perfil do cliente
+✅ Uma única query: cliente + filmes assistidos (título, gêneros, nota dada)
+✅ Filmes assistidos como array int64 ordenado (interseções vetorizadas)
+✅ Histograma de gêneros e notas prontos para chat, grafo e comparação
+✅ Visualizações ainda no write-behind entram por cima do que veio do banco
+✅ Cache LRU com TTL e versão por cliente: mark_as_watched incrementa a
+   versão e a próxima leitura reconstrói o snapshot
+"""
+
+from collections import OrderedDict, Counter
+import threading
+import json
+import time
+import os
+
+import numpy as np
+
+from db import get_db_connection
+import repository
+from movie_catalog import loaded_catalog
+from watch_buffer import pending_watches
+
+PROFILE_CACHE_CONFIG = {
+    'max_items': int(os.getenv('PROFILE_CACHE_MAX_ITEMS', 5000)),
+    'ttl_seconds': int(os.getenv('PROFILE_CACHE_TTL_SECONDS', 300)),
+}
+
+
+def _genre_names(genres_raw):
+    if isinstance(genres_raw, str):
+        try:
+            genres_raw = json.loads(genres_raw)
+        except ValueError:
+            return []
+    return list(genres_raw.keys()) if isinstance(genres_raw, dict) else []
+
+
+class CustomerProfile:
+    """Imutável depois de criado; 'movies' segue a ordem de visualização mais recente primeiro"""
+
+    def __init__(self, cust_id, firstname, lastname, email, movies, version):
+        self.cust_id = cust_id
+        self.firstname = firstname
+        self.lastname = lastname
+        self.email = email
+        self.movies = movies  # [(movie_id, title, genres_raw, rating_given)]
+        self.version = version
+        self.built_at = time.time()
+        self.watched_ids = np.unique(np.fromiter((m[0] for m in movies), dtype=np.int64, count=len(movies)))
+        self.ratings = {m[0]: float(m[3]) for m in movies if m[3] is not None}
+        self.genre_histogram = Counter(genre for m in movies for genre in _genre_names(m[2]))
+
+    @property
+    def name(self):
+        return f'{self.firstname} {self.lastname}'
+
+    @property
+    def total_movies(self):
+        return len(self.movies)
+
+    def titles(self, limit=None):
+        return [m[1] for m in self.movies[:limit]]
+
+    def has_watched(self, movie_id):
+        i = int(np.searchsorted(self.watched_ids, movie_id))
+        return i < self.watched_ids.size and self.watched_ids[i] == movie_id
+
+    def to_dict(self):
+        return {
+            'id': self.cust_id,
+            'name': self.name,
+            'total_movies': self.total_movies,
+            'top_genres': self.genre_histogram.most_common(5),
+            'ratings_given': len(self.ratings),
+            'version': self.version
+        }
+
+
+def apply_pending(cursor, movies, pending):
+    """Sobrepõe eventos ainda não gravados (mais recentes primeiro) à lista vinda do banco"""
+    known = {movie[0]: movie for movie in movies}
+    missing = [event['movie_id'] for event in pending if event['movie_id'] not in known]
+    catalog = loaded_catalog()
+    if catalog is not None:
+        details = {movie_id: (m['title'], m['genres']) for movie_id, m in catalog.hydrate(missing).items()}
+    else:
+        details = {row[0]: (row[1], row[2]) for row in repository.fetch_all(cursor, 'movies.labels_by_ids', ids=missing)}
+
+    overlay = []
+    for event in pending:
+        movie_id, rating = event['movie_id'], event['rating']
+        if movie_id in known:
+            base = known[movie_id]
+            overlay.append((movie_id, base[1], base[2], rating if rating is not None else base[3]))
+        elif movie_id in details:
+            overlay.append((movie_id, *details[movie_id], rating))
+    overlaid = {movie[0] for movie in overlay}
+    return overlay + [movie for movie in movies if movie[0] not in overlaid]
+
+
+def load_profile(cursor, cust_id, version=0):
+    """Monta o snapshot com uma query (LEFT JOIN para clientes sem filmes); None se não existir"""
+    rows = repository.fetch_all(cursor, 'customers.profile', {'cust_id': cust_id})
+    if not rows:
+        return None
+    first = rows[0]
+    movies = [(row[4], row[5], row[6], row[7]) for row in rows if row[4] is not None]
+    pending = pending_watches(cust_id)
+    if pending:
+        movies = apply_pending(cursor, movies, pending)
+    return CustomerProfile(first[0], first[1], first[2], first[3], movies, version)
+
+
+class ProfileCache:
+
+    def __init__(self, max_items=PROFILE_CACHE_CONFIG['max_items'], ttl_seconds=PROFILE_CACHE_CONFIG['ttl_seconds']):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._profiles = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'stale': 0, 'invalidations': 0}
+
+    def version(self, cust_id):
+        return self._versions.get(int(cust_id), 0)
+
+    def get(self, cust_id, cursor=None):
+        """Snapshot atual do cliente; usa o cursor dado ou pega uma conexão do pool no miss"""
+        cust_id = int(cust_id)
+        with self._lock:
+            version = self._versions.get(cust_id, 0)
+            profile = self._profiles.get(cust_id)
+            if profile is not None:
+                if profile.version == version and time.time() - profile.built_at <= self.ttl_seconds:
+                    self._profiles.move_to_end(cust_id)
+                    self.metrics['hits'] += 1
+                    return profile
+                del self._profiles[cust_id]
+                self.metrics['stale'] += 1
+            self.metrics['misses'] += 1
+
+        if cursor is not None:
+            profile = load_profile(cursor, cust_id, version)
+        else:
+            with get_db_connection() as conn, conn.cursor() as own_cursor:
+                profile = load_profile(own_cursor, cust_id, version)
+        if profile is None:
+            return None
+
+        with self._lock:
+            # Uma escrita durante a carga já deixou este snapshot velho: não guarda
+            if self._versions.get(cust_id, 0) == version:
+                self._profiles[cust_id] = profile
+                while len(self._profiles) > self.max_items:
+                    self._profiles.popitem(last=False)
+        return profile
+
+    def invalidate(self, cust_id):
+        with self._lock:
+            cust_id = int(cust_id)
+            self._versions[cust_id] = self._versions.get(cust_id, 0) + 1
+            self._profiles.pop(cust_id, None)
+            self.metrics['invalidations'] += 1
+
+    def stats(self):
+        lookups = self.metrics['hits'] + self.metrics['misses']
+        return {
+            **self.metrics,
+            'hit_rate': round(self.metrics['hits'] / lookups, 3) if lookups else 0.0,
+            'cached_profiles': len(self._profiles)
+        }
+
+
+profile_cache = ProfileCache()
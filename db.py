@@ -0,0 +1,132 @@
+"""
+CineGen AI - Acesso ao Oracle
+✅ Pool de sessões único por processo (oracledb.create_pool)
+✅ Conexões emprestadas sempre via context manager
+"""
+
+from contextlib import contextmanager
+import threading
+import time
+import os
+
+import oracledb
+
+from metrics import observe_stage, wrap_connection
+
+# ==================== CONFIGURAÇÃO ====================
+try:
+    oracledb.init_oracle_client()
+    print("✓ Oracle Thick Mode habilitado")
+except Exception as e:
+    print(f"⚠️  Thick mode não disponível: {e}")
+
+DB_CONFIG = {
+    'user': os.getenv('DB_USER', ''),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'dsn': os.getenv('DB_DSN', '')
+}
+
+# 'sqlite' troca o Oracle pelo banco local de local_db.py (benchmark.py / desenvolvimento)
+DB_BACKEND = os.getenv('DB_BACKEND', 'oracle')
+DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', os.path.join('cache', 'local.db'))
+
+# min/max/increment do pool, cache de statements por sessão e política de ping:
+# ping_interval=0 pinga a sessão em todo acquire, valores > 0 só pingam sessões
+# ociosas há mais de N segundos, valores < 0 desligam o ping.
+POOL_CONFIG = {
+    'min': int(os.getenv('DB_POOL_MIN', 2)),
+    'max': int(os.getenv('DB_POOL_MAX', 10)),
+    'increment': int(os.getenv('DB_POOL_INCREMENT', 1)),
+    'stmtcachesize': int(os.getenv('DB_STMT_CACHE_SIZE', 50)),
+    'ping_interval': int(os.getenv('DB_POOL_PING_INTERVAL', 60)),
+    'timeout': int(os.getenv('DB_POOL_IDLE_TIMEOUT', 300)),
+    'wait_timeout': int(os.getenv('DB_POOL_WAIT_TIMEOUT_MS', 5000)),
+}
+
+SCHEMA = ''  # Schema do Property Graph
+GRAPH_NAME = f'{SCHEMA}.movie_graph'  # Nome completo do grafo
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_metrics = {'acquired': 0, 'errors': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+
+
+def get_pool():
+    """Cria (uma única vez) e retorna o pool de sessões do processo"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None and DB_BACKEND == 'sqlite':
+                from local_db import create_pool
+                _pool = create_pool(DB_SQLITE_PATH, min=POOL_CONFIG['min'], max=POOL_CONFIG['max'],
+                                    wait_timeout=POOL_CONFIG['wait_timeout'])
+                print(f"✓ Banco local SQLite em {DB_SQLITE_PATH} (max={POOL_CONFIG['max']})")
+            if _pool is None:
+                _pool = oracledb.create_pool(
+                    **DB_CONFIG,
+                    min=POOL_CONFIG['min'],
+                    max=POOL_CONFIG['max'],
+                    increment=POOL_CONFIG['increment'],
+                    stmtcachesize=POOL_CONFIG['stmtcachesize'],
+                    ping_interval=POOL_CONFIG['ping_interval'],
+                    timeout=POOL_CONFIG['timeout'],
+                    wait_timeout=POOL_CONFIG['wait_timeout'],
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT
+                )
+                print(f"✓ Pool Oracle criado (min={POOL_CONFIG['min']}, max={POOL_CONFIG['max']})")
+    return _pool
+
+
+@contextmanager
+def get_db_connection():
+    """Empresta uma conexão do pool e a devolve ao sair do bloco, mesmo em return antecipado"""
+    start = time.perf_counter()
+    try:
+        conn = get_pool().acquire()
+    except Exception as e:
+        _pool_metrics['errors'] += 1
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        raise
+
+    wait_ms = (time.perf_counter() - start) * 1000
+    _pool_metrics['acquired'] += 1
+    _pool_metrics['wait_ms_total'] += wait_ms
+    _pool_metrics['wait_ms_max'] = max(_pool_metrics['wait_ms_max'], wait_ms)
+    observe_stage('db_connect', wait_ms / 1000)
+
+    try:
+        yield wrap_connection(conn)
+    finally:
+        try:
+            # Transações não commitadas são desfeitas pelo pool no release
+            _pool.release(conn)
+        except Exception as e:
+            print(f"⚠️  Erro ao devolver conexão ao pool: {e}")
+
+
+def pool_stats():
+    if _pool is None:
+        return {'initialized': False}
+    acquired = _pool_metrics['acquired']
+    return {
+        'initialized': True,
+        'opened': _pool.opened,
+        'busy': _pool.busy,
+        'min': _pool.min,
+        'max': _pool.max,
+        'increment': _pool.increment,
+        'stmtcachesize': _pool.stmtcachesize,
+        'ping_interval': _pool.ping_interval,
+        'acquired': acquired,
+        'errors': _pool_metrics['errors'],
+        'avg_wait_ms': round(_pool_metrics['wait_ms_total'] / acquired, 3) if acquired else 0.0,
+        'max_wait_ms': round(_pool_metrics['wait_ms_max'], 3)
+    }
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close(force=True)
+            _pool = None
@@ -0,0 +1,127 @@
+"""
+CineGen AI - Cache de embeddings de consulta
+✅ Tier 1: LRU em memória com limite de tamanho e TTL
+✅ Tier 2: SQLite em disco (vetores float32), sobrevive a restarts
+✅ Chave = (modelo de embedding, texto normalizado)
+"""
+
+from collections import OrderedDict
+import unicodedata
+import threading
+import sqlite3
+import time
+import os
+
+import numpy as np
+
+
+def normalize_text(text):
+    """'  Action   MOVIES ' e 'action movies' caem na mesma entrada"""
+    text = unicodedata.normalize('NFC', text or '')
+    return ' '.join(text.lower().split())
+
+
+class EmbeddingCache:
+
+    def __init__(self, max_items=2048, ttl_seconds=86400, db_path=None):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.metrics = {'hits_memory': 0, 'hits_disk': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS query_embeddings (
+                        model_id TEXT NOT NULL,
+                        text_key TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (model_id, text_key)
+                    )
+                """)
+                self._db.commit()
+            except Exception as e:
+                print(f"⚠️  Cache de embeddings em disco indisponível: {e}")
+                self._db = None
+
+    def get(self, model_id, text):
+        key = (model_id, normalize_text(text))
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                vector, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.metrics['hits_memory'] += 1
+                    return vector.tolist()
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT vector, created_at FROM query_embeddings WHERE model_id = ? AND text_key = ?",
+                        key
+                    ).fetchone()
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    print(f"⚠️  Erro lendo cache de embeddings: {e}")
+                    row = None
+                if row and now - row[1] <= self.ttl_seconds:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector, row[1])
+                    self.metrics['hits_disk'] += 1
+                    return vector.tolist()
+
+            self.metrics['misses'] += 1
+            return None
+
+    def put(self, model_id, text, embedding):
+        key = (model_id, normalize_text(text))
+        vector = np.asarray(embedding, dtype=np.float32)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, vector, now)
+            self.metrics['stores'] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO query_embeddings (model_id, text_key, vector, created_at) VALUES (?, ?, ?, ?)",
+                        (key[0], key[1], vector.tobytes(), now)
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    print(f"⚠️  Erro gravando cache de embeddings: {e}")
+
+    def _remember(self, key, vector, created_at):
+        self._memory[key] = (vector, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self):
+        lookups = self.metrics['hits_memory'] + self.metrics['hits_disk'] + self.metrics['misses']
+        hits = self.metrics['hits_memory'] + self.metrics['hits_disk']
+        return {
+            **self.metrics,
+            'memory_items': len(self._memory),
+            'persistent': self._db is not None,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,404 @@
+"""
+CineGen AI - Clientes OCI Generative AI
+✅ Um único GenerativeAiInferenceClient por processo (sessão HTTPS reaproveitada)
+✅ Modelos de chat reaproveitados entre chamadas
+✅ Limite de chamadas simultâneas e retry com backoff configuráveis
+✅ Cliente stub local (GENAI_STUB=1) para rodar sem tenancy OCI
+"""
+
+from langchain_community.chat_models import ChatOCIGenAI
+from langchain_core.messages import HumanMessage
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import threading
+import time
+import hashlib
+import os
+import re
+
+import oci
+
+from embedding_cache import EmbeddingCache
+from llm_cache import LLMResponseCache, cache_key
+from metrics import stage, observe_stage
+
+# ==================== CONFIGURAÇÃO ====================
+CONFIG_PROFILE = "DEFAULT"
+GENAI_STUB = os.getenv('GENAI_STUB', '0') == '1'
+
+try:
+    config = oci.config.from_file('~/.oci/config', CONFIG_PROFILE) if not GENAI_STUB else {}
+    compartment_id = os.getenv('OCI_COMPARTMENT_ID', '')
+    model_id = os.getenv('OCI_MODEL_ID', '')
+    print("✓ OCI Config carregado" if not GENAI_STUB else "✓ GenAI em modo stub (offline)")
+except Exception as e:
+    print(f"⚠️  Erro ao carregar OCI config: {e}")
+    config = None
+    compartment_id = ''
+    model_id = ''
+
+SERVICE_ENDPOINT = os.getenv('OCI_GENAI_ENDPOINT', '')
+EMBED_MODEL_ID = os.getenv('OCI_EMBED_MODEL_ID', '')
+EMBED_DIM = 1024
+
+GENAI_CONFIG = {
+    'max_concurrency': int(os.getenv('GENAI_MAX_CONCURRENCY', 8)),
+    'pool_maxsize': int(os.getenv('GENAI_HTTP_POOL_SIZE', 16)),
+    'retry_attempts': int(os.getenv('GENAI_RETRY_ATTEMPTS', 3)),
+    'retry_total_seconds': int(os.getenv('GENAI_RETRY_TOTAL_SECONDS', 30)),
+    'retry_base_sleep': float(os.getenv('GENAI_RETRY_BASE_SLEEP', 0.5)),
+    'retry_max_sleep': float(os.getenv('GENAI_RETRY_MAX_SLEEP', 8)),
+    'timeout': (10, 240),
+    # Limite de inputs por chamada embed_text do serviço
+    'embed_batch_size': int(os.getenv('GENAI_EMBED_BATCH_SIZE', 96)),
+    'embed_workers': int(os.getenv('GENAI_EMBED_WORKERS', 4)),
+    'embed_requests_per_second': float(os.getenv('GENAI_EMBED_RPS', 5)),
+    # Latência simulada do stub (benchmark.py): por chamada embed_text / por resposta do chat
+    'stub_embed_latency_ms': float(os.getenv('GENAI_STUB_EMBED_LATENCY_MS', 0)),
+    'stub_llm_latency_ms': float(os.getenv('GENAI_STUB_LLM_LATENCY_MS', 0)),
+}
+
+EMBED_CACHE_CONFIG = {
+    'max_items': int(os.getenv('EMBED_CACHE_MAX_ITEMS', 2048)),
+    'ttl_seconds': int(os.getenv('EMBED_CACHE_TTL_SECONDS', 7 * 86400)),
+    'db_path': os.getenv('EMBED_CACHE_PATH', 'cache/query_embeddings.sqlite') or None,
+}
+
+LLM_CACHE_CONFIG = {
+    'enabled': os.getenv('LLM_CACHE_ENABLED', '1') == '1',
+    # Tier semântico: precisa de um embedding da mensagem (em geral já em cache)
+    'semantic': os.getenv('LLM_CACHE_SEMANTIC', '1') == '1',
+    'max_items': int(os.getenv('LLM_CACHE_MAX_ITEMS', 1000)),
+    'ttl_seconds': int(os.getenv('LLM_CACHE_TTL_SECONDS', 3600)),
+    'semantic_threshold': float(os.getenv('LLM_CACHE_SEMANTIC_THRESHOLD', 0.95)),
+}
+
+_client = None
+_chat_models = {}
+_client_lock = threading.RLock()
+_concurrency = threading.BoundedSemaphore(GENAI_CONFIG['max_concurrency'])
+
+embedding_cache = EmbeddingCache(**EMBED_CACHE_CONFIG)
+llm_cache = LLMResponseCache(
+    max_items=LLM_CACHE_CONFIG['max_items'],
+    ttl_seconds=LLM_CACHE_CONFIG['ttl_seconds'],
+    semantic_threshold=LLM_CACHE_CONFIG['semantic_threshold']
+)
+
+
+def build_retry_strategy():
+    """Retry com backoff exponencial + jitter para 429/5xx; GENAI_RETRY_ATTEMPTS<=1 desliga o retry"""
+    if GENAI_CONFIG['retry_attempts'] <= 1:
+        return oci.retry.NoneRetryStrategy()
+    return oci.retry.RetryStrategyBuilder(
+        max_attempts_check=True,
+        max_attempts=GENAI_CONFIG['retry_attempts'],
+        total_elapsed_time_check=True,
+        total_elapsed_time_seconds=GENAI_CONFIG['retry_total_seconds'],
+        retry_base_sleep_time_seconds=GENAI_CONFIG['retry_base_sleep'],
+        retry_max_wait_between_calls_seconds=GENAI_CONFIG['retry_max_sleep'],
+        service_error_check=True,
+        service_error_retry_on_any_5xx=True,
+        service_error_retry_config={429: []},
+        backoff_type=oci.retry.BACKOFF_FULL_JITTER_EQUAL_ON_THROTTLE_VALUE
+    ).get_retry_strategy()
+
+
+# ==================== STUB OFFLINE ====================
+
+class _StubResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _StubEmbedData:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+
+class _StubMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+def stub_embedding(text, dim=EMBED_DIM):
+    """Embedding determinístico (hashing de tokens), estável entre processos"""
+    vec = np.zeros(dim, dtype=np.float32)
+    for token in re.findall(r'\w+', (text or '').lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+        vec[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+    norm = np.linalg.norm(vec)
+    return (vec / norm if norm else vec).tolist()
+
+
+class StubInferenceClient:
+    """Substitui o GenerativeAiInferenceClient sem rede: embed_text devolve vetores determinísticos"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_text(self, embed_text_detail):
+        self.calls += 1
+        if GENAI_CONFIG['stub_embed_latency_ms']:
+            time.sleep(GENAI_CONFIG['stub_embed_latency_ms'] / 1000)
+        return _StubResponse(_StubEmbedData([stub_embedding(t) for t in embed_text_detail.inputs]))
+
+
+class StubChatModel:
+    """Substitui o ChatOCIGenAI sem rede: responde com um eco curto do prompt"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _answer(self, messages):
+        self.calls += 1
+        question = messages[-1].content.split('PERGUNTA:')[-1].strip().splitlines()[0]
+        return f"[stub] Resposta para: {question}"
+
+    def invoke(self, messages):
+        answer = self._answer(messages)
+        if GENAI_CONFIG['stub_llm_latency_ms']:
+            time.sleep(GENAI_CONFIG['stub_llm_latency_ms'] / 1000)
+        return _StubMessage(answer)
+
+    def stream(self, messages):
+        words = self._answer(messages).split(' ')
+        # Mesma latência total do invoke, distribuída entre os tokens
+        delay = GENAI_CONFIG['stub_llm_latency_ms'] / 1000 / len(words)
+        for i, word in enumerate(words):
+            if delay:
+                time.sleep(delay)
+            yield _StubMessage(word if i == 0 else ' ' + word)
+
+
+# ==================== CLIENTES COMPARTILHADOS ====================
+
+def get_inference_client():
+    """Cliente de inferência único do processo, criado na primeira chamada"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if GENAI_STUB:
+                    _client = StubInferenceClient()
+                else:
+                    client = oci.generative_ai_inference.GenerativeAiInferenceClient(
+                        config=config,
+                        service_endpoint=SERVICE_ENDPOINT,
+                        retry_strategy=build_retry_strategy(),
+                        timeout=GENAI_CONFIG['timeout']
+                    )
+                    _enable_keep_alive(client)
+                    _client = client
+    return _client
+
+
+def _enable_keep_alive(client):
+    # A sessão requests do SDK já mantém conexões abertas; aumentamos o pool
+    # para que chamadas concorrentes não abram/fechem sockets a cada request
+    try:
+        from requests.adapters import HTTPAdapter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GENAI_CONFIG['pool_maxsize'])
+        client.base_client.session.mount('https://', adapter)
+    except Exception as e:
+        print(f"⚠️  Não foi possível ajustar o pool HTTP do GenAI: {e}")
+
+
+def get_chat_model(temperature=0.7, max_tokens=300):
+    """Modelo de chat reaproveitado por combinação de parâmetros"""
+    key = (temperature, max_tokens)
+    chat = _chat_models.get(key)
+    if chat is None:
+        with _client_lock:
+            chat = _chat_models.get(key)
+            if chat is None:
+                if GENAI_STUB:
+                    chat = StubChatModel()
+                else:
+                    chat = ChatOCIGenAI(
+                        client=get_inference_client(),
+                        model_id=model_id,
+                        service_endpoint=SERVICE_ENDPOINT,
+                        compartment_id=compartment_id,
+                        provider="meta",
+                        model_kwargs={
+                            "temperature": temperature,
+                            "max_tokens": max_tokens,
+                            "frequency_penalty": 0,
+                            "presence_penalty": 0,
+                            "top_p": 0.75
+                        },
+                        auth_profile=CONFIG_PROFILE
+                    )
+                _chat_models[key] = chat
+    return chat
+
+
+def reset_clients():
+    """Descarta os clientes compartilhados (troca de configuração ou testes)"""
+    global _client
+    with _client_lock:
+        _client = None
+        _chat_models.clear()
+
+
+# ==================== CHAMADAS ====================
+
+def get_llm_response(prompt_text, temperature=0.7, max_tokens=300):
+    chat = get_chat_model(temperature, max_tokens)
+    messages = [HumanMessage(content=prompt_text)]
+    with stage('llm'), _concurrency:
+        response = chat.invoke(messages)
+    return response.content
+
+
+def stream_llm_response(prompt_text, temperature=0.7, max_tokens=300):
+    """Gera os pedaços de texto da resposta conforme o modelo os produz"""
+    chat = get_chat_model(temperature, max_tokens)
+    messages = [HumanMessage(content=prompt_text)]
+    with stage('llm_stream'), _concurrency:
+        for chunk in chat.stream(messages):
+            if chunk.content:
+                yield chunk.content
+
+
+def embedding_model_key():
+    return 'stub' if GENAI_STUB else EMBED_MODEL_ID
+
+
+def _embed_batch(texts):
+    """Uma chamada embed_text para até embed_batch_size textos; propaga erros"""
+    embed_text_detail = oci.generative_ai_inference.models.EmbedTextDetails()
+    embed_text_detail.serving_mode = oci.generative_ai_inference.models.OnDemandServingMode(
+        model_id=EMBED_MODEL_ID
+    )
+    embed_text_detail.inputs = list(texts)
+    embed_text_detail.truncate = "END"
+    embed_text_detail.compartment_id = compartment_id
+    with _concurrency:
+        embed_text_response = get_inference_client().embed_text(embed_text_detail)
+    return embed_text_response.data.embeddings
+
+
+def embed_or_none(text):
+    """Embedding real (cache ou serviço) ou None se o serviço falhar"""
+    started = time.perf_counter()
+    cached = embedding_cache.get(embedding_model_key(), text)
+    if cached is not None:
+        observe_stage('embedding', time.perf_counter() - started, 'cache')
+        return cached
+
+    try:
+        embedding = _embed_batch([text])[0]
+    except Exception as e:
+        print(f"Erro ao gerar embedding: {e}")
+        observe_stage('embedding', time.perf_counter() - started, 'error')
+        return None
+
+    embedding_cache.put(embedding_model_key(), text, embedding)
+    observe_stage('embedding', time.perf_counter() - started, 'service')
+    return embedding
+
+
+def generate_embedding(text):
+    embedding = embed_or_none(text)
+    if embedding is None:
+        # Vetor aleatório só mantém a rota de pé; nunca vai para o cache
+        return np.random.rand(EMBED_DIM).tolist()
+    return embedding
+
+
+# ==================== CACHE DE RESPOSTAS DO LLM ====================
+
+class LLMCacheLookup:
+    """Chaves de uma consulta ao cache; reaproveitadas para gravar a resposta gerada"""
+
+    def __init__(self, prompt_text, message, context, scope, temperature, max_tokens):
+        model = 'stub' if GENAI_STUB else model_id
+        self.exact_key = cache_key(model, temperature, max_tokens, prompt_text)
+        self.group_key = cache_key(model, temperature, max_tokens, scope, context)
+        self.message = message
+        self.vector = None
+
+    def get(self):
+        """(resposta, origem, similaridade); origem = 'exact' | 'semantic' | None"""
+        if not LLM_CACHE_CONFIG['enabled']:
+            return None, None, None
+        vector_fn = self.message_vector if LLM_CACHE_CONFIG['semantic'] and self.message else None
+        return llm_cache.get(self.exact_key, self.group_key, vector_fn)
+
+    def message_vector(self):
+        if self.vector is None:
+            self.vector = embed_or_none(self.message)
+        return self.vector
+
+    def put(self, answer):
+        if not LLM_CACHE_CONFIG['enabled'] or not answer:
+            return
+        vector = self.message_vector() if LLM_CACHE_CONFIG['semantic'] and self.message else None
+        llm_cache.put(self.exact_key, answer, self.group_key, vector)
+
+
+def get_cached_llm_response(prompt_text, message, context, scope, temperature=0.7, max_tokens=300):
+    """
+    get_llm_response com cache. 'context' é tudo do prompt que não é a mensagem
+    (para o tier semântico só casar perguntas parecidas sob o mesmo contexto).
+    Devolve (resposta, origem) com origem None quando o LLM foi chamado.
+    """
+    lookup = LLMCacheLookup(prompt_text, message, context, scope, temperature, max_tokens)
+    answer, origin, _ = lookup.get()
+    if answer is not None:
+        return answer, origin
+    answer = get_llm_response(prompt_text, temperature=temperature, max_tokens=max_tokens)
+    lookup.put(answer)
+    return answer, None
+
+
+class RateLimiter:
+    """Token bucket simples e thread-safe (requests por segundo)"""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+_embed_rate_limiter = RateLimiter(GENAI_CONFIG['embed_requests_per_second'])
+
+
+def generate_embeddings(texts, batch_size=None, workers=None):
+    """
+    Embeddings em lote: empacota até batch_size textos por chamada e roda os
+    lotes em paralelo (workers threads), respeitando o rate limit do serviço.
+    Ao contrário de generate_embedding, erros são propagados — quem chama em
+    lote (backfill) não pode gravar vetores aleatórios.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    batch_size = min(batch_size or GENAI_CONFIG['embed_batch_size'], GENAI_CONFIG['embed_batch_size'])
+    workers = workers or GENAI_CONFIG['embed_workers']
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def run(batch):
+        _embed_rate_limiter.wait()
+        return _embed_batch(batch)
+
+    if len(batches) == 1:
+        return run(batches[0])
+
+    embeddings = []
+    with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+        for batch_embeddings in executor.map(run, batches):
+            embeddings.extend(batch_embeddings)
+    return embeddings
@@ -0,0 +1,511 @@
+"""
+CineGen AI - Grafo de co-visualização em memória
+✅ Grafo bipartido cliente <-> filme de WATCHED_MOVIE em CSR (NumPy int32 indptr/indices)
+✅ Mesmo ranking "similar_users" do MATCH (c1)-[:watched]->(m)<-[:watched]-(c2)-[:watched]->(m2)
+   calculado com operações vetorizadas, sem ir ao banco
+✅ Vizinhos de um cliente (Jaccard/cosseno contra todos os outros) pela mesma
+   matriz cliente x filme: um bincount sobre as colunas dos filmes dele
+✅ Novas visualizações entram num delta em memória e são compactadas no CSR em lote
+
+Uso (conferir paridade com a query SQL/PGQL):
+    python graph_engine.py --check-parity 50
+"""
+
+import threading
+import argparse
+import time
+import os
+
+import numpy as np
+
+from db import get_db_connection
+from capabilities import capabilities
+import repository
+
+GRAPH_CONFIG = {
+    # 'memory' usa este motor; 'pgql' mantém as queries GRAPH_TABLE
+    'engine': os.getenv('GRAPH_ENGINE', 'memory'),
+    'delta_compact_threshold': int(os.getenv('GRAPH_DELTA_COMPACT', 5000)),
+}
+
+
+def gather_rows(indptr, indices, rows):
+    """Concatena indices[indptr[r]:indptr[r+1]] para todas as linhas, sem loop Python"""
+    rows = np.asarray(rows, dtype=np.int64)
+    if rows.size == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    starts = indptr[rows].astype(np.int64)
+    lengths = indptr[rows + 1].astype(np.int64) - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    shifts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return indices[shifts + np.arange(total)]
+
+
+def build_csr(row_idx, col_idx, n_rows):
+    order = np.lexsort((col_idx, row_idx))
+    indices = col_idx[order].astype(np.int32)
+    counts = np.bincount(row_idx, minlength=n_rows)
+    indptr = np.zeros(n_rows + 1, dtype=np.int32)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, indices
+
+
+def rank_neighbors(ids, shared, other_degrees, my_degree, k=10, metric='jaccard'):
+    """
+    Top-K [(cust_id, score, filmes em comum)] a partir das contagens de uma linha
+    da matriz cliente x filme. metric: 'jaccard', 'cosine' ou 'common'.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if ids.size == 0 or k <= 0:
+        return []
+    shared = np.asarray(shared, dtype=np.int64)
+    shared_f = shared.astype(np.float64)
+    other_degrees = np.asarray(other_degrees, dtype=np.float64)
+    if metric == 'cosine':
+        scores = shared_f / np.sqrt(float(my_degree) * other_degrees)
+    elif metric == 'common':
+        scores = shared_f
+    else:
+        scores = shared_f / (my_degree + other_degrees - shared_f)
+    # argpartition: O(n) para achar os K melhores, só eles são ordenados
+    top = np.argpartition(-scores, k - 1)[:k] if ids.size > k else np.arange(ids.size)
+    top = top[np.lexsort((ids[top], -scores[top]))]
+    return [(int(ids[i]), round(float(scores[i]), 4), int(shared[i])) for i in top]
+
+
+class _CSRSnapshot:
+    """Estrutura imutável; trocada por inteiro a cada compactação"""
+
+    def __init__(self, customer_ids, movie_ids, cust_indptr, cust_indices, movie_indptr, movie_indices, ratings):
+        self.customer_ids = customer_ids
+        self.movie_ids = movie_ids
+        self.cust_indptr = cust_indptr
+        self.cust_indices = cust_indices
+        self.movie_indptr = movie_indptr
+        self.movie_indices = movie_indices
+        self.ratings = ratings
+
+    @classmethod
+    def from_edges(cls, cust_ids, movie_ids, movie_ratings):
+        cust_ids = np.asarray(cust_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if cust_ids.size:
+            pairs = np.unique(np.stack([cust_ids, movie_ids], axis=1), axis=0)
+            cust_ids, movie_ids = pairs[:, 0], pairs[:, 1]
+
+        customers = np.unique(cust_ids)
+        movies = np.unique(np.concatenate([movie_ids, np.fromiter(movie_ratings.keys(), dtype=np.int64)]))
+        c_idx = np.searchsorted(customers, cust_ids)
+        m_idx = np.searchsorted(movies, movie_ids)
+
+        cust_indptr, cust_indices = build_csr(c_idx, m_idx, customers.size)
+        movie_indptr, movie_indices = build_csr(m_idx, c_idx, movies.size)
+        ratings = np.array([float(movie_ratings.get(int(m), 0) or 0) for m in movies], dtype=np.float32)
+        return cls(customers, movies, cust_indptr, cust_indices, movie_indptr, movie_indices, ratings)
+
+    def customer_index(self, cust_id):
+        i = int(np.searchsorted(self.customer_ids, cust_id))
+        return i if i < self.customer_ids.size and self.customer_ids[i] == cust_id else -1
+
+    def movie_index(self, movie_id):
+        i = int(np.searchsorted(self.movie_ids, movie_id))
+        return i if i < self.movie_ids.size and self.movie_ids[i] == movie_id else -1
+
+    @property
+    def edge_count(self):
+        return int(self.cust_indices.size)
+
+
+class CoWatchGraph:
+
+    def __init__(self, compact_threshold=GRAPH_CONFIG['delta_compact_threshold']):
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        # Uma compactação por vez: duas não podem fundir (e descontar) o mesmo delta
+        self._compact_lock = threading.Lock()
+        self._snapshot = _CSRSnapshot.from_edges([], [], {})
+        self._ratings = {}
+        self._delta_by_customer = {}
+        self._delta_by_movie = {}
+        self._delta_edges = 0
+        self.loaded_at = None
+
+    # ---------- carga / escrita ----------
+
+    def build(self, cust_ids, movie_ids, movie_ratings=None):
+        self._ratings = dict(movie_ratings or {})
+        snapshot = _CSRSnapshot.from_edges(cust_ids, movie_ids, self._ratings)
+        with self._lock:
+            self._snapshot = snapshot
+            self._delta_by_customer = {}
+            self._delta_by_movie = {}
+            self._delta_edges = 0
+        self.loaded_at = time.time()
+
+    def load_from_db(self):
+        started = time.perf_counter()
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            ratings = {int(movie_id): float(rating)
+                       for movie_id, rating in repository.execute(cursor, 'graph.ratings')}
+
+            repository.execute(cursor, 'graph.edges')
+            cust_chunks, movie_chunks = [], []
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                chunk = np.asarray(rows, dtype=np.int64)
+                cust_chunks.append(chunk[:, 0])
+                movie_chunks.append(chunk[:, 1])
+
+        cust_ids = np.concatenate(cust_chunks) if cust_chunks else np.zeros(0, dtype=np.int64)
+        movie_ids = np.concatenate(movie_chunks) if movie_chunks else np.zeros(0, dtype=np.int64)
+        self.build(cust_ids, movie_ids, ratings)
+        print(f"✓ Grafo em memória: {self._snapshot.customer_ids.size} clientes, "
+              f"{self._snapshot.movie_ids.size} filmes, {self._snapshot.edge_count} arestas "
+              f"em {time.perf_counter() - started:.2f}s")
+
+    def add_watch(self, cust_id, movie_id, rating=None):
+        """Registra uma aresta nova sem reconstruir o CSR (compactação em lote)"""
+        cust_id, movie_id = int(cust_id), int(movie_id)
+        with self._lock:
+            if self._has_edge(cust_id, movie_id):
+                return False
+            self._delta_by_customer.setdefault(cust_id, set()).add(movie_id)
+            self._delta_by_movie.setdefault(movie_id, set()).add(cust_id)
+            self._delta_edges += 1
+            needs_compact = self._delta_edges >= self.compact_threshold
+        if needs_compact:
+            self.compact()
+        return True
+
+    def set_movie_rating(self, movie_id, rating):
+        self._ratings[int(movie_id)] = float(rating or 0)
+
+    def compact(self):
+        """Funde o delta no CSR (O(arestas), vetorizado)"""
+        with self._compact_lock:
+            with self._lock:
+                snapshot = self._snapshot
+                delta = [(c, m) for c, movies in self._delta_by_customer.items() for m in movies]
+            if not delta:
+                return
+            base_cust = np.repeat(snapshot.customer_ids, np.diff(snapshot.cust_indptr))
+            base_movie = snapshot.movie_ids[snapshot.cust_indices]
+            delta_arr = np.asarray(delta, dtype=np.int64)
+            merged = _CSRSnapshot.from_edges(
+                np.concatenate([base_cust, delta_arr[:, 0]]),
+                np.concatenate([base_movie, delta_arr[:, 1]]),
+                self._ratings
+            )
+            with self._lock:
+                # Arestas que chegaram durante a compactação continuam no delta
+                for c, m in delta:
+                    self._delta_by_customer[c].discard(m)
+                    if not self._delta_by_customer[c]:
+                        del self._delta_by_customer[c]
+                    self._delta_by_movie[m].discard(c)
+                    if not self._delta_by_movie[m]:
+                        del self._delta_by_movie[m]
+                self._delta_edges -= len(delta)
+                self._snapshot = merged
+
+    def _has_edge(self, cust_id, movie_id):
+        if movie_id in self._delta_by_customer.get(cust_id, ()):
+            return True
+        snapshot = self._snapshot
+        c = snapshot.customer_index(cust_id)
+        m = snapshot.movie_index(movie_id)
+        if c < 0 or m < 0:
+            return False
+        row = snapshot.cust_indices[snapshot.cust_indptr[c]:snapshot.cust_indptr[c + 1]]
+        i = int(np.searchsorted(row, m))
+        return i < row.size and row[i] == m
+
+    # ---------- leitura ----------
+
+    def watched(self, cust_id):
+        with self._lock:
+            snapshot = self._snapshot
+            extra = set(self._delta_by_customer.get(int(cust_id), ()))
+        c = snapshot.customer_index(cust_id)
+        base = snapshot.movie_ids[gather_rows(snapshot.cust_indptr, snapshot.cust_indices, [c])] if c >= 0 else []
+        return set(int(m) for m in base) | extra
+
+    def adjacency(self, kind, node_id):
+        """Vizinhos ordenados (int64) de um 'customer' (filmes) ou 'movie' (clientes), com o delta"""
+        with self._lock:
+            snapshot = self._snapshot
+            delta = self._delta_by_customer if kind == 'customer' else self._delta_by_movie
+            extra = list(delta.get(int(node_id), ()))
+        if kind == 'customer':
+            i, indptr, indices, ids = (snapshot.customer_index(node_id), snapshot.cust_indptr,
+                                       snapshot.cust_indices, snapshot.movie_ids)
+        else:
+            i, indptr, indices, ids = (snapshot.movie_index(node_id), snapshot.movie_indptr,
+                                       snapshot.movie_indices, snapshot.customer_ids)
+        # Linhas do CSR já saem ordenadas (build_csr ordena por coluna)
+        base = ids[indices[indptr[i]:indptr[i + 1]]] if i >= 0 else np.zeros(0, dtype=np.int64)
+        return np.union1d(base, np.asarray(extra, dtype=np.int64)) if extra else base
+
+    def watch_counts(self, movie_ids):
+        """{movie_id: nº de clientes que assistiram} = grau do filme no CSR + delta"""
+        with self._lock:
+            snapshot = self._snapshot
+            delta_m = {int(m): len(self._delta_by_movie.get(int(m), ())) for m in movie_ids}
+        counts = {}
+        for movie_id in movie_ids:
+            m = snapshot.movie_index(int(movie_id))
+            base = int(snapshot.movie_indptr[m + 1] - snapshot.movie_indptr[m]) if m >= 0 else 0
+            counts[movie_id] = base + delta_m[int(movie_id)]
+        return counts
+
+    def recommend(self, cust_id, limit=10):
+        """
+        [(movie_id, similar_users)] ordenado por similar_users DESC, rating DESC,
+        excluindo filmes que o cliente já assistiu — mesma semântica da query PGQL.
+        """
+        cust_id = int(cust_id)
+        with self._lock:
+            snapshot = self._snapshot
+            delta_c = {c: set(ms) for c, ms in self._delta_by_customer.items()}
+            delta_m = {m: set(cs) for m, cs in self._delta_by_movie.items()}
+
+        n_movies = snapshot.movie_ids.size
+        c = snapshot.customer_index(cust_id)
+
+        # Filmes do cliente (índices do CSR + ids só presentes no delta)
+        my_movie_idx = gather_rows(snapshot.cust_indptr, snapshot.cust_indices, [c]) if c >= 0 else np.zeros(0, np.int32)
+        my_movie_ids = set(int(m) for m in snapshot.movie_ids[my_movie_idx]) | delta_c.get(cust_id, set())
+        if not my_movie_ids:
+            return []
+        if delta_c.get(cust_id):
+            extra_idx = [snapshot.movie_index(m) for m in delta_c[cust_id]]
+            my_movie_idx = np.union1d(my_movie_idx, [i for i in extra_idx if i >= 0]).astype(np.int64)
+
+        # Clientes similares: quem assistiu algum dos meus filmes (menos eu)
+        neighbor_mask = np.zeros(snapshot.customer_ids.size, dtype=bool)
+        neighbor_mask[gather_rows(snapshot.movie_indptr, snapshot.movie_indices, my_movie_idx)] = True
+        neighbor_ids = set()
+        for m in my_movie_ids:
+            neighbor_ids |= delta_m.get(m, set())
+        for n in neighbor_ids:
+            i = snapshot.customer_index(n)
+            if i >= 0:
+                neighbor_mask[i] = True
+        if c >= 0:
+            neighbor_mask[c] = False
+        neighbor_ids.discard(cust_id)
+        neighbor_idx = np.flatnonzero(neighbor_mask)
+
+        # Cada vizinho conta 1 por filme (arestas já deduplicadas)
+        counts = np.bincount(
+            gather_rows(snapshot.cust_indptr, snapshot.cust_indices, neighbor_idx),
+            minlength=n_movies
+        ).astype(np.int64)
+        extra_counts = {}
+        all_neighbors = neighbor_ids | set(int(x) for x in snapshot.customer_ids[neighbor_idx] if int(x) in delta_c)
+        for n in all_neighbors:
+            for m in delta_c.get(n, ()):
+                i = snapshot.movie_index(m)
+                if i >= 0:
+                    counts[i] += 1
+                else:
+                    extra_counts[m] = extra_counts.get(m, 0) + 1
+
+        counts[my_movie_idx] = 0
+        for m in my_movie_ids:
+            extra_counts.pop(m, None)
+
+        candidates = np.flatnonzero(counts)
+        order = np.lexsort((-snapshot.ratings[candidates], -counts[candidates]))[:limit]
+        ranked = [(int(snapshot.movie_ids[i]), int(counts[i]), float(snapshot.ratings[i])) for i in candidates[order]]
+        ranked += [(m, n, float(self._ratings.get(m, 0))) for m, n in extra_counts.items()]
+        ranked.sort(key=lambda r: (-r[1], -r[2]))
+        return [(movie_id, similar) for movie_id, similar, _ in ranked[:limit]]
+
+    def customer_overlap(self, cust_id):
+        """
+        Linha do cliente contra a matriz cliente x filme inteira:
+        (customer_ids, filmes em comum, nº de filmes de cada um, nº de filmes do cliente),
+        só para quem tem ao menos um filme em comum. Inclui as arestas do delta.
+        """
+        cust_id = int(cust_id)
+        with self._lock:
+            snapshot = self._snapshot
+            delta_c = {c: set(ms) for c, ms in self._delta_by_customer.items()}
+            delta_m = {m: set(cs) for m, cs in self._delta_by_movie.items()}
+
+        n_customers = snapshot.customer_ids.size
+        c = snapshot.customer_index(cust_id)
+        my_idx = gather_rows(snapshot.cust_indptr, snapshot.cust_indices, [c]) if c >= 0 else np.zeros(0, np.int32)
+        my_delta = delta_c.get(cust_id, set())
+
+        # S_eu x S_outros: contagem de co-visualização vetorizada
+        common = np.bincount(gather_rows(snapshot.movie_indptr, snapshot.movie_indices, my_idx),
+                             minlength=n_customers).astype(np.int64)
+        degrees = np.diff(snapshot.cust_indptr).astype(np.int64)
+
+        extra_common = {}
+        extra_degree = {}
+        # D_eu x S_outros e D_eu x D_outros
+        for m in my_delta:
+            i = snapshot.movie_index(m)
+            if i >= 0:
+                common[gather_rows(snapshot.movie_indptr, snapshot.movie_indices, [i])] += 1
+            for other in delta_m.get(m, ()):
+                extra_common[other] = extra_common.get(other, 0) + 1
+        # S_eu x D_outros
+        my_movies = set(int(m) for m in snapshot.movie_ids[my_idx])
+        for other, movies in delta_c.items():
+            extra_degree[other] = len(movies)
+            shared = len(movies & my_movies)
+            if shared:
+                extra_common[other] = extra_common.get(other, 0) + shared
+
+        for other, n in extra_degree.items():
+            i = snapshot.customer_index(other)
+            if i >= 0:
+                degrees[i] += n
+        for other, n in list(extra_common.items()):
+            i = snapshot.customer_index(other)
+            if i >= 0:
+                common[i] += n
+                del extra_common[other]
+
+        my_degree = int(my_idx.size + len(my_delta))
+        if c >= 0:
+            common[c] = 0
+        extra_common.pop(cust_id, None)
+
+        idx = np.flatnonzero(common)
+        ids = np.concatenate([snapshot.customer_ids[idx], np.fromiter(extra_common.keys(), dtype=np.int64)])
+        shared = np.concatenate([common[idx], np.fromiter(extra_common.values(), dtype=np.int64)])
+        other_degrees = np.concatenate([
+            degrees[idx], np.fromiter((extra_degree[o] for o in extra_common), dtype=np.int64)
+        ])
+        return ids, shared, other_degrees, my_degree
+
+    def similar_customers(self, cust_id, k=10, metric='jaccard'):
+        """Top-K [(cust_id, score, filmes em comum)] do cliente contra todos os outros"""
+        return rank_neighbors(*self.customer_overlap(cust_id), k=k, metric=metric)
+
+    def pair_similarity(self, cust_a, cust_b):
+        """{'common_ids', 'jaccard', 'cosine'} entre dois clientes, lidos da mesma matriz"""
+        a, b = self.watched(cust_a), self.watched(cust_b)
+        common_ids = a & b
+        common = len(common_ids)
+        union = len(a) + len(b) - common
+        return {
+            'common_ids': common_ids,
+            'jaccard': round(common / union, 4) if union else 0.0,
+            'cosine': round(common / float(np.sqrt(len(a) * len(b))), 4) if a and b else 0.0
+        }
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'customers': int(snapshot.customer_ids.size),
+            'movies': int(snapshot.movie_ids.size),
+            'edges': snapshot.edge_count,
+            'pending_delta': self._delta_edges,
+            'loaded_at': self.loaded_at
+        }
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_cowatch_graph():
+    """Grafo do processo, carregado do Oracle no primeiro uso"""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                graph = CoWatchGraph()
+                graph.load_from_db()
+                _graph = graph
+    return _graph
+
+
+def graph_engine_enabled():
+    return GRAPH_CONFIG['engine'] == 'memory'
+
+
+def record_watch(cust_id, movie_id):
+    """Chamado depois do commit em WATCHED_MOVIE; só atualiza se o grafo já foi carregado"""
+    if _graph is not None:
+        _graph.add_watch(cust_id, movie_id)
+
+
+# ==================== PARIDADE COM PGQL/SQL ====================
+
+def sql_similar_users(cursor, cust_id):
+    """Contagem completa de similar_users pela query relacional equivalente ao MATCH"""
+    rows = repository.fetch_all(cursor, 'watched.similar_users', {'cust_id': cust_id})
+    return {int(movie_id): int(similar) for movie_id, similar in rows}
+
+
+def sql_customer_overlap(cursor, cust_id):
+    """Mesma linha da matriz que CoWatchGraph.customer_overlap, calculada no banco"""
+    my_degree = int(repository.fetch_scalar(cursor, 'watched.customer_degree', {'cust_id': cust_id}))
+    rows = repository.fetch_all(cursor, 'watched.customer_overlap', {'cust_id': cust_id})
+    return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], my_degree
+
+
+def statement_recommendations(cursor, cust_id, limit):
+    """
+    [(movie_id, similar_users)] do statement que a rota usaria: recommendations.pgql
+    quando o probe acha o Property Graph (menos o que o cliente já assistiu, como em
+    app.graph_recommendations), senão recommendations.sql
+    """
+    if capabilities.use('graph', cursor):
+        watched = set(int(m) for m, in repository.fetch_all(cursor, 'watched.movie_ids', {'cust_id': cust_id}))
+        rows = repository.fetch_all(cursor, 'recommendations.pgql',
+                                    {'cust_id': cust_id, 'limit': limit + len(watched)}, rows=limit + len(watched))
+        rows = [row for row in rows if int(row[0]) not in watched]
+    else:
+        rows = repository.fetch_all(cursor, 'recommendations.sql', {'cust_id': cust_id, 'limit': limit}, rows=limit)
+    return [(int(row[0]), int(row[-1])) for row in rows[:limit]]
+
+
+def check_parity(sample_size=50, limit=10):
+    graph = get_cowatch_graph()
+    customers = graph._snapshot.customer_ids[:sample_size]
+    mismatches = 0
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        for cust_id in customers:
+            expected = sql_similar_users(cursor, int(cust_id))
+            got = dict(graph.recommend(int(cust_id), limit=len(expected) or 1)) if expected else {}
+            if got != expected:
+                mismatches += 1
+                print(f"❌ Cliente {cust_id}: SQL={len(expected)} filmes, memória={len(got)} filmes")
+                continue
+            # Top-N da rota: mesmas contagens na mesma ordem (empates podem trocar o id)
+            ranked = statement_recommendations(cursor, int(cust_id), limit)
+            top = graph.recommend(int(cust_id), limit=limit)
+            if [n for _, n in ranked] != [n for _, n in top] or any(got.get(m) != n for m, n in ranked):
+                mismatches += 1
+                print(f"❌ Cliente {cust_id}: top {limit} diverge entre o statement e a memória")
+                continue
+            expected_neighbors = rank_neighbors(*sql_customer_overlap(cursor, int(cust_id)), k=10)
+            if graph.similar_customers(int(cust_id), k=10) != expected_neighbors:
+                mismatches += 1
+                print(f"❌ Cliente {cust_id}: vizinhos divergem entre SQL e memória")
+    print(f"{'✓' if not mismatches else '❌'} Paridade: {len(customers) - mismatches}/{len(customers)} clientes idênticos")
+    return mismatches == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grafo de co-visualização em memória')
+    parser.add_argument('--check-parity', type=int, metavar='N', default=50,
+                        help='compara o ranking em memória com a query SQL para N clientes')
+    args = parser.parse_args()
+    raise SystemExit(0 if check_parity(args.check_parity) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+CineGen AI - Busca híbrida (vetorial + textual + grafo)
+✅ Os três sinais rodam em paralelo, cada um com seu orçamento de tempo e seu
+   próprio pool de threads: um sinal lento perde recall, não atrasa a resposta
+   nem ocupa as threads dos outros
+✅ Fusão por Reciprocal Rank Fusion (padrão) ou por scores normalizados ponderados
+✅ Cada resultado traz rank/score por sinal para explicar o ranking final
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import time
+import os
+
+from db import get_db_connection
+import metrics
+from genai import embed_or_none
+from vector_index import resolve_backend, search_vectors
+from text_index import lexical_search
+from graph_engine import graph_engine_enabled, get_cowatch_graph, sql_similar_users
+from capabilities import capabilities
+
+SIGNALS = ('vector', 'lexical', 'graph')
+FUSION_METHODS = ('rrf', 'weighted')
+
+HYBRID_CONFIG = {
+    'fusion': os.getenv('HYBRID_FUSION', 'rrf'),
+    'rrf_k': int(os.getenv('HYBRID_RRF_K', 60)),
+    'candidates': int(os.getenv('HYBRID_CANDIDATES', 50)),
+    'workers': int(os.getenv('HYBRID_WORKERS', 4)),  # por sinal
+    'timeout_ms': {
+        'vector': int(os.getenv('HYBRID_TIMEOUT_VECTOR_MS', 1500)),
+        'lexical': int(os.getenv('HYBRID_TIMEOUT_LEXICAL_MS', 200)),
+        'graph': int(os.getenv('HYBRID_TIMEOUT_GRAPH_MS', 300)),
+    },
+    'weights': {
+        'vector': float(os.getenv('HYBRID_WEIGHT_VECTOR', 1.0)),
+        'lexical': float(os.getenv('HYBRID_WEIGHT_LEXICAL', 1.0)),
+        'graph': float(os.getenv('HYBRID_WEIGHT_GRAPH', 0.5)),
+    },
+}
+
+# Um pool por sinal, compartilhado entre requisições: sinais que estouram o orçamento
+# terminam em background sem segurar as threads dos outros sinais
+_executors = {
+    signal: ThreadPoolExecutor(max_workers=HYBRID_CONFIG['workers'], thread_name_prefix=f'hybrid-{signal}')
+    for signal in SIGNALS
+}
+
+
+# ==================== SINAIS ====================
+
+def vector_signal(query_text, limit, backend=None):
+    backend = resolve_backend(backend)
+    # Sem embedding não há sinal: um vetor aleatório traria vizinhos aleatórios para a fusão
+    embedding = embed_or_none(query_text)
+    if embedding is None:
+        raise RuntimeError('embedding da consulta indisponível')
+    if backend == 'faiss':
+        return search_vectors(embedding, limit, backend=backend)
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        if not capabilities.use('vector', cursor):
+            raise RuntimeError('funções vetoriais indisponíveis no banco')
+        try:
+            hits = search_vectors(embedding, limit, backend=backend, cursor=cursor)
+        except Exception as e:
+            capabilities.failed('vector', e)
+            raise
+        capabilities.succeeded('vector')
+        return hits
+
+
+def lexical_signal(query_text, limit):
+    """BM25 em memória ou LIKE no banco, conforme TEXT_SEARCH_BACKEND"""
+    return lexical_search(None, query_text, limit)
+
+
+def graph_signal(customer_id, limit):
+    """Co-visualização: score = nº de clientes similares que assistiram"""
+    if graph_engine_enabled():
+        return [(movie_id, float(similar)) for movie_id, similar in get_cowatch_graph().recommend(customer_id, limit)]
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        counts = sql_similar_users(cursor, customer_id)
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [(movie_id, float(similar)) for movie_id, similar in ranked]
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    return fn(*args), (time.perf_counter() - started) * 1000
+
+
+# ==================== FUSÃO ====================
+
+def fuse(ranked_lists, method='rrf', weights=None, rrf_k=60):
+    """
+    ranked_lists: {sinal: [(movie_id, score)] em ordem}. Devolve
+    [(movie_id, score_final, {sinal: {'rank', 'score', 'contribution'}})].
+    """
+    weights = weights or HYBRID_CONFIG['weights']
+    fused = {}
+    for signal, hits in ranked_lists.items():
+        if not hits:
+            continue
+        weight = weights.get(signal, 1.0)
+        top, bottom = hits[0][1], min(score for _, score in hits)
+        for rank, (movie_id, score) in enumerate(hits, 1):
+            if method == 'weighted':
+                normalized = (score - bottom) / (top - bottom) if top > bottom else 1.0
+                contribution = weight * normalized
+            else:
+                contribution = weight / (rrf_k + rank)
+            total, breakdown = fused.get(movie_id, (0.0, {}))
+            breakdown[signal] = {'rank': rank, 'score': round(float(score), 4), 'contribution': round(contribution, 6)}
+            fused[movie_id] = (total + contribution, breakdown)
+
+    ranked = sorted(fused.items(), key=lambda item: (-item[1][0], item[0]))
+    return [(movie_id, round(total, 6), breakdown) for movie_id, (total, breakdown) in ranked]
+
+
+def hybrid_search(query_text, customer_id=None, top_k=10, fusion=None, backend=None, signals=SIGNALS):
+    """
+    Dispara os sinais pedidos e espera cada um até o próprio prazo.
+    Devolve (resultados fundidos, {sinal: status}).
+    """
+    fusion = fusion or HYBRID_CONFIG['fusion']
+    candidates = max(HYBRID_CONFIG['candidates'], top_k)
+    started = time.perf_counter()
+
+    futures = {}
+    if 'vector' in signals and query_text:
+        futures['vector'] = metrics.submit(_executors['vector'], _timed, vector_signal, query_text, candidates, backend)
+    if 'lexical' in signals and query_text:
+        futures['lexical'] = metrics.submit(_executors['lexical'], _timed, lexical_signal, query_text, candidates)
+    if 'graph' in signals and customer_id is not None:
+        futures['graph'] = metrics.submit(_executors['graph'], _timed, graph_signal, customer_id, candidates)
+
+    ranked_lists = {}
+    status = {}
+    for signal, future in futures.items():
+        budget = HYBRID_CONFIG['timeout_ms'][signal] / 1000
+        remaining = max(0.0, started + budget - time.perf_counter())
+        try:
+            ranked_lists[signal], elapsed_ms = future.result(timeout=remaining)
+            status[signal] = {'status': 'ok', 'hits': len(ranked_lists[signal]), 'elapsed_ms': round(elapsed_ms, 1)}
+        except FutureTimeout:
+            status[signal] = {'status': 'timeout', 'budget_ms': HYBRID_CONFIG['timeout_ms'][signal]}
+            print(f"⚠️  Busca híbrida: sinal '{signal}' estourou {HYBRID_CONFIG['timeout_ms'][signal]} ms")
+        except Exception as e:
+            status[signal] = {'status': 'error', 'error': str(e)}
+            print(f"⚠️  Busca híbrida: sinal '{signal}' falhou: {e}")
+
+    fused = fuse(ranked_lists, fusion, rrf_k=HYBRID_CONFIG['rrf_k'])
+    return fused[:top_k], status
@@ -0,0 +1,293 @@
+"""
+CineGen AI - Similaridade item-item pré-calculada
+✅ Top-K vizinhos por filme (cosseno ou Jaccard sobre contagens de co-visualização)
+✅ Artefato binário compacto (.npz) recarregado no startup
+✅ Job em background: refresh incremental das linhas afetadas por novas
+   visualizações e rebuild completo periódico
+✅ Recomendação = soma dos vizinhos dos filmes que o cliente assistiu
+
+Uso:
+    python item_similarity.py --build            # calcula e grava o artefato
+    python item_similarity.py --benchmark 100    # latência vs grafo em memória vs SQL/PGQL
+"""
+
+import threading
+import argparse
+import time
+import os
+
+import numpy as np
+
+from graph_engine import get_cowatch_graph, gather_rows
+from db import get_db_connection
+from capabilities import capabilities
+import repository
+
+ITEM_SIM_CONFIG = {
+    'k': int(os.getenv('ITEM_SIM_K', 50)),
+    'metric': os.getenv('ITEM_SIM_METRIC', 'cosine'),
+    'path': os.getenv('ITEM_SIM_PATH', 'cache/item_similarity.npz'),
+    'refresh_seconds': int(os.getenv('ITEM_SIM_REFRESH_SECONDS', 300)),
+    'full_refresh_seconds': int(os.getenv('ITEM_SIM_FULL_REFRESH_SECONDS', 86400)),
+}
+
+
+def compute_rows(snapshot, rows, k, metric):
+    """Top-K vizinhos para as linhas (índices de filme) pedidas, a partir do CSR do grafo"""
+    n_movies = snapshot.movie_ids.size
+    degrees = np.diff(snapshot.movie_indptr).astype(np.float32)
+    neighbors = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+
+    for out, i in enumerate(rows):
+        customers = gather_rows(snapshot.movie_indptr, snapshot.movie_indices, [i])
+        if customers.size == 0:
+            continue
+        co = np.bincount(gather_rows(snapshot.cust_indptr, snapshot.cust_indices, customers), minlength=n_movies)
+        co[i] = 0
+        candidates = np.flatnonzero(co)
+        if candidates.size == 0:
+            continue
+        co_c = co[candidates].astype(np.float32)
+        if metric == 'jaccard':
+            sim = co_c / (degrees[i] + degrees[candidates] - co_c)
+        else:
+            sim = co_c / np.sqrt(degrees[i] * degrees[candidates])
+        if candidates.size > k:
+            top = np.argpartition(-sim, k - 1)[:k]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.argsort(-sim[top], kind='stable')]
+        neighbors[out, :top.size] = candidates[top]
+        scores[out, :top.size] = sim[top]
+    return neighbors, scores
+
+
+class ItemSimilarityIndex:
+
+    def __init__(self, movie_ids, neighbors, scores, metric, k, built_at=None):
+        self.movie_ids = movie_ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.metric = metric
+        self.k = k
+        self.built_at = built_at or time.time()
+        self._position = {int(m): i for i, m in enumerate(movie_ids)}
+
+    @classmethod
+    def build(cls, graph, k=None, metric=None):
+        k = k or ITEM_SIM_CONFIG['k']
+        metric = metric or ITEM_SIM_CONFIG['metric']
+        snapshot = graph._snapshot
+        neighbors, scores = compute_rows(snapshot, range(snapshot.movie_ids.size), k, metric)
+        # Vizinhos guardados como MOVIE_ID: o artefato não depende da ordem do CSR
+        neighbor_ids = np.where(neighbors >= 0, snapshot.movie_ids[np.maximum(neighbors, 0)], -1)
+        return cls(snapshot.movie_ids.copy(), neighbor_ids, scores, metric, k)
+
+    def refresh_rows(self, graph, movie_ids):
+        """Recalcula só as linhas dos filmes afetados; filmes novos forçam rebuild"""
+        snapshot = graph._snapshot
+        if any(int(m) not in self._position for m in movie_ids):
+            return ItemSimilarityIndex.build(graph, self.k, self.metric)
+        csr_rows = [snapshot.movie_index(m) for m in movie_ids]
+        neighbors, scores = compute_rows(snapshot, csr_rows, self.k, self.metric)
+        neighbor_ids = np.where(neighbors >= 0, snapshot.movie_ids[np.maximum(neighbors, 0)], -1)
+        new_neighbors = self.neighbors.copy()
+        new_scores = self.scores.copy()
+        for out, movie_id in enumerate(movie_ids):
+            pos = self._position[int(movie_id)]
+            new_neighbors[pos] = neighbor_ids[out]
+            new_scores[pos] = scores[out]
+        return ItemSimilarityIndex(self.movie_ids, new_neighbors, new_scores, self.metric, self.k)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, movie_ids=self.movie_ids, neighbors=self.neighbors, scores=self.scores,
+                 meta=np.array([self.k, self.built_at]), metric=np.array(self.metric))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        k, built_at = data['meta']
+        return cls(data['movie_ids'], data['neighbors'], data['scores'], str(data['metric']), int(k), float(built_at))
+
+    def recommend(self, watched_movie_ids, limit=10):
+        """[(movie_id, score)] somando a similaridade dos vizinhos de cada filme assistido"""
+        rows = [self._position[int(m)] for m in watched_movie_ids if int(m) in self._position]
+        if not rows:
+            return []
+        neighbor_ids = self.neighbors[rows].ravel()
+        neighbor_scores = self.scores[rows].ravel()
+        valid = neighbor_ids >= 0
+        unique_ids, inverse = np.unique(neighbor_ids[valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=neighbor_scores[valid])
+        keep = ~np.isin(unique_ids, np.fromiter((int(m) for m in watched_movie_ids), dtype=np.int64))
+        unique_ids, totals = unique_ids[keep], totals[keep]
+        top = np.argsort(-totals, kind='stable')[:limit]
+        return [(int(unique_ids[i]), float(totals[i])) for i in top]
+
+    def stats(self):
+        return {
+            'movies': int(self.movie_ids.size),
+            'k': self.k,
+            'metric': self.metric,
+            'built_at': self.built_at,
+            'bytes': int(self.neighbors.nbytes + self.scores.nbytes + self.movie_ids.nbytes)
+        }
+
+
+# ==================== JOB DE REFRESH ====================
+
+_index = None
+_index_lock = threading.Lock()
+_dirty_movies = set()
+_dirty_lock = threading.Lock()
+_refresh_thread = None
+
+
+def get_item_similarity():
+    """Índice do processo: artefato em disco ou cálculo a partir do grafo em memória"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if os.path.exists(ITEM_SIM_CONFIG['path']):
+                    index = ItemSimilarityIndex.load(ITEM_SIM_CONFIG['path'])
+                    if (index.k, index.metric) == (ITEM_SIM_CONFIG['k'], ITEM_SIM_CONFIG['metric']):
+                        _index = index
+                        print(f"✓ Similaridade item-item carregada de {ITEM_SIM_CONFIG['path']}")
+                    else:
+                        print(f"⚠️  Artefato com {index.metric}/K={index.k} diferente de ITEM_SIM_METRIC/"
+                              f"ITEM_SIM_K ({ITEM_SIM_CONFIG['metric']}/K={ITEM_SIM_CONFIG['k']}); recalculando")
+                if _index is None:
+                    rebuild()
+        start_refresh_thread()
+    return _index
+
+
+def rebuild():
+    global _index
+    started = time.perf_counter()
+    graph = get_cowatch_graph()
+    graph.compact()
+    index = ItemSimilarityIndex.build(graph)
+    index.save(ITEM_SIM_CONFIG['path'])
+    _index = index
+    print(f"✓ Similaridade item-item ({index.metric}, K={index.k}) para {index.movie_ids.size} filmes "
+          f"em {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def record_watch(cust_id, movie_id):
+    """Uma aresta nova muda o grau do filme: toda a vizinhança de co-visualização dele fica suja"""
+    if _index is None:
+        return
+    with _dirty_lock:
+        _dirty_movies.add(int(movie_id))
+
+
+def refresh_dirty():
+    global _index, _dirty_movies
+    if _index is None:
+        return 0
+    # Troca o conjunto inteiro: o que chegar depois vai para o próximo refresh
+    with _dirty_lock:
+        touched, _dirty_movies = list(_dirty_movies), set()
+    if not touched:
+        return 0
+    graph = get_cowatch_graph()
+    graph.compact()
+
+    snapshot = graph._snapshot
+    touched_rows = [i for i in (snapshot.movie_index(m) for m in touched) if i >= 0]
+    watchers = gather_rows(snapshot.movie_indptr, snapshot.movie_indices, touched_rows)
+    affected = np.union1d(gather_rows(snapshot.cust_indptr, snapshot.cust_indices, np.unique(watchers)), touched_rows)
+    dirty = [int(m) for m in snapshot.movie_ids[affected.astype(np.int64)]] + \
+        [m for m in touched if snapshot.movie_index(m) < 0]
+
+    index = _index.refresh_rows(graph, dirty)
+    index.save(ITEM_SIM_CONFIG['path'])
+    _index = index
+    return len(dirty)
+
+
+def _refresh_loop():
+    last_full = time.time()
+    while True:
+        time.sleep(ITEM_SIM_CONFIG['refresh_seconds'])
+        try:
+            if time.time() - last_full >= ITEM_SIM_CONFIG['full_refresh_seconds']:
+                rebuild()
+                last_full = time.time()
+            else:
+                refreshed = refresh_dirty()
+                if refreshed:
+                    print(f"✓ Similaridade item-item: {refreshed} linhas recalculadas")
+        except Exception as e:
+            print(f"⚠️  Erro no refresh da similaridade item-item: {e}")
+
+
+def start_refresh_thread():
+    global _refresh_thread
+    if _refresh_thread is None and ITEM_SIM_CONFIG['refresh_seconds'] > 0:
+        _refresh_thread = threading.Thread(target=_refresh_loop, name='item-similarity-refresh', daemon=True)
+        _refresh_thread.start()
+
+
+# ==================== BENCHMARK ====================
+
+def _percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {'p50': round(float(np.percentile(samples, 50)), 3), 'p95': round(float(np.percentile(samples, 95)), 3)}
+
+
+def benchmark(sample_size=100, limit=10):
+    graph = get_cowatch_graph()
+    index = get_item_similarity()
+    customers = [int(c) for c in graph._snapshot.customer_ids[:sample_size]]
+    timings = {'item_similarity': [], 'in_memory_graph': [], 'sql_live': []}
+
+    for cust_id in customers:
+        start = time.perf_counter()
+        index.recommend(graph.watched(cust_id), limit)
+        timings['item_similarity'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        graph.recommend(cust_id, limit)
+        timings['in_memory_graph'].append((time.perf_counter() - start) * 1000)
+
+    # Os mesmos statements da rota: PGQL só se o probe achou o Property Graph
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        live = {'sql_live': 'recommendations.sql'}
+        if capabilities.use('graph', cursor):
+            live['pgql_live'] = 'recommendations.pgql'
+        else:
+            print("⚠️  Property Graph indisponível: pgql_live fora da comparação")
+        for name, statement in live.items():
+            timings.setdefault(name, [])
+            for cust_id in customers:
+                start = time.perf_counter()
+                repository.fetch_all(cursor, statement, {'cust_id': cust_id, 'limit': limit}, rows=limit)
+                timings[name].append((time.perf_counter() - start) * 1000)
+
+    for name, samples in timings.items():
+        print(f"  {name:<16} {_percentiles(samples)} ms")
+    return {name: _percentiles(samples) for name, samples in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Similaridade item-item pré-calculada')
+    parser.add_argument('--build', action='store_true', help='calcula e grava o artefato')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='compara latências para N clientes')
+    args = parser.parse_args()
+
+    if args.build:
+        rebuild()
+    if args.benchmark:
+        benchmark(args.benchmark)
+
+
+if __name__ == '__main__':
+    main()
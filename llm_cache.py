@@ -0,0 +1,118 @@
+"""
+CineGen AI - Cache de respostas do LLM
+✅ Tier exato: hash de (modelo, temperatura, max_tokens, prompt)
+✅ Tier semântico: mesma pergunta com outras palavras reaproveita a resposta
+   quando o cosseno entre os embeddings da mensagem passa do limiar e o
+   contexto (escopo + contexto do grafo) é idêntico
+✅ LRU com limite de tamanho e TTL
+"""
+
+from collections import OrderedDict
+import threading
+import hashlib
+import json
+import time
+
+import numpy as np
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+class LLMResponseCache:
+
+    def __init__(self, max_items=1000, ttl_seconds=3600, semantic_threshold=0.95):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self._entries = OrderedDict()   # chave exata -> (resposta, criado_em, grupo)
+        self._groups = {}               # grupo de contexto -> {chave exata: vetor normalizado}
+        self._lock = threading.Lock()
+        self.metrics = {'hits_exact': 0, 'hits_semantic': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        group = self._groups.get(entry[2])
+        if group is not None:
+            group.pop(key, None)
+            if not group:
+                del self._groups[entry[2]]
+
+    def _alive(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[1] > self.ttl_seconds:
+            self._drop(key)
+            return None
+        return entry
+
+    def get(self, exact_key, group_key=None, vector_fn=None):
+        """
+        (resposta, 'exact' | 'semantic', similaridade) ou (None, None, None).
+        vector_fn só é chamada (fora do lock) se o tier exato falhar e houver
+        respostas em cache para o mesmo contexto.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._alive(exact_key, now)
+            if entry is not None:
+                self._entries.move_to_end(exact_key)
+                self.metrics['hits_exact'] += 1
+                return entry[0], 'exact', 1.0
+            has_group = group_key in self._groups
+
+        vector = vector_fn() if vector_fn is not None and has_group else None
+        with self._lock:
+            if vector is not None and group_key in self._groups:
+                query = _normalize(vector)
+                best_key, best_score = None, self.semantic_threshold
+                for key, cached_vector in list(self._groups[group_key].items()):
+                    if self._alive(key, now) is None:
+                        continue
+                    score = float(np.dot(query, cached_vector))
+                    if score >= best_score:
+                        best_key, best_score = key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.metrics['hits_semantic'] += 1
+                    return self._entries[best_key][0], 'semantic', round(best_score, 4)
+
+            self.metrics['misses'] += 1
+            return None, None, None
+
+    def put(self, exact_key, answer, group_key=None, vector=None):
+        with self._lock:
+            self._drop(exact_key)
+            self._entries[exact_key] = (answer, time.time(), group_key)
+            if group_key is not None and vector is not None:
+                self._groups.setdefault(group_key, {})[exact_key] = _normalize(vector)
+            self.metrics['stores'] += 1
+            while len(self._entries) > self.max_items:
+                self._drop(next(iter(self._entries)))
+                self.metrics['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self):
+        lookups = self.metrics['hits_exact'] + self.metrics['hits_semantic'] + self.metrics['misses']
+        hits = self.metrics['hits_exact'] + self.metrics['hits_semantic']
+        return {
+            **self.metrics,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'items': len(self._entries),
+            'context_groups': len(self._groups),
+            'semantic_threshold': self.semantic_threshold
+        }
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
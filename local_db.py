@@ -0,0 +1,425 @@
+"""
+CineGen AI - Banco local (SQLite) no lugar do Oracle, para benchmark e desenvolvimento
+✅ Mesmas tabelas (MOVIES, MOVIES_CUSTOMER, WATCHED_MOVIE, MEDIA_ASSETS, MOVIE_VECTORS)
+   e a mesma API do pool do oracledb: db.get_db_connection() não muda (DB_BACKEND=sqlite)
+✅ Traduz o dialeto usado pelo app: FETCH FIRST/OFFSET, NVL, GREATEST, SYSDATE, DUAL,
+   MERGE (WATCHED_MOVIE e MOVIE_VECTORS), sequences (NEXTVAL) e VECTOR_DISTANCE
+✅ MOVIES.ORA_ROWSCN mantido por trigger (cresce a cada INSERT/UPDATE), como a
+   pseudocoluna do Oracle usada para detectar filmes alterados
+✅ GRAPH_TABLE não existe aqui: o probe de capabilities cai no fallback SQL,
+   como num banco sem o Property Graph
+✅ Conta round trips como o oracledb faria (execute + prefetchrows, um fetch a cada
+   arraysize linhas, commit), para comparar tuning de fetch sem o banco real
+
+Erros do SQLite saem como oracledb.DatabaseError / IntegrityError com código ORA-.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+import threading
+import sqlite3
+import queue
+import json
+import re
+
+import oracledb
+import numpy as np
+
+LOCAL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS MOVIES (
+        MOVIE_ID INTEGER PRIMARY KEY, TITLE TEXT, GENRES TEXT, SUMMARY TEXT, RATING REAL, YEAR INTEGER,
+        ORA_ROWSCN INTEGER NOT NULL DEFAULT 0
+    );
+    -- ORA_ROWSCN do Oracle: contador global carimbado em cada INSERT/UPDATE de MOVIES
+    CREATE TABLE IF NOT EXISTS LOCAL_SCN (VALUE INTEGER NOT NULL);
+    INSERT INTO LOCAL_SCN SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM LOCAL_SCN);
+    CREATE TRIGGER IF NOT EXISTS MOVIES_SCN_INSERT AFTER INSERT ON MOVIES BEGIN
+        UPDATE LOCAL_SCN SET VALUE = VALUE + 1;
+        UPDATE MOVIES SET ORA_ROWSCN = (SELECT VALUE FROM LOCAL_SCN) WHERE MOVIE_ID = NEW.MOVIE_ID;
+    END;
+    CREATE TRIGGER IF NOT EXISTS MOVIES_SCN_UPDATE AFTER UPDATE OF TITLE, GENRES, SUMMARY, RATING, YEAR ON MOVIES BEGIN
+        UPDATE LOCAL_SCN SET VALUE = VALUE + 1;
+        UPDATE MOVIES SET ORA_ROWSCN = (SELECT VALUE FROM LOCAL_SCN) WHERE MOVIE_ID = NEW.MOVIE_ID;
+    END;
+    CREATE TABLE IF NOT EXISTS MOVIES_CUSTOMER (
+        CUST_ID INTEGER PRIMARY KEY, FIRSTNAME TEXT, LASTNAME TEXT, EMAIL TEXT
+    );
+    CREATE TABLE IF NOT EXISTS WATCHED_MOVIE (
+        PROMO_CUST_ID INTEGER NOT NULL REFERENCES MOVIES_CUSTOMER (CUST_ID),
+        MOVIE_ID INTEGER NOT NULL REFERENCES MOVIES (MOVIE_ID),
+        DAY_ID TIMESTAMP, RATING_GIVEN REAL,
+        PRIMARY KEY (PROMO_CUST_ID, MOVIE_ID)
+    );
+    CREATE INDEX IF NOT EXISTS WATCHED_MOVIE_MOVIE_IDX ON WATCHED_MOVIE (MOVIE_ID, PROMO_CUST_ID);
+    CREATE TABLE IF NOT EXISTS MEDIA_ASSETS (
+        MOVIE_ID INTEGER NOT NULL, ASSET_TYPE TEXT NOT NULL, ASSET_URL TEXT
+    );
+    CREATE INDEX IF NOT EXISTS MEDIA_ASSETS_MOVIE_IDX ON MEDIA_ASSETS (MOVIE_ID);
+    CREATE TABLE IF NOT EXISTS MOVIE_VECTORS (
+        MOVIE_ID INTEGER PRIMARY KEY REFERENCES MOVIES (MOVIE_ID), EMBEDDING TEXT
+    );
+    CREATE TABLE IF NOT EXISTS LOCAL_SEQUENCES (
+        NAME TEXT PRIMARY KEY, NEXT_VALUE INTEGER NOT NULL, INCREMENT_BY INTEGER NOT NULL
+    );
+"""
+
+# MERGE do app -> upsert do SQLite, por tabela de destino
+MERGE_TRANSLATIONS = {
+    'WATCHED_MOVIE': """
+        INSERT INTO WATCHED_MOVIE (PROMO_CUST_ID, MOVIE_ID, DAY_ID, RATING_GIVEN)
+        VALUES (:cust_id, :movie_id, IFNULL(:day_id, CURRENT_TIMESTAMP), :rating)
+        ON CONFLICT (PROMO_CUST_ID, MOVIE_ID) DO UPDATE SET
+            RATING_GIVEN = IFNULL(excluded.RATING_GIVEN, RATING_GIVEN),
+            DAY_ID = MAX(IFNULL(DAY_ID, excluded.DAY_ID), excluded.DAY_ID)
+    """,
+    'MOVIE_VECTORS': """
+        INSERT INTO MOVIE_VECTORS (MOVIE_ID, EMBEDDING) VALUES (:movie_id, :embedding)
+        ON CONFLICT (MOVIE_ID) DO UPDATE SET EMBEDDING = excluded.EMBEDDING
+    """,
+}
+
+_REWRITES = [
+    (re.compile(r'OFFSET\s+(:?\w+)\s+ROWS\s+FETCH\s+NEXT\s+(:?\w+)\s+ROWS\s+ONLY', re.I), r'LIMIT \2 OFFSET \1'),
+    (re.compile(r'FETCH\s+(?:APPROX\s+)?(?:FIRST|NEXT)\s+(:?\w+)\s+ROWS\s+ONLY(?:\s+WITH\s+TARGET\s+ACCURACY\s+\d+)?',
+                re.I), r'LIMIT \1'),
+    (re.compile(r'\bNVL\(', re.I), 'IFNULL('),
+    (re.compile(r'\bGREATEST\(', re.I), 'MAX('),
+    (re.compile(r'\bLEAST\(', re.I), 'MIN('),
+    (re.compile(r'\bSYSDATE\b', re.I), 'CURRENT_TIMESTAMP'),
+    (re.compile(r'\bFROM\s+DUAL\b', re.I), ''),
+    (re.compile(r',\s*COSINE\s*\)', re.I), ", 'COSINE')"),
+    (re.compile(r'FROM_VECTOR\((\w+)\s+RETURNING\s+CLOB\)', re.I), r'\1'),
+    # SCHEMA = '' deixa '.MOVIES' nas queries
+    (re.compile(r'(?<=[\s(,])\.(?=[A-Za-z_])'), ''),
+]
+
+_NEXTVAL = re.compile(r'SELECT\s+\.?(\w+)\.NEXTVAL\s+FROM\s+DUAL(?:\s+CONNECT\s+BY\s+LEVEL\s*<=\s*:(\w+))?', re.I)
+_CREATE_SEQUENCE = re.compile(r'CREATE\s+SEQUENCE\s+\.?(\w+)\s+START\s+WITH\s+(\d+)\s+INCREMENT\s+BY\s+(\d+)', re.I)
+_MERGE = re.compile(r'MERGE\s+INTO\s+\.?(\w+)', re.I)
+
+
+class LocalError:
+    """Mesmo formato do _Error do oracledb (e.args[0].code / .message)"""
+
+    def __init__(self, code, message):
+        self.code = code
+        self.full_code = f'ORA-{code:05d}'
+        self.message = f'{self.full_code}: {message}'
+
+    def __str__(self):
+        return self.message
+
+
+def _database_error(code, message, cls=oracledb.DatabaseError):
+    return cls(LocalError(code, message))
+
+
+def _translate_error(error):
+    message = str(error)
+    if isinstance(error, sqlite3.IntegrityError):
+        if 'FOREIGN KEY' in message:
+            return _database_error(2291, 'integrity constraint violated - parent key not found', oracledb.IntegrityError)
+        return _database_error(1, f'unique constraint violated ({message})', oracledb.IntegrityError)
+    if 'no such table' in message:
+        return _database_error(942, f'table or view does not exist ({message})')
+    if 'no such column' in message:
+        return _database_error(904, f'invalid identifier ({message})')
+    return _database_error(900, message)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """SQL do app -> SQLite; ('sequence', nome, bind) para NEXTVAL"""
+    if 'GRAPH_TABLE' in sql.upper():
+        raise _database_error(942, 'GRAPH_TABLE indisponível no banco local (sem Property Graph)')
+    match = _NEXTVAL.search(sql)
+    if match:
+        return ('sequence', match.group(1).upper(), match.group(2))
+    match = _CREATE_SEQUENCE.search(sql)
+    if match:
+        return ('create_sequence', match.group(1).upper(), int(match.group(2)), int(match.group(3)))
+    match = _MERGE.search(sql)
+    if match:
+        table = match.group(1).upper()
+        if table not in MERGE_TRANSLATIONS:
+            raise _database_error(3001, f'MERGE em {table} não suportado no banco local')
+        return MERGE_TRANSLATIONS[table]
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+# ==================== FUNÇÕES VETORIAIS ====================
+
+@lru_cache(maxsize=65536)
+def _parse_vector(text):
+    vector = np.asarray(json.loads(text), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _vector_distance(a, b, metric='COSINE'):
+    if a is None or b is None:
+        return None
+    return float(1.0 - np.dot(_parse_vector(a), _parse_vector(b)))
+
+
+def _to_vector(text):
+    return text
+
+
+# Tipos que o app passa como bind e o sqlite3 não conhece
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+sqlite3.register_adapter(np.float32, float)
+sqlite3.register_adapter(np.float64, float)
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+
+# ==================== CURSOR / CONEXÃO / POOL ====================
+
+class _BatchError:
+
+    def __init__(self, offset, error):
+        self.offset = offset
+        self.code = error.args[0].code
+        self.message = error.args[0].message
+
+
+class LocalCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._sqlite.cursor()
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.rowcount = 0
+        self._rows = None          # resultado sintético (NEXTVAL)
+        self._available = 0        # linhas já "trazidas" pelos round trips
+        self._consumed = 0
+        self._done = True
+        self._batch_errors = []
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def _round_trip(self, count=1):
+        self.connection.pool._count('round_trips', count)
+
+    def execute(self, sql, parameters=None, **kwargs):
+        statement = translate(sql)
+        params = parameters if parameters is not None else kwargs
+        self._round_trip()
+        self._rows = None
+        if isinstance(statement, tuple):
+            return self._execute_special(statement, params)
+        try:
+            self._cursor.execute(statement, params)
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        self.rowcount = self._cursor.rowcount
+        self.connection.pool._count('executes')
+        self._start_fetch(query=self._cursor.description is not None)
+        return self if self._cursor.description is not None else None
+
+    def _execute_special(self, statement, params):
+        db = self.connection._sqlite
+        if statement[0] == 'create_sequence':
+            _, name, start, increment = statement
+            db.execute("INSERT INTO LOCAL_SEQUENCES VALUES (?, ?, ?)", (name, start, increment))
+            # DDL faz commit implícito no Oracle
+            db.commit()
+            return None
+        _, name, bind = statement
+        count = int(params.get(bind, 1)) if bind else 1
+        row = db.execute("SELECT NEXT_VALUE, INCREMENT_BY FROM LOCAL_SEQUENCES WHERE NAME = ?", (name,)).fetchone()
+        if row is None:
+            raise _database_error(2289, 'sequence does not exist')
+        start, increment = row
+        db.execute("UPDATE LOCAL_SEQUENCES SET NEXT_VALUE = ? WHERE NAME = ?", (start + count * increment, name))
+        # Sequences não participam da transação no Oracle
+        db.commit()
+        self._rows = iter([(start + i * increment,) for i in range(count)])
+        self._start_fetch(query=True)
+        return self
+
+    def _start_fetch(self, query):
+        self._consumed = 0
+        self._available = self.prefetchrows if query else 0
+        self._done = not query
+
+    def _next_row(self):
+        if self._done:
+            return None
+        row = next(self._rows, None) if self._rows is not None else self._cursor.fetchone()
+        if row is None:
+            # O fim só é descoberto num fetch quando o buffer acabou exatamente
+            if self._consumed >= self._available:
+                self._round_trip()
+            self._done = True
+            return None
+        if self._consumed >= self._available:
+            self._round_trip()
+            self._available += self.arraysize
+        self._consumed += 1
+        self.connection.pool._count('rows')
+        return row
+
+    def fetchone(self):
+        return self._next_row()
+
+    def fetchmany(self, size=None):
+        rows = []
+        for _ in range(size or self.arraysize):
+            row = self._next_row()
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    def fetchall(self):
+        return list(iter(self._next_row, None))
+
+    def __iter__(self):
+        return iter(self._next_row, None)
+
+    def executemany(self, sql, seq_of_parameters, batcherrors=False, **kwargs):
+        statement = translate(sql)
+        self._round_trip()
+        self._batch_errors = []
+        self._rows = None
+        self._start_fetch(query=False)
+        rows = list(seq_of_parameters)
+        self.connection.pool._count('executes')
+        if not batcherrors:
+            try:
+                self._cursor.executemany(statement, rows)
+            except sqlite3.Error as e:
+                raise _translate_error(e) from e
+            self.rowcount = self._cursor.rowcount
+            return
+        # batcherrors: linha a linha, as que falham viram getbatcherrors()
+        self.rowcount = 0
+        for offset, params in enumerate(rows):
+            try:
+                self._cursor.execute(statement, params)
+                self.rowcount += 1
+            except sqlite3.Error as e:
+                self._batch_errors.append(_BatchError(offset, _translate_error(e)))
+
+    def getbatcherrors(self):
+        return self._batch_errors
+
+    def setinputsizes(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class LocalConnection:
+
+    def __init__(self, pool, path):
+        self.pool = pool
+        self._sqlite = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                       detect_types=sqlite3.PARSE_DECLTYPES)
+        self._sqlite.execute('PRAGMA foreign_keys = ON')
+        self._sqlite.create_function('VECTOR_DISTANCE', 3, _vector_distance, deterministic=True)
+        self._sqlite.create_function('TO_VECTOR', 1, _to_vector, deterministic=True)
+
+    def cursor(self):
+        return LocalCursor(self)
+
+    def commit(self):
+        self.pool._count('round_trips')
+        self._sqlite.commit()
+
+    def rollback(self):
+        self.pool._count('round_trips')
+        self._sqlite.rollback()
+
+    def close(self):
+        self._sqlite.close()
+
+
+class LocalPool:
+    """Subconjunto do oracledb.ConnectionPool usado por db.py"""
+
+    def __init__(self, path, min=1, max=10, increment=1, stmtcachesize=0, ping_interval=-1,
+                 wait_timeout=5000, **kwargs):
+        self.path = path
+        self.min, self.max, self.increment = min, max, increment
+        self.stmtcachesize = stmtcachesize
+        self.ping_interval = ping_interval
+        self.wait_timeout = wait_timeout
+        self.busy = 0
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self.counters = {'round_trips': 0, 'executes': 0, 'rows': 0}
+        setup = sqlite3.connect(path)
+        try:
+            # WAL: leitores não esperam o escritor
+            setup.execute('PRAGMA journal_mode = WAL')
+            setup.executescript(LOCAL_SCHEMA)
+        finally:
+            setup.close()
+        for _ in range(min):
+            self._idle.put(self._open())
+
+    @property
+    def opened(self):
+        return len(self._all)
+
+    def _open(self):
+        connection = LocalConnection(self, self.path)
+        self._all.append(connection)
+        return connection
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def acquire(self):
+        with self._lock:
+            grow = self._idle.empty() and len(self._all) < self.max
+            if grow:
+                connection = self._open()
+        if not grow:
+            try:
+                connection = self._idle.get(timeout=self.wait_timeout / 1000)
+            except queue.Empty:
+                raise _database_error(24459, 'timeout esperando conexão livre no pool local')
+        with self._lock:
+            self.busy += 1
+        return connection
+
+    def release(self, connection):
+        # Como o pool do Oracle: transação aberta é desfeita na devolução
+        connection._sqlite.rollback()
+        with self._lock:
+            self.busy -= 1
+        self._idle.put(connection)
+
+    def close(self, force=False):
+        for connection in self._all:
+            connection.close()
+        self._all = []
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+def create_pool(path, **kwargs):
+    """path tem que ser um arquivo: cada conexão do pool abre o mesmo banco"""
+    return LocalPool(path, **kwargs)
@@ -0,0 +1,116 @@
+"""
+CineGen AI - Resolução de posters e trailers (MEDIA_ASSETS)
+✅ Cache em processo da tabela MEDIA_ASSETS (quase estática), com TTL
+✅ Ids ausentes do cache resolvidos em lote com um único IN
+✅ No máximo uma query por resposta, nunca uma por filme
+✅ Sem a tabela (probe em capabilities) as respostas saem sem posters, sem query
+"""
+
+import threading
+import time
+import os
+
+import repository
+from metrics import timed
+from capabilities import capabilities
+
+MEDIA_CONFIG = {
+    'ttl_seconds': int(os.getenv('MEDIA_ASSETS_TTL_SECONDS', 3600)),
+    # Carrega a tabela inteira no primeiro acesso; com 0 só busca os ids pedidos
+    'preload': os.getenv('MEDIA_ASSETS_PRELOAD', '1') == '1',
+    'max_in_list': 1000,
+}
+
+ASSET_TYPES = ('poster_url', 'trailer_url')
+
+
+class MediaAssetResolver:
+
+    def __init__(self, ttl_seconds=MEDIA_CONFIG['ttl_seconds'], preload=MEDIA_CONFIG['preload']):
+        self.ttl_seconds = ttl_seconds
+        self.preload = preload
+        self._assets = {}
+        self._loaded_at = 0.0
+        self._complete = False
+        self._lock = threading.Lock()
+        self.metrics = {'queries': 0, 'hits': 0, 'misses': 0}
+
+    @property
+    def available(self):
+        return bool(capabilities['media_assets'].available)
+
+    def _expired(self):
+        return time.time() - self._loaded_at > self.ttl_seconds
+
+    def _rows_to_assets(self, rows, assets):
+        for movie_id, asset_type, asset_url in rows:
+            if asset_type in ASSET_TYPES:
+                assets.setdefault(movie_id, {})[asset_type] = asset_url
+
+    def _load_all(self, cursor):
+        assets = {}
+        self._rows_to_assets(repository.execute(cursor, 'media_assets.all'), assets)
+        self.metrics['queries'] += 1
+        with self._lock:
+            self._assets = assets
+            self._loaded_at = time.time()
+            self._complete = True
+
+    def _load_ids(self, cursor, movie_ids):
+        found = {movie_id: {} for movie_id in movie_ids}
+        for start in range(0, len(movie_ids), MEDIA_CONFIG['max_in_list']):
+            chunk = movie_ids[start:start + MEDIA_CONFIG['max_in_list']]
+            self._rows_to_assets(repository.fetch_all(cursor, 'media_assets.by_ids', ids=chunk), found)
+            self.metrics['queries'] += 1
+        with self._lock:
+            if self._expired():
+                self._assets = {}
+                self._loaded_at = time.time()
+            # Ids sem asset ficam em cache como {} para não voltar ao banco
+            self._assets.update(found)
+
+    @timed('media_assets')
+    def resolve(self, cursor, movie_ids):
+        """{movie_id: {'poster_url': ..., 'trailer_url': ...}} para os ids pedidos"""
+        movie_ids = list(dict.fromkeys(movie_ids))
+        if not movie_ids:
+            return {}
+        if not capabilities.use('media_assets', cursor):
+            return {}
+
+        try:
+            if self.preload:
+                if not self._complete or self._expired():
+                    self._load_all(cursor)
+            else:
+                with self._lock:
+                    missing = movie_ids if self._expired() else [m for m in movie_ids if m not in self._assets]
+                if missing:
+                    self.metrics['misses'] += len(missing)
+                    self._load_ids(cursor, missing)
+            capabilities.succeeded('media_assets')
+        except Exception as e:
+            print(f"⚠️  MEDIA_ASSETS indisponível: {e}")
+            capabilities.failed('media_assets', e)
+            return {}
+
+        with self._lock:
+            self.metrics['hits'] += len(movie_ids)
+            return {movie_id: self._assets.get(movie_id, {}) for movie_id in movie_ids}
+
+    def invalidate(self):
+        with self._lock:
+            self._assets = {}
+            self._loaded_at = 0.0
+            self._complete = False
+
+    def stats(self):
+        return {
+            **self.metrics,
+            'cached_movies': len(self._assets),
+            'available': self.available,
+            'preload': self.preload
+        }
+
+
+media_assets = MediaAssetResolver()
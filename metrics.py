@@ -0,0 +1,302 @@
+"""
+CineGen AI - Latência por etapa
+✅ Histogramas por (rota, etapa, caminho): conexão, cada execute/fetch
+   (caminho pgql / vector / sql pelo texto da query), embedding, LLM, pôsteres
+✅ Tempo total por rota, método e status; tempo por statement nomeado do repositório
+✅ Exportação no formato texto do Prometheus (/api/metrics)
+✅ Server-Timing opcional com a soma de cada etapa da requisição
+✅ Contexto da requisição segue para as threads dos executors (metrics.submit)
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+import contextvars
+import threading
+import time
+import os
+
+METRICS_CONFIG = {
+    'enabled': os.getenv('METRICS_ENABLED', '1') == '1',
+    'server_timing': os.getenv('METRICS_SERVER_TIMING', '1') == '1',
+    'prefix': os.getenv('METRICS_PREFIX', 'cinegen'),
+}
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _RequestTiming:
+
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.stages = []  # (etapa, caminho, segundos); list.append é seguro entre threads
+
+
+_current = contextvars.ContextVar('metrics_request', default=None)
+_path = contextvars.ContextVar('metrics_path', default=None)
+
+
+# ==================== HISTOGRAMAS ====================
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # labels -> [contagens por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {count}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {series[-1]}')
+        return lines
+
+
+stage_seconds = Histogram(f"{METRICS_CONFIG['prefix']}_stage_seconds",
+                          'Tempo de cada etapa por rota e caminho de execução', ('route', 'stage', 'path'))
+request_seconds = Histogram(f"{METRICS_CONFIG['prefix']}_request_seconds",
+                            'Tempo total da requisição', ('route', 'method', 'status'))
+statement_seconds = Histogram(f"{METRICS_CONFIG['prefix']}_statement_seconds",
+                              'Execute + fetch de cada statement nomeado (repository.py)', ('statement',))
+
+# nome -> (help, fn() -> [(labels dict, valor)])
+_gauges = {}
+
+
+def register_gauge(name, help_text, fn):
+    _gauges[f"{METRICS_CONFIG['prefix']}_{name}"] = (help_text, fn)
+
+
+# ==================== ETAPAS ====================
+
+def observe_stage(stage, seconds, path=None):
+    if not METRICS_CONFIG['enabled']:
+        return
+    path = path or _path.get() or '-'
+    timing = _current.get()
+    stage_seconds.observe((timing.route if timing else 'background', stage, path), seconds)
+    if timing is not None:
+        timing.stages.append((stage, path, seconds))
+
+
+def observe_statement(name, seconds):
+    if METRICS_CONFIG['enabled']:
+        statement_seconds.observe((name,), seconds)
+
+
+@contextmanager
+def stage(name, path=None):
+    if not METRICS_CONFIG['enabled']:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started, path)
+
+
+def timed(name):
+    """Decorator: a função inteira vira a etapa 'name'"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit(executor, fn, *args):
+    """executor.submit levando o contexto da requisição (rota e etapas) para a thread"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def set_path(name):
+    """Caminho da requisição daqui em diante ('pgql', 'fallback', ...): rotula as etapas seguintes"""
+    _path.set(name)
+
+
+@contextmanager
+def execution_path(name):
+    """Como set_path, mas só dentro do bloco"""
+    token = _path.set(name)
+    try:
+        yield
+    finally:
+        _path.reset(token)
+
+
+def query_path(sql):
+    text = sql.upper()
+    if 'GRAPH_TABLE' in text:
+        return 'pgql'
+    if 'VECTOR_DISTANCE' in text:
+        return 'vector'
+    return 'sql'
+
+
+# ==================== CURSOR / CONEXÃO ====================
+
+class TimedCursor:
+    """Repassa tudo ao cursor do oracledb; execute/fetch viram etapas db_execute/db_fetch"""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_label', 'sql')
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # arraysize, prefetchrows, ... precisam chegar no cursor real
+        setattr(self._cursor, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def execute(self, sql, *args, **kwargs):
+        object.__setattr__(self, '_label', _path.get() or query_path(sql))
+        with stage('db_execute', self._label):
+            return self._cursor.execute(sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        object.__setattr__(self, '_label', _path.get() or query_path(sql))
+        with stage('db_executemany', self._label):
+            return self._cursor.executemany(sql, *args, **kwargs)
+
+    def fetchone(self):
+        with stage('db_fetch', self._label):
+            return self._cursor.fetchone()
+
+    def fetchmany(self, *args, **kwargs):
+        with stage('db_fetch', self._label):
+            return self._cursor.fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        with stage('db_fetch', self._label):
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        # Uma observação por varredura, somando só o tempo dentro do driver
+        rows = iter(self._cursor)
+        spent = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    row = next(rows)
+                except StopIteration:
+                    return
+                finally:
+                    spent += time.perf_counter() - started
+                yield row
+        finally:
+            observe_stage('db_fetch', spent, self._label)
+
+
+class TimedConnection:
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        with stage('db_commit'):
+            return self._conn.commit()
+
+
+def wrap_connection(conn):
+    return TimedConnection(conn) if METRICS_CONFIG['enabled'] else conn
+
+
+# ==================== REQUISIÇÃO ====================
+
+def begin_request(route, method):
+    if METRICS_CONFIG['enabled']:
+        _current.set(_RequestTiming(route, method))
+        _path.set(None)
+
+
+def server_timing(timing, total_seconds):
+    totals = {}
+    for stage_name, path, seconds in list(timing.stages):
+        key = stage_name if path == '-' else f'{stage_name}.{path}'
+        spent, count = totals.get(key, (0.0, 0))
+        totals[key] = (spent + seconds, count + 1)
+    parts = [f'{key};dur={spent * 1000:.1f};desc="{count}x"' for key, (spent, count) in totals.items()]
+    parts.append(f'total;dur={total_seconds * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def finish_request(response):
+    """after_request: Server-Timing com o que já rodou; o total é registrado quando o corpo termina"""
+    timing = _current.get()
+    if timing is None:
+        return response
+    if METRICS_CONFIG['server_timing']:
+        response.headers['Server-Timing'] = server_timing(timing, time.perf_counter() - timing.started)
+
+    status = str(response.status_code)
+    # Respostas em streaming (SSE) só acabam depois do after_request; o contexto
+    # continua valendo para as etapas que rodam dentro do gerador
+    response.call_on_close(lambda: request_seconds.observe(
+        (timing.route, timing.method, status), time.perf_counter() - timing.started))
+    return response
+
+
+def render_prometheus():
+    lines = stage_seconds.render() + request_seconds.render() + statement_seconds.render()
+    for name, (help_text, fn) in sorted(_gauges.items()):
+        try:
+            samples = fn()
+        except Exception as e:
+            print(f"⚠️  Erro lendo métrica {name}: {e}")
+            continue
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        for labels, value in samples:
+            lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {value}')
+    return '\n'.join(lines) + '\n'
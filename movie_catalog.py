@@ -0,0 +1,409 @@
+"""
+CineGen AI - Catálogo de filmes em memória (colunar)
+✅ Colunas NumPy ordenadas por MOVIE_ID: id, ano, rating e nº de visualizações
+✅ Gêneros internados: cada par (gênero, valor) do JSON de GENRES vira um código,
+   lido uma vez na carga em vez de um json.loads por linha em cada página
+✅ Títulos e sinopses numa arena UTF-8 com offsets (um bytes por coluna, não 5k str)
+✅ Browse por keyset, filtro (gênero, rating mínimo, ano), ordenação e hidratação
+   por ids sem round trip ao banco
+✅ Snapshot .npz em disco: o startup só relê MOVIES se a assinatura da tabela mudou
+   (inclui MAX(ORA_ROWSCN), então edições de título, sinopse, gêneros ou ano contam);
+   o refresh periódico usa a mesma assinatura (nada, só contagens ou carga completa)
+
+Uso:
+    python movie_catalog.py --build                      # lê do banco e grava o snapshot
+    python movie_catalog.py --sort rating --genre Dramas # página do catálogo no console
+"""
+
+import threading
+import argparse
+import json
+import time
+import os
+
+import numpy as np
+
+from db import get_db_connection
+from metrics import timed
+import repository
+
+CATALOG_CONFIG = {
+    'enabled': os.getenv('MOVIE_CATALOG_ENABLED', '1') == '1',
+    'path': os.getenv('MOVIE_CATALOG_PATH', 'cache/movie_catalog.npz'),
+    'refresh_seconds': int(os.getenv('MOVIE_CATALOG_REFRESH_SECONDS', 300)),
+}
+
+# id: keyset por MOVIE_ID; as demais: decrescente com MOVIE_ID no desempate
+SORTS = ('id', 'rating', 'year', 'popular')
+
+
+def parse_genres_value(value):
+    """GENRES vem como dict (coluna JSON), LOB ou texto JSON; qualquer outra coisa vira {}"""
+    if hasattr(value, 'read'):
+        value = value.read()
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+class StringArena:
+    """Strings concatenadas em UTF-8 + offsets; decodifica só o que é hidratado"""
+
+    def __init__(self, data, offsets):
+        self._data = bytes(data)
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [(value or '').encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+        return cls(b''.join(encoded), offsets)
+
+    def __getitem__(self, i):
+        return self._data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def to_array(self):
+        return np.frombuffer(self._data, dtype=np.uint8)
+
+    @property
+    def nbytes(self):
+        return len(self._data) + self.offsets.nbytes
+
+
+class MovieCatalog:
+
+    def __init__(self, ids, years, ratings, watch_counts, genre_indptr, genre_codes, genre_pairs,
+                 titles, summaries, summary_null, signature, source='db', loaded_at=None):
+        self.ids = ids
+        self.years = years
+        self.ratings = ratings
+        self.watch_counts = watch_counts
+        self.genre_indptr = genre_indptr
+        self.genre_codes = genre_codes
+        self.genre_pairs = genre_pairs  # código -> (gênero, valor original do JSON)
+        self.titles = titles
+        self.summaries = summaries
+        self.summary_null = summary_null
+        self.signature = signature
+        self.source = source
+        self.loaded_at = loaded_at or time.time()
+        self._genre_rows = np.repeat(np.arange(ids.size), np.diff(genre_indptr))
+        self._codes_by_genre = {}
+        for code, (genre, _) in enumerate(genre_pairs):
+            self._codes_by_genre.setdefault(genre.lower(), []).append(code)
+        self._orders = {}
+
+    def __len__(self):
+        return int(self.ids.size)
+
+    @classmethod
+    def from_rows(cls, rows, watch_counts, signature):
+        """rows: (MOVIE_ID, TITLE, SUMMARY, GENRES, RATING, YEAR) em ordem de MOVIE_ID"""
+        rows = sorted(rows, key=lambda row: row[0])
+        pair_codes = {}
+        genre_pairs, genre_codes, genre_indptr = [], [], [0]
+        for row in rows:
+            for genre, value in parse_genres_value(row[3]).items():
+                key = (genre, json.dumps(value, sort_keys=True))
+                code = pair_codes.get(key)
+                if code is None:
+                    code = pair_codes[key] = len(genre_pairs)
+                    genre_pairs.append((genre, value))
+                genre_codes.append(code)
+            genre_indptr.append(len(genre_codes))
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        return cls(
+            ids=ids,
+            years=np.fromiter((row[5] or 0 for row in rows), dtype=np.int32, count=len(rows)),
+            ratings=np.fromiter((row[4] or 0 for row in rows), dtype=np.float64, count=len(rows)),
+            watch_counts=np.fromiter((watch_counts.get(int(m), 0) for m in ids), dtype=np.int64, count=len(rows)),
+            genre_indptr=np.asarray(genre_indptr, dtype=np.int64),
+            genre_codes=np.asarray(genre_codes, dtype=np.int32),
+            genre_pairs=genre_pairs,
+            titles=StringArena.from_strings(row[1] for row in rows),
+            summaries=StringArena.from_strings(_read_text(row[2]) for row in rows),
+            summary_null=np.fromiter((row[2] is None for row in rows), dtype=np.bool_, count=len(rows)),
+            signature=signature
+        )
+
+    def with_watch_counts(self, watch_counts, signature):
+        """Mesmo catálogo com contagens novas (só WATCHED_MOVIE mudou)"""
+        counts = np.fromiter((watch_counts.get(int(m), 0) for m in self.ids), dtype=np.int64, count=self.ids.size)
+        return MovieCatalog(self.ids, self.years, self.ratings, counts, self.genre_indptr, self.genre_codes,
+                            self.genre_pairs, self.titles, self.summaries, self.summary_null, signature,
+                            source=self.source)
+
+    # ==================== SNAPSHOT ====================
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, ids=self.ids, years=self.years, ratings=self.ratings, watch_counts=self.watch_counts,
+                 genre_indptr=self.genre_indptr, genre_codes=self.genre_codes,
+                 genre_pairs=np.array(json.dumps(self.genre_pairs)),
+                 titles=self.titles.to_array(), title_offsets=self.titles.offsets,
+                 summaries=self.summaries.to_array(), summary_offsets=self.summaries.offsets,
+                 summary_null=self.summary_null, signature=np.asarray(self.signature, dtype=np.float64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(
+            ids=data['ids'], years=data['years'], ratings=data['ratings'], watch_counts=data['watch_counts'],
+            genre_indptr=data['genre_indptr'], genre_codes=data['genre_codes'],
+            genre_pairs=[tuple(pair) for pair in json.loads(str(data['genre_pairs']))],
+            titles=StringArena(data['titles'], data['title_offsets']),
+            summaries=StringArena(data['summaries'], data['summary_offsets']),
+            summary_null=data['summary_null'], signature=tuple(data['signature'].tolist()),
+            source='snapshot'
+        )
+
+    # ==================== CONSULTAS ====================
+
+    def positions(self, movie_ids):
+        """Posição de cada id nas colunas (-1 se o filme não existe)"""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        pos = np.searchsorted(self.ids, movie_ids)
+        found = pos < self.ids.size
+        found[found] = self.ids[pos[found]] == movie_ids[found]
+        return np.where(found, pos, -1)
+
+    def genres(self, i):
+        start, end = self.genre_indptr[i], self.genre_indptr[i + 1]
+        return {self.genre_pairs[code][0]: self.genre_pairs[code][1] for code in self.genre_codes[start:end]}
+
+    def record(self, i):
+        return {
+            'id': int(self.ids[i]),
+            'title': self.titles[i],
+            'summary': None if self.summary_null[i] else self.summaries[i],
+            'genres': self.genres(i),
+            'rating': float(self.ratings[i]),
+            'year': int(self.years[i]),
+            'watch_count': int(self.watch_counts[i])
+        }
+
+    @timed('catalog')
+    def hydrate(self, movie_ids):
+        """{movie_id: registro} dos ids que existem no catálogo"""
+        movie_ids = list(movie_ids)
+        if not movie_ids:
+            return {}
+        return {movie_id: self.record(i) for movie_id, i in zip(movie_ids, self.positions(movie_ids).tolist())
+                if i >= 0}
+
+    def counts(self, movie_ids):
+        """{movie_id: visualizações na última carga/refresh}"""
+        movie_ids = list(movie_ids)
+        return {movie_id: int(self.watch_counts[i])
+                for movie_id, i in zip(movie_ids, self.positions(movie_ids).tolist()) if i >= 0}
+
+    def _mask(self, genre=None, min_rating=None, year=None):
+        if genre is None and min_rating is None and year is None:
+            return None
+        mask = np.ones(self.ids.size, dtype=np.bool_)
+        if genre is not None:
+            codes = self._codes_by_genre.get(genre.lower(), [])
+            has_genre = np.zeros(self.ids.size, dtype=np.bool_)
+            has_genre[self._genre_rows[np.isin(self.genre_codes, codes)]] = True
+            mask &= has_genre
+        if min_rating is not None:
+            mask &= self.ratings >= min_rating
+        if year is not None:
+            mask &= self.years == year
+        return mask
+
+    def _order(self, sort):
+        order = self._orders.get(sort)
+        if order is None:
+            if sort == 'id':
+                order = np.arange(self.ids.size)
+            else:
+                key = {'rating': self.ratings, 'year': self.years, 'popular': self.watch_counts}[sort]
+                order = np.lexsort((self.ids, -key))
+            self._orders[sort] = order
+        return order
+
+    @timed('catalog')
+    def browse(self, after=0, limit=20, sort='id', genre=None, min_rating=None, year=None):
+        """
+        (movie_ids da página, has_more, next_after, total filtrado). sort='id' pagina por
+        keyset (after = último MOVIE_ID, como o SQL); as outras ordens pela posição no ranking.
+        """
+        order = self._order(sort)
+        mask = self._mask(genre, min_rating, year)
+        if mask is not None:
+            order = order[mask[order]]
+        if sort == 'id':
+            start = int(np.searchsorted(self.ids[order], after, side='right'))
+        else:
+            start = after
+        page = self.ids[order[start:start + limit]].tolist()
+        has_more = order.size > start + limit
+        if sort == 'id':
+            next_after = page[-1] if page else after
+        else:
+            next_after = start + len(page)
+        return page, has_more, next_after, int(order.size)
+
+    def filter_ids(self, movie_ids, genre=None, min_rating=None, year=None):
+        """Mantém a ordem de movie_ids, só com os filmes que passam nos filtros"""
+        mask = self._mask(genre, min_rating, year)
+        if mask is None:
+            return list(movie_ids)
+        return [movie_id for movie_id, i in zip(movie_ids, self.positions(movie_ids).tolist()) if i >= 0 and mask[i]]
+
+    def stats(self):
+        return {
+            'loaded': True,
+            'movies': len(self),
+            'genres': len(self._codes_by_genre),
+            'genre_codes': len(self.genre_pairs),
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+            'bytes': int(self.ids.nbytes + self.years.nbytes + self.ratings.nbytes + self.watch_counts.nbytes +
+                         self.genre_indptr.nbytes + self.genre_codes.nbytes + self.summary_null.nbytes +
+                         self.titles.nbytes + self.summaries.nbytes)
+        }
+
+
+def _read_text(value):
+    return value.read() if hasattr(value, 'read') else value
+
+
+# ==================== CARGA / REFRESH ====================
+
+_catalog = None
+_catalog_lock = threading.Lock()
+_refresh_thread = None
+
+
+def read_signature(cursor):
+    """
+    (filmes, maior MOVIE_ID, soma dos ratings, maior ORA_ROWSCN, visualizações): muda com
+    INSERT/DELETE/UPDATE em MOVIES ou com linhas novas em WATCHED_MOVIE
+    """
+    row = repository.fetch_one(cursor, 'catalog.signature')
+    return tuple(round(float(value or 0), 4) for value in row)
+
+
+def sync(current=None):
+    """
+    Deixa o catálogo em dia com o banco pelo caminho mais barato: nada, só as
+    contagens ou a carga completa. Devolve (catálogo, mudou).
+    """
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        signature = read_signature(cursor)
+        # Tudo menos a última posição descreve MOVIES; a última é a contagem de WATCHED_MOVIE
+        if current is not None and current.signature[:-1] == signature[:-1]:
+            if current.signature[-1] == signature[-1]:
+                return current, False
+            catalog = current.with_watch_counts(repository.fetch_value_map(cursor, 'catalog.watch_counts'), signature)
+        else:
+            catalog = MovieCatalog.from_rows(repository.fetch_all(cursor, 'catalog.movies'),
+                                             repository.fetch_value_map(cursor, 'catalog.watch_counts'), signature)
+    if CATALOG_CONFIG['path']:
+        try:
+            catalog.save(CATALOG_CONFIG['path'])
+        except Exception as e:
+            print(f"⚠️  Erro ao gravar snapshot do catálogo: {e}")
+    return catalog, True
+
+
+def _read_snapshot():
+    path = CATALOG_CONFIG['path']
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return MovieCatalog.load(path)
+    except Exception as e:
+        print(f"⚠️  Snapshot do catálogo ilegível, relendo do banco: {e}")
+        return None
+
+
+def get_movie_catalog():
+    """Catálogo do processo: snapshot em disco conferido pela assinatura ou carga do banco"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                started = time.perf_counter()
+                catalog, _ = sync(_read_snapshot())
+                _catalog = catalog
+                print(f"✓ Catálogo em memória: {len(catalog)} filmes ({catalog.source}) "
+                      f"em {time.perf_counter() - started:.2f}s")
+        start_refresh_thread()
+    return _catalog
+
+
+def movie_catalog_enabled():
+    return CATALOG_CONFIG['enabled']
+
+
+def loaded_catalog():
+    """Catálogo pronto para uso, ou None (desligado ou falha na carga: quem chama volta ao banco)"""
+    if not movie_catalog_enabled():
+        return None
+    try:
+        return get_movie_catalog()
+    except Exception as e:
+        print(f"⚠️  Catálogo em memória indisponível, usando o banco: {e}")
+        return None
+
+
+def movie_catalog_stats():
+    return _catalog.stats() if _catalog is not None else {'loaded': False}
+
+
+def _refresh_loop():
+    global _catalog
+    while True:
+        time.sleep(CATALOG_CONFIG['refresh_seconds'])
+        try:
+            catalog, changed = sync(_catalog)
+            if changed:
+                _catalog = catalog
+                print(f"✓ Catálogo atualizado: {len(catalog)} filmes")
+        except Exception as e:
+            print(f"⚠️  Erro no refresh do catálogo: {e}")
+
+
+def start_refresh_thread():
+    global _refresh_thread
+    if _refresh_thread is None and CATALOG_CONFIG['refresh_seconds'] > 0:
+        _refresh_thread = threading.Thread(target=_refresh_loop, name='movie-catalog-refresh', daemon=True)
+        _refresh_thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Catálogo de filmes em memória')
+    parser.add_argument('--build', action='store_true', help='ignora o snapshot e lê MOVIES do banco')
+    parser.add_argument('--sort', choices=SORTS, default='id')
+    parser.add_argument('--genre')
+    parser.add_argument('--min-rating', type=float)
+    parser.add_argument('--year', type=int)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog, _ = sync(None if args.build else _read_snapshot())
+    print(f"✓ {len(catalog)} filmes ({catalog.source}) em {time.perf_counter() - started:.2f}s: {catalog.stats()}")
+
+    started = time.perf_counter()
+    page, _, _, total = catalog.browse(limit=args.limit, sort=args.sort, genre=args.genre,
+                                       min_rating=args.min_rating, year=args.year)
+    records = catalog.hydrate(page)
+    print(f"{total} filmes no filtro; página em {(time.perf_counter() - started) * 1000:.2f} ms")
+    for movie_id in page:
+        movie = records[movie_id]
+        print(f"  {movie_id:>6}  {movie['rating']:>4.1f}  {movie['year']}  {movie['watch_count']:>5}  {movie['title']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+CineGen AI - Expansão da rede cliente <-> filme em múltiplos saltos
+✅ BFS por níveis até a profundidade pedida (cliente -> filmes -> clientes -> ...)
+✅ Uma ida ao grafo por nível (lote com todos os nós da fronteira), não por nó
+✅ Limites por nó (fan-out), por nível e orçamento total de nós/arestas
+✅ Filmes "hub" (muito assistidos) contribuem só uma amostra dos clientes;
+   a fronteira é expandida dos nós de menor grau para os de maior
+✅ Cada nível sai pronto no formato do grafo 3D (nodes/links), para o
+   frontend desenhar enquanto os próximos níveis ainda estão sendo calculados
+"""
+
+import os
+
+import numpy as np
+
+import repository
+from movie_catalog import loaded_catalog
+
+NETWORK_CONFIG = {
+    'max_depth': int(os.getenv('NETWORK_MAX_DEPTH', 4)),
+    'fanout': int(os.getenv('NETWORK_FANOUT', 50)),
+    'level_cap': int(os.getenv('NETWORK_LEVEL_CAP', 200)),
+    'max_nodes': int(os.getenv('NETWORK_MAX_NODES', 500)),
+    'max_edges': int(os.getenv('NETWORK_MAX_EDGES', 1500)),
+    # Filmes com mais clientes que isto entram só com hub_sample clientes
+    'hub_threshold': int(os.getenv('NETWORK_HUB_THRESHOLD', 100)),
+    'hub_sample': int(os.getenv('NETWORK_HUB_SAMPLE', 10)),
+}
+
+# Cliente <-> filme: o tipo dos vizinhos é sempre o outro
+OTHER_KIND = {'customer': 'movie', 'movie': 'customer'}
+KEY_PREFIX = {'customer': 'c', 'movie': 'm'}
+
+
+def node_key(kind, node_id):
+    return f'{KEY_PREFIX[kind]}{node_id}'
+
+
+def _neighbor_cap(kind, degree, fanout, hub_threshold, hub_sample):
+    if kind == 'movie' and degree > hub_threshold:
+        return min(fanout, hub_sample)
+    return fanout
+
+
+# ==================== FONTES ====================
+
+class MemoryGraphSource:
+    """Vizinhança a partir do CoWatchGraph (CSR + delta); amostra determinística por nó"""
+
+    name = 'memory'
+
+    def __init__(self, graph, hub_threshold=None, hub_sample=None):
+        self.graph = graph
+        self.hub_threshold = hub_threshold or NETWORK_CONFIG['hub_threshold']
+        self.hub_sample = hub_sample or NETWORK_CONFIG['hub_sample']
+
+    def neighbors(self, kind, ids, fanout):
+        """{id: [vizinhos]} com no máximo fanout (ou hub_sample, para filmes hub) por nó"""
+        result = {}
+        for node_id in ids:
+            adjacent = self.graph.adjacency(kind, node_id)
+            cap = _neighbor_cap(kind, adjacent.size, fanout, self.hub_threshold, self.hub_sample)
+            if adjacent.size > cap:
+                # Semente = id do nó: a mesma rede sai igual entre requisições (ETag estável)
+                adjacent = np.sort(np.random.default_rng(int(node_id)).choice(adjacent, cap, replace=False))
+            result[node_id] = adjacent.tolist()
+        return result
+
+    def degrees(self, kind, ids):
+        return {node_id: int(self.graph.adjacency(kind, node_id).size) for node_id in ids}
+
+
+class SQLGraphSource:
+    """Mesma vizinhança direto de WATCHED_MOVIE; amostra = visualizações mais recentes"""
+
+    name = 'sql'
+
+    def __init__(self, cursor, hub_threshold=None, hub_sample=None):
+        self.cursor = cursor
+        self.hub_threshold = hub_threshold or NETWORK_CONFIG['hub_threshold']
+        self.hub_sample = hub_sample or NETWORK_CONFIG['hub_sample']
+
+    def neighbors(self, kind, ids, fanout):
+        if not ids:
+            return {}
+        hub_limit = min(fanout, self.hub_sample) if kind == 'movie' else fanout
+        rows = repository.fetch_all(self.cursor, f'watched.{kind}_neighbors', {
+            'hub_threshold': self.hub_threshold, 'hub_limit': hub_limit, 'fanout': fanout
+        }, ids=ids)
+        result = {node_id: [] for node_id in ids}
+        for node_id, neighbor_id in rows:
+            result.setdefault(node_id, []).append(neighbor_id)
+        return result
+
+    def degrees(self, kind, ids):
+        if not ids:
+            return {}
+        degrees = {node_id: 0 for node_id in ids}
+        degrees.update(repository.fetch_value_map(self.cursor, f'watched.{kind}_degrees', ids=ids))
+        return degrees
+
+
+# ==================== BFS ====================
+
+def expand_network(source, root_id, depth, fanout=None, level_cap=None, max_nodes=None, max_edges=None):
+    """
+    Gera um dict por nível: {'level', 'nodes': [(kind, id, degree)], 'links': [(customer_id, movie_id)],
+    'truncated': [motivos]}. O nível 0 é o cliente raiz; arestas para nós já vistos
+    (ex.: dois clientes do nível 2 que dividem um filme do nível 1) também entram.
+    """
+    depth = max(0, min(depth, NETWORK_CONFIG['max_depth']))
+    fanout = fanout or NETWORK_CONFIG['fanout']
+    level_cap = min(level_cap or NETWORK_CONFIG['level_cap'], 1000)  # IN do Oracle aceita até 1000
+    max_nodes = max_nodes or NETWORK_CONFIG['max_nodes']
+    max_edges = max_edges or NETWORK_CONFIG['max_edges']
+
+    root_degree = source.degrees('customer', [root_id]).get(root_id, 0)
+    visited = {('customer', root_id)}
+    edges = set()
+    yield {'level': 0, 'nodes': [('customer', root_id, root_degree)], 'links': [], 'truncated': []}
+
+    kind = 'customer'
+    frontier = [(root_id, root_degree)]
+    for level in range(1, depth + 1):
+        if not frontier:
+            break
+        truncated = set()
+        # Grau crescente: nós específicos primeiro, hubs são os primeiros cortados pelos orçamentos
+        frontier.sort(key=lambda node: (node[1], node[0]))
+        adjacency = source.neighbors(kind, [node_id for node_id, _ in frontier], fanout)
+        neighbor_kind = OTHER_KIND[kind]
+
+        new_ids = []
+        links = []
+        for node_id, _ in frontier:
+            for neighbor_id in adjacency.get(node_id, ()):
+                edge = (node_id, neighbor_id) if kind == 'customer' else (neighbor_id, node_id)
+                if edge in edges:
+                    continue
+                if len(edges) >= max_edges:
+                    truncated.add('max_edges')
+                    break
+                if (neighbor_kind, neighbor_id) not in visited:
+                    if len(visited) >= max_nodes:
+                        truncated.add('max_nodes')
+                        continue
+                    if len(new_ids) >= level_cap:
+                        truncated.add('level_cap')
+                        continue
+                    visited.add((neighbor_kind, neighbor_id))
+                    new_ids.append(neighbor_id)
+                edges.add(edge)
+                links.append(edge)
+
+        degrees = source.degrees(neighbor_kind, new_ids)
+        nodes = [(neighbor_kind, node_id, degrees.get(node_id, 0)) for node_id in new_ids]
+        yield {'level': level, 'nodes': nodes, 'links': links, 'truncated': sorted(truncated)}
+
+        kind = neighbor_kind
+        frontier = [(node_id, degree) for _, node_id, degree in nodes]
+
+
+# ==================== PAYLOAD 3D ====================
+
+def _labels(cursor, customer_ids, movie_ids):
+    names = repository.fetch_value_map(cursor, 'customers.names_by_ids', ids=customer_ids)
+    catalog = loaded_catalog()
+    if catalog is not None:
+        movies = {movie_id: (m['title'], m['genres']) for movie_id, m in catalog.hydrate(movie_ids).items()}
+    else:
+        movies = {row[0]: (row[1], row[2]) for row in repository.fetch_all(cursor, 'movies.labels_by_ids', ids=movie_ids)}
+    return names, movies
+
+
+def level_to_3d(cursor, level, parse_genres):
+    """Nível do BFS -> {'level', 'nodes', 'links', 'truncated'} no formato do ForceGraph3D"""
+    customer_ids = [node_id for kind, node_id, _ in level['nodes'] if kind == 'customer']
+    movie_ids = [node_id for kind, node_id, _ in level['nodes'] if kind == 'movie']
+    names, movies = _labels(cursor, customer_ids, movie_ids)
+
+    nodes = []
+    for kind, node_id, degree in level['nodes']:
+        node = {
+            'id': node_key(kind, node_id),
+            'type': kind,
+            'level': level['level'],
+            'degree': int(degree)
+        }
+        if kind == 'customer':
+            is_root = level['level'] == 0
+            node.update({
+                'label': names.get(node_id, f'Cliente {node_id}'),
+                'group': 1 if is_root else 3,
+                'size': 12 if is_root else 10
+            })
+        else:
+            title, genres_raw = movies.get(node_id, (f'Filme {node_id}', None))
+            genres = parse_genres(genres_raw).keys() if genres_raw else []
+            node.update({'label': title, 'group': 2, 'size': 8, 'genres': list(genres)[:2]})
+        nodes.append(node)
+
+    links = [{'source': node_key('customer', c), 'target': node_key('movie', m), 'value': 1} for c, m in level['links']]
+    return {'level': level['level'], 'nodes': nodes, 'links': links, 'truncated': level['truncated']}
+
+
+def network_stats(nodes, links):
+    return {
+        'total_nodes': len(nodes),
+        'total_links': len(links),
+        'customers': sum(1 for n in nodes if n['type'] == 'customer'),
+        'movies': sum(1 for n in nodes if n['type'] == 'movie')
+    }
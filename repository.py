@@ -0,0 +1,459 @@
+"""
+CineGen AI - Repositório de statements
+✅ Cada query das rotas é um Statement nomeado com o texto montado uma vez no import:
+   o mesmo SQL a cada chamada, sempre achado no statement cache da sessão
+✅ arraysize/prefetchrows pela cardinalidade esperada do statement: lookups pequenos
+   voltam inteiros no round trip do execute, listagens grandes em poucos fetches
+✅ Listas IN com o nº de binds arredondado para potência de 2 (repetindo o último id):
+   poucos textos distintos no cache em vez de um por tamanho de lista
+✅ Cargas completas (grafo, índice textual, catálogo) com rows=BULK: arraysize/prefetchrows
+   grandes e leitura em streaming pelo cursor devolvido por execute
+✅ Linhas saem como as tuplas do driver (sem rowfactory); fetch_map monta {chave: linha},
+   fetch_value_map {chave: valor} para statements de duas colunas
+✅ Tempo por statement em /api/metrics, execuções e linhas em /api/health
+"""
+
+import threading
+import time
+import os
+
+from db import SCHEMA, GRAPH_NAME
+import metrics
+
+REPOSITORY_CONFIG = {
+    'max_arraysize': int(os.getenv('DB_MAX_ARRAYSIZE', 1000)),
+    'bulk_arraysize': int(os.getenv('DB_BULK_ARRAYSIZE', 10000)),
+    'max_in_list': 1000,  # limite de expressões numa lista IN (ORA-01795)
+}
+
+# rows=PER_ID: uma linha por id da lista IN (lookups por chave primária)
+PER_ID = 'per_id'
+# rows=BULK: tabela inteira lida em streaming (cargas em memória, fora do limite de max_arraysize)
+BULK = 'bulk'
+
+
+class Statement:
+
+    def __init__(self, name, sql, rows=1, in_list=False):
+        """
+        rows: linhas esperadas (0 para DML, None quando não há limite conhecido).
+        in_list: o texto tem {ids} no lugar da lista IN, preenchida com :id0, :id1, ...
+        """
+        self.name = name
+        self.sql = sql
+        self.rows = rows
+        self.in_list = in_list
+        self._texts = {}  # nº de binds da lista IN -> texto
+        self.metrics = {'executes': 0, 'rows': 0}
+
+    def text(self, size):
+        sql = self._texts.get(size)
+        if sql is None:
+            sql = self._texts[size] = self.sql.replace('{ids}', ', '.join(f':id{i}' for i in range(size)))
+        return sql
+
+    def bind(self, binds, ids):
+        """(texto, binds) da execução; a lista é completada até o bucket com o último id"""
+        if not self.in_list:
+            return self.sql, binds or {}
+        size = 1
+        while size < len(ids):
+            size *= 2
+        size = min(size, REPOSITORY_CONFIG['max_in_list'])
+        padded = list(ids) + [ids[-1]] * (size - len(ids))
+        return self.text(size), {**(binds or {}), **{f'id{i}': value for i, value in enumerate(padded)}}
+
+    def tune(self, cursor, rows):
+        """prefetchrows = esperado + 1 deixa o fim dos dados no mesmo round trip do execute"""
+        if rows == 0:
+            return
+        if rows == BULK:
+            cursor.arraysize = cursor.prefetchrows = REPOSITORY_CONFIG['bulk_arraysize']
+            return
+        cap = REPOSITORY_CONFIG['max_arraysize']
+        if rows is None:
+            cursor.arraysize = cursor.prefetchrows = cap
+        else:
+            cursor.arraysize = min(max(rows, 1), cap)
+            cursor.prefetchrows = min(rows + 1, cap)
+
+    def stats(self):
+        executes = self.metrics['executes']
+        return {
+            **self.metrics,
+            'avg_rows': round(self.metrics['rows'] / executes, 1) if executes else 0.0,
+            'expected_rows': self.rows,
+            'texts': len(self._texts) if self.in_list else 1
+        }
+
+
+STATEMENTS = {}
+_lock = threading.Lock()
+
+
+def statement(name, sql, rows=1, in_list=False):
+    """Registra um statement; módulos com SQL dependente de configuração própria usam o mesmo registro"""
+    with _lock:
+        STATEMENTS[name] = Statement(name, sql, rows, in_list)
+    return STATEMENTS[name]
+
+
+# ==================== FILMES ====================
+
+statement('movies.by_ids', f"""
+    SELECT m.MOVIE_ID, m.TITLE, m.SUMMARY, m.GENRES, m.RATING
+    FROM {SCHEMA}.MOVIES m
+    WHERE m.MOVIE_ID IN ({{ids}})
+""", rows=PER_ID, in_list=True)
+
+statement('movies.cards_by_ids', f"""
+    SELECT m.MOVIE_ID, m.TITLE, m.GENRES, m.SUMMARY,
+           NVL(m.RATING, 0) as RATING, NVL(m.YEAR, 2024) as YEAR
+    FROM {SCHEMA}.MOVIES m
+    WHERE m.MOVIE_ID IN ({{ids}})
+""", rows=PER_ID, in_list=True)
+
+statement('movies.labels_by_ids', f"""
+    SELECT MOVIE_ID, TITLE, GENRES
+    FROM {SCHEMA}.MOVIES
+    WHERE MOVIE_ID IN ({{ids}})
+""", rows=PER_ID, in_list=True)
+
+statement('movies.page', f"""
+    SELECT m.MOVIE_ID, m.TITLE, m.GENRES, m.SUMMARY,
+           NVL(m.RATING, 0) as RATING, NVL(m.YEAR, 2024) as YEAR
+    FROM {SCHEMA}.MOVIES m
+    WHERE m.MOVIE_ID > :after_id
+    ORDER BY m.MOVIE_ID
+    FETCH FIRST :limit ROWS ONLY
+""", rows=21)
+
+statement('movies.count', f"SELECT COUNT(*) FROM {SCHEMA}.MOVIES")
+
+statement('movies.search_like', f"""
+    SELECT m.MOVIE_ID
+    FROM {SCHEMA}.MOVIES m
+    WHERE UPPER(m.TITLE) LIKE UPPER(:query) OR UPPER(m.SUMMARY) LIKE UPPER(:query)
+    ORDER BY m.MOVIE_ID
+    FETCH FIRST :limit ROWS ONLY
+""", rows=50)
+
+statement('movies.watch_counts', f"""
+    SELECT MOVIE_ID, COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE
+    WHERE MOVIE_ID IN ({{ids}})
+    GROUP BY MOVIE_ID
+""", rows=PER_ID, in_list=True)
+
+# Catálogo em memória (movie_catalog.py): carga completa e assinatura barata para o refresh
+statement('catalog.movies', f"""
+    SELECT MOVIE_ID, TITLE, SUMMARY, GENRES, NVL(RATING, 0), NVL(YEAR, 2024)
+    FROM {SCHEMA}.MOVIES
+    ORDER BY MOVIE_ID
+""", rows=BULK)
+
+statement('catalog.watch_counts', f"""
+    SELECT MOVIE_ID, COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE GROUP BY MOVIE_ID
+""", rows=BULK)
+
+# Índice textual (text_index.py): novos e editados desde o último ORA_ROWSCN indexado
+statement('text_index.changed', f"""
+    SELECT MOVIE_ID, TITLE, SUMMARY, ORA_ROWSCN
+    FROM {SCHEMA}.MOVIES
+    WHERE ORA_ROWSCN > :after_scn
+    ORDER BY MOVIE_ID
+""", rows=BULK)
+
+# Índice FAISS (vector_index.py --rebuild): todos os embeddings. Cada linha é um vetor
+# em texto (KBs): lotes de max_arraysize em vez de BULK para não inflar o buffer do fetch
+statement('vectors.all', f"""
+    SELECT MOVIE_ID, FROM_VECTOR(EMBEDDING RETURNING CLOB)
+    FROM {SCHEMA}.MOVIE_VECTORS
+""", rows=None)
+
+# MAX(ORA_ROWSCN) sobe com qualquer UPDATE em MOVIES (TITLE, SUMMARY, GENRES, YEAR...);
+# a contagem de WATCHED_MOVIE fica por último: mudou só ela, só as contagens são relidas
+statement('catalog.signature', f"""
+    SELECT COUNT(*), NVL(MAX(MOVIE_ID), 0), NVL(SUM(RATING), 0), NVL(MAX(ORA_ROWSCN), 0),
+           (SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE)
+    FROM {SCHEMA}.MOVIES
+""")
+
+# ==================== CLIENTES ====================
+
+statement('customers.list', f"""
+    SELECT CUST_ID, FIRSTNAME, LASTNAME, EMAIL,
+           (SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE w WHERE w.PROMO_CUST_ID = c.CUST_ID) as movies_count
+    FROM {SCHEMA}.MOVIES_CUSTOMER c
+    ORDER BY CUST_ID
+""", rows=None)
+
+statement('customers.names_by_ids', f"""
+    SELECT CUST_ID, FIRSTNAME || ' ' || LASTNAME
+    FROM {SCHEMA}.MOVIES_CUSTOMER
+    WHERE CUST_ID IN ({{ids}})
+""", rows=PER_ID, in_list=True)
+
+statement('customers.insert', f"""
+    INSERT INTO {SCHEMA}.MOVIES_CUSTOMER (CUST_ID, FIRSTNAME, LASTNAME, EMAIL)
+    VALUES (:cust_id, :firstname, :lastname, :email)
+""", rows=0)
+
+# START WITH da sequence de blocos (customer_ids.py --setup)
+statement('customers.max_id', f"SELECT NVL(MAX(CUST_ID), 100) FROM {SCHEMA}.MOVIES_CUSTOMER")
+
+# Uma linha por filme assistido (LEFT JOIN: cliente sem filmes ainda volta uma linha)
+statement('customers.profile', f"""
+    SELECT c.CUST_ID, c.FIRSTNAME, c.LASTNAME, c.EMAIL,
+           w.MOVIE_ID, m.TITLE, m.GENRES, w.RATING_GIVEN
+    FROM {SCHEMA}.MOVIES_CUSTOMER c
+    LEFT JOIN {SCHEMA}.WATCHED_MOVIE w ON w.PROMO_CUST_ID = c.CUST_ID
+    LEFT JOIN {SCHEMA}.MOVIES m ON m.MOVIE_ID = w.MOVIE_ID
+    WHERE c.CUST_ID = :cust_id
+    ORDER BY w.DAY_ID DESC NULLS LAST, w.MOVIE_ID
+""", rows=200)
+
+# ==================== VISUALIZAÇÕES ====================
+
+# Grafo de co-visualização em memória (graph_engine.py): ratings e todas as arestas
+statement('graph.ratings', f"SELECT MOVIE_ID, NVL(RATING, 0) FROM {SCHEMA}.MOVIES", rows=BULK)
+
+statement('graph.edges', f"SELECT PROMO_CUST_ID, MOVIE_ID FROM {SCHEMA}.WATCHED_MOVIE", rows=BULK)
+
+statement('watched.exists', f"""
+    SELECT COUNT(*) FROM {SCHEMA}.WATCHED_MOVIE
+    WHERE PROMO_CUST_ID = :cust_id AND MOVIE_ID = :movie_id
+""")
+
+statement('watched.update_rating', f"""
+    UPDATE {SCHEMA}.WATCHED_MOVIE
+    SET RATING_GIVEN = :rating, DAY_ID = SYSDATE
+    WHERE PROMO_CUST_ID = :cust_id AND MOVIE_ID = :movie_id
+""", rows=0)
+
+statement('watched.insert', f"""
+    INSERT INTO {SCHEMA}.WATCHED_MOVIE (PROMO_CUST_ID, MOVIE_ID, DAY_ID, RATING_GIVEN)
+    VALUES (:cust_id, :movie_id, SYSDATE, :rating)
+""", rows=0)
+
+# Upsert da ingestão e do write-behind: avaliação nova não apaga a antiga com NULL,
+# DAY_ID fica com a visualização mais recente
+statement('watched.merge', f"""
+    MERGE INTO {SCHEMA}.WATCHED_MOVIE w
+    USING (
+        SELECT :cust_id AS PROMO_CUST_ID, :movie_id AS MOVIE_ID,
+               :rating AS RATING_GIVEN, NVL(:day_id, SYSDATE) AS DAY_ID
+        FROM DUAL
+    ) src
+    ON (w.PROMO_CUST_ID = src.PROMO_CUST_ID AND w.MOVIE_ID = src.MOVIE_ID)
+    WHEN MATCHED THEN UPDATE SET
+        w.RATING_GIVEN = NVL(src.RATING_GIVEN, w.RATING_GIVEN),
+        w.DAY_ID = GREATEST(NVL(w.DAY_ID, src.DAY_ID), src.DAY_ID)
+    WHEN NOT MATCHED THEN INSERT (PROMO_CUST_ID, MOVIE_ID, DAY_ID, RATING_GIVEN)
+        VALUES (src.PROMO_CUST_ID, src.MOVIE_ID, src.DAY_ID, src.RATING_GIVEN)
+""", rows=0)
+
+statement('watched.movie_ids', f"""
+    SELECT MOVIE_ID FROM {SCHEMA}.WATCHED_MOVIE WHERE PROMO_CUST_ID = :cust_id
+""", rows=None)
+
+# Vizinhos de cada nó do BFS; hubs (grau > hub_threshold) ficam com hub_limit arestas
+for _kind, _own, _other in (('customer', 'PROMO_CUST_ID', 'MOVIE_ID'), ('movie', 'MOVIE_ID', 'PROMO_CUST_ID')):
+    statement(f'watched.{_kind}_neighbors', f"""
+        SELECT node_id, neighbor_id
+        FROM (
+            SELECT {_own} AS node_id, {_other} AS neighbor_id,
+                   ROW_NUMBER() OVER (PARTITION BY {_own} ORDER BY DAY_ID DESC NULLS LAST, {_other}) AS rn,
+                   COUNT(*) OVER (PARTITION BY {_own}) AS degree
+            FROM {SCHEMA}.WATCHED_MOVIE
+            WHERE {_own} IN ({{ids}})
+        )
+        WHERE rn <= CASE WHEN degree > :hub_threshold THEN :hub_limit ELSE :fanout END
+        ORDER BY node_id, neighbor_id
+    """, rows=None, in_list=True)
+    statement(f'watched.{_kind}_degrees', f"""
+        SELECT {_own}, COUNT(DISTINCT {_other})
+        FROM {SCHEMA}.WATCHED_MOVIE
+        WHERE {_own} IN ({{ids}})
+        GROUP BY {_own}
+    """, rows=PER_ID, in_list=True)
+
+statement('watched.similar_users', f"""
+    SELECT w3.MOVIE_ID, COUNT(DISTINCT w2.PROMO_CUST_ID) as similar_users
+    FROM {SCHEMA}.WATCHED_MOVIE w1
+    JOIN {SCHEMA}.WATCHED_MOVIE w2 ON w1.MOVIE_ID = w2.MOVIE_ID
+    JOIN {SCHEMA}.WATCHED_MOVIE w3 ON w2.PROMO_CUST_ID = w3.PROMO_CUST_ID
+    WHERE w1.PROMO_CUST_ID = :cust_id
+      AND w2.PROMO_CUST_ID != :cust_id
+      AND w3.MOVIE_ID NOT IN (
+          SELECT MOVIE_ID FROM {SCHEMA}.WATCHED_MOVIE WHERE PROMO_CUST_ID = :cust_id
+      )
+    GROUP BY w3.MOVIE_ID
+""", rows=None)
+
+statement('watched.customer_degree', f"""
+    SELECT COUNT(DISTINCT MOVIE_ID) FROM {SCHEMA}.WATCHED_MOVIE WHERE PROMO_CUST_ID = :cust_id
+""")
+
+statement('watched.customer_overlap', f"""
+    SELECT w2.PROMO_CUST_ID,
+           COUNT(DISTINCT w1.MOVIE_ID) as common_count,
+           (SELECT COUNT(DISTINCT w3.MOVIE_ID) FROM {SCHEMA}.WATCHED_MOVIE w3
+            WHERE w3.PROMO_CUST_ID = w2.PROMO_CUST_ID) as movies_count
+    FROM {SCHEMA}.WATCHED_MOVIE w1
+    JOIN {SCHEMA}.WATCHED_MOVIE w2 ON w1.MOVIE_ID = w2.MOVIE_ID
+    WHERE w1.PROMO_CUST_ID = :cust_id
+      AND w2.PROMO_CUST_ID != :cust_id
+    GROUP BY w2.PROMO_CUST_ID
+""", rows=None)
+
+# ==================== RECOMENDAÇÕES ====================
+
+# Mesmo formato nos dois: (movie_id, title, summary, rating, similar_users). GENRES é JSON:
+# fica fora do GROUP BY e vem do catálogo (app.attach_genres)
+statement('recommendations.pgql', f"""
+    SELECT movie_id, title, summary, rating, similar_users
+    FROM GRAPH_TABLE ({GRAPH_NAME}
+        MATCH (c1:customer)-[:watched]->(m:movie)<-[:watched]-(c2:customer)-[:watched]->(m2:movie)
+        WHERE c1.cust_id = :cust_id
+          AND c2.cust_id != :cust_id
+        COLUMNS (
+            m2.movie_id AS movie_id,
+            m2.title AS title,
+            m2.summary AS summary,
+            m2.rating AS rating,
+            COUNT(DISTINCT c2.cust_id) AS similar_users
+        )
+    )
+    GROUP BY movie_id, title, summary, rating, similar_users
+    ORDER BY similar_users DESC, rating DESC
+    FETCH FIRST :limit ROWS ONLY
+""", rows=10)
+
+statement('recommendations.sql', f"""
+    SELECT m2.MOVIE_ID, m2.TITLE, m2.SUMMARY, m2.RATING,
+           COUNT(DISTINCT c2.CUST_ID) as similar_users
+    FROM {SCHEMA}.WATCHED_MOVIE w1
+    JOIN {SCHEMA}.WATCHED_MOVIE w2 ON w1.MOVIE_ID = w2.MOVIE_ID
+    JOIN {SCHEMA}.MOVIES_CUSTOMER c2 ON w2.PROMO_CUST_ID = c2.CUST_ID
+    JOIN {SCHEMA}.WATCHED_MOVIE w3 ON c2.CUST_ID = w3.PROMO_CUST_ID
+    JOIN {SCHEMA}.MOVIES m2 ON w3.MOVIE_ID = m2.MOVIE_ID
+    WHERE w1.PROMO_CUST_ID = :cust_id
+      AND c2.CUST_ID != :cust_id
+      AND m2.MOVIE_ID NOT IN (
+          SELECT MOVIE_ID FROM {SCHEMA}.WATCHED_MOVIE WHERE PROMO_CUST_ID = :cust_id
+      )
+    GROUP BY m2.MOVIE_ID, m2.TITLE, m2.SUMMARY, m2.RATING
+    ORDER BY similar_users DESC, m2.RATING DESC
+    FETCH FIRST :limit ROWS ONLY
+""", rows=5)
+
+# ==================== MEDIA / SAÚDE ====================
+
+statement('media_assets.by_ids', f"""
+    SELECT MOVIE_ID, ASSET_TYPE, ASSET_URL
+    FROM {SCHEMA}.MEDIA_ASSETS
+    WHERE MOVIE_ID IN ({{ids}})
+      AND ASSET_TYPE IN ('poster_url', 'trailer_url')
+""", rows=None, in_list=True)
+
+# Pré-carga do resolver (MEDIA_ASSETS é quase estática)
+statement('media_assets.all', f"""
+    SELECT MOVIE_ID, ASSET_TYPE, ASSET_URL
+    FROM {SCHEMA}.MEDIA_ASSETS
+    WHERE ASSET_TYPE IN ('poster_url', 'trailer_url')
+""", rows=None)
+
+statement('health.ping', "SELECT 1 FROM DUAL")
+
+
+# ==================== EXECUÇÃO ====================
+
+def _expected_rows(stmt, ids, rows):
+    if rows is not None:
+        return rows
+    if stmt.rows == PER_ID:
+        return len(ids)
+    return stmt.rows
+
+
+def _chunks(stmt, ids):
+    if not stmt.in_list:
+        return [None]
+    ids = list(dict.fromkeys(ids))
+    step = REPOSITORY_CONFIG['max_in_list']
+    return [ids[start:start + step] for start in range(0, len(ids), step)]
+
+
+def execute(cursor, name, binds=None, ids=None, rows=None):
+    """Executa o statement (DML ou leitura a ser consumida pelo chamador); devolve o cursor"""
+    stmt = STATEMENTS[name]
+    sql, params = stmt.bind(binds, ids)
+    stmt.tune(cursor, _expected_rows(stmt, ids, rows))
+    started = time.perf_counter()
+    try:
+        cursor.execute(sql, params)
+    finally:
+        stmt.metrics['executes'] += 1
+        metrics.observe_statement(name, time.perf_counter() - started)
+    return cursor
+
+
+def execute_many(cursor, name, rows, batcherrors=False):
+    """executemany de DML (array binds, um round trip); devolve o cursor para getbatcherrors()"""
+    stmt = STATEMENTS[name]
+    started = time.perf_counter()
+    try:
+        cursor.executemany(stmt.sql, rows, batcherrors=batcherrors)
+    finally:
+        stmt.metrics['executes'] += 1
+        stmt.metrics['rows'] += len(rows)
+        metrics.observe_statement(name, time.perf_counter() - started)
+    return cursor
+
+
+def fetch_all(cursor, name, binds=None, ids=None, rows=None):
+    """
+    [tuplas do driver]. Com ids: lista IN em blocos de até max_in_list, ids repetidos
+    removidos; lista vazia não vai ao banco. rows sobrepõe a cardinalidade esperada.
+    """
+    stmt = STATEMENTS[name]
+    if stmt.in_list and not ids:
+        return []
+    result = []
+    for chunk in _chunks(stmt, ids):
+        sql, params = stmt.bind(binds, chunk)
+        stmt.tune(cursor, _expected_rows(stmt, chunk, rows))
+        started = time.perf_counter()
+        try:
+            cursor.execute(sql, params)
+            fetched = cursor.fetchall()
+        finally:
+            stmt.metrics['executes'] += 1
+            metrics.observe_statement(name, time.perf_counter() - started)
+        stmt.metrics['rows'] += len(fetched)
+        result += fetched
+    return result
+
+
+def fetch_one(cursor, name, binds=None, ids=None):
+    rows = fetch_all(cursor, name, binds, ids)
+    return rows[0] if rows else None
+
+
+def fetch_scalar(cursor, name, binds=None):
+    row = fetch_one(cursor, name, binds)
+    return row[0] if row else None
+
+
+def fetch_map(cursor, name, binds=None, ids=None, rows=None):
+    """{primeira coluna: linha inteira}"""
+    return {row[0]: row for row in fetch_all(cursor, name, binds, ids, rows)}
+
+
+def fetch_value_map(cursor, name, binds=None, ids=None, rows=None):
+    """{primeira coluna: segunda} para statements de duas colunas (chave, valor)"""
+    return {row[0]: row[1] for row in fetch_all(cursor, name, binds, ids, rows)}
+
+
+def repository_stats():
+    return {name: stmt.stats() for name, stmt in STATEMENTS.items() if stmt.metrics['executes']}
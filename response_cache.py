@@ -0,0 +1,271 @@
+"""
+CineGen AI - Cache de respostas HTTP dos endpoints de leitura
+✅ Chave = rota + argumentos normalizados (path e query string)
+✅ LRU com limite de tamanho e TTL por rota
+✅ ETag / If-None-Match -> 304 sem reenviar o corpo
+✅ Invalidação por tags a partir das escritas (customer:<id>, movie:<id>, ...)
+✅ Backend plugável: em processo (padrão) ou servidor compatível com Redis
+   (Redis/Valkey/KeyDB local) quando há vários workers
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import threading
+import hashlib
+import time
+import os
+
+from flask import request, current_app
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+RESPONSE_CACHE_CONFIG = {
+    'enabled': os.getenv('RESPONSE_CACHE_ENABLED', '1') == '1',
+    'backend': os.getenv('RESPONSE_CACHE_BACKEND', 'memory'),
+    'max_items': int(os.getenv('RESPONSE_CACHE_MAX_ITEMS', 1024)),
+    'redis_url': os.getenv('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+    'prefix': os.getenv('RESPONSE_CACHE_PREFIX', 'cinegen:resp:'),
+}
+
+# TTL (segundos) por rota; sobrescrevível com RESPONSE_CACHE_TTL_<ROTA>
+ROUTE_TTLS = {
+    'customers': 30,
+    'movies': 300,
+    'graph_customer': 300,
+    'graph_network': 60,
+    'graph_compare': 300,
+}
+ROUTE_TTLS = {route: int(os.getenv(f'RESPONSE_CACHE_TTL_{route.upper()}', ttl)) for route, ttl in ROUTE_TTLS.items()}
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+# ==================== BACKENDS ====================
+
+class MemoryBackend:
+    """LRU em processo; cada worker tem a sua cópia"""
+
+    name = 'memory'
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, etag, expires_at, _ = entry
+            if time.time() > expires_at:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return body, etag
+
+    def set(self, key, body, etag, ttl, tags):
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (body, etag, time.time() + ttl, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_items:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        return {'items': len(self._entries), 'tags': len(self._tags), 'evictions': self.evictions}
+
+
+class RedisBackend:
+    """Compartilhado entre workers; a evicção LRU fica com o servidor (maxmemory-policy allkeys-lru)"""
+
+    name = 'redis'
+
+    def __init__(self, url, prefix):
+        if redis is None:
+            raise RuntimeError('pacote redis não instalado')
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client.ping()
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b'\n')
+        return body, etag.decode()
+
+    def set(self, key, body, etag, ttl, tags):
+        pipe = self.client.pipeline()
+        pipe.setex(self.prefix + key, ttl, etag.encode() + b'\n' + body)
+        for tag in tags:
+            tag_key = f'{self.prefix}tag:{tag}'
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, ttl)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        tag_keys = [f'{self.prefix}tag:{tag}' for tag in tags]
+        if not tag_keys:
+            return 0
+        keys = [member.decode() for member in self.client.sunion(tag_keys)]
+        self.client.delete(*[self.prefix + key for key in keys], *tag_keys)
+        return len(keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.prefix}*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {'url': RESPONSE_CACHE_CONFIG['redis_url']}
+
+
+def create_backend(name=None):
+    name = name or RESPONSE_CACHE_CONFIG['backend']
+    if name == 'redis':
+        try:
+            backend = RedisBackend(RESPONSE_CACHE_CONFIG['redis_url'], RESPONSE_CACHE_CONFIG['prefix'])
+            print(f"✓ Cache de respostas no Redis ({RESPONSE_CACHE_CONFIG['redis_url']})")
+            return backend
+        except Exception as e:
+            print(f"⚠️  Redis indisponível, cache de respostas em memória: {e}")
+    return MemoryBackend(RESPONSE_CACHE_CONFIG['max_items'])
+
+
+# ==================== CACHE ====================
+
+class ResponseCache:
+
+    def __init__(self, backend=None, enabled=RESPONSE_CACHE_CONFIG['enabled']):
+        self.backend = backend or create_backend()
+        self.enabled = enabled
+        self.metrics = {'hits': 0, 'misses': 0, 'not_modified': 0, 'stores': 0, 'invalidated': 0, 'errors': 0}
+
+    @staticmethod
+    def make_key(route):
+        """'graph_compare|id1=101&id2=102|' ; query string ordenada e sem espaços nas pontas"""
+        view_args = '&'.join(f'{k}={v}' for k, v in sorted((request.view_args or {}).items()))
+        query = '&'.join(f'{k}={v.strip()}' for k, values in sorted(request.args.lists()) for v in sorted(values))
+        return f'{route}|{view_args}|{query}'
+
+    def _respond(self, body, etag, status_header):
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            self.metrics['not_modified'] += 1
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(body, mimetype='application/json')
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = status_header
+        return response
+
+    def cached(self, route, tags=None):
+        """Decorator de rota: tags(view_args, payload) diz quais escritas derrubam a entrada"""
+        ttl = ROUTE_TTLS[route]
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                key = self.make_key(route)
+                try:
+                    entry = self.backend.get(key)
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    print(f"⚠️  Erro lendo cache de respostas: {e}")
+                    entry = None
+                if entry is not None:
+                    self.metrics['hits'] += 1
+                    return self._respond(entry[0], entry[1], 'HIT')
+
+                self.metrics['misses'] += 1
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or not response.is_json:
+                    return response
+
+                body = response.get_data()
+                etag = make_etag(body)
+                entry_tags = [route] + list(tags(kwargs, response.get_json()) if tags else [])
+                try:
+                    self.backend.set(key, body, etag, ttl, entry_tags)
+                    self.metrics['stores'] += 1
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    print(f"⚠️  Erro gravando cache de respostas: {e}")
+                return self._respond(body, etag, 'MISS')
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        try:
+            removed = self.backend.invalidate(tags)
+            self.metrics['invalidated'] += removed
+            return removed
+        except Exception as e:
+            self.metrics['errors'] += 1
+            print(f"⚠️  Erro invalidando cache de respostas: {e}")
+            return 0
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.metrics['hits'] + self.metrics['misses']
+        try:
+            backend_stats = self.backend.stats()
+        except Exception as e:
+            backend_stats = {'error': str(e)}
+        return {
+            **self.metrics,
+            'hit_rate': round(self.metrics['hits'] / lookups, 3) if lookups else 0.0,
+            'enabled': self.enabled,
+            'backend': self.backend.name,
+            **backend_stats
+        }
+
+
+response_cache = ResponseCache()
@@ -4,7 +4,7 @@ const API_BASE_URL = 'http://localhost:8000/api';
 
 let currentCustomerId = null;
 let currentWatchMovieId = null;
-let catalogOffset = 0;
+let catalogCursor = null;
 const catalogLimit = 20;
 let catalogHasMore = true;
 let catalogCurrentSearch = '';
@@ -82,7 +82,7 @@ async function loadCatalog(reset = true, searchQuery = '') {
   const clearBtn = document.getElementById('catalog-clear-search');
 
   if (reset) {
-    catalogOffset = 0;
+    catalogCursor = null;
     catalogHasMore = true;
     catalogCurrentSearch = searchQuery;
     grid.innerHTML = '<div class="col-span-full text-center py-20"><div class="animate-spin w-8 h-8 border-2 border-red-500 border-t-transparent rounded-full mx-auto mb-4"></div></div>';
@@ -95,7 +95,12 @@ async function loadCatalog(reset = true, searchQuery = '') {
   }
 
   try {
-    let url = `${API_BASE_URL}/movies?limit=${catalogLimit}&offset=${catalogOffset}`;
+    let url = `${API_BASE_URL}/movies?limit=${catalogLimit}`;
+    if (catalogCursor) {
+      url += `&cursor=${encodeURIComponent(catalogCursor)}`;
+    } else {
+      url += '&include_total=1';
+    }
     if (catalogCurrentSearch) {
       url += `&search=${encodeURIComponent(catalogCurrentSearch)}`;
     }
@@ -137,7 +142,7 @@ async function loadCatalog(reset = true, searchQuery = '') {
 
       renderMoviesAppend(data.data || []);
 
-      if (!data.data || data.data.length < catalogLimit) {
+      if (!data.has_more) {
         catalogHasMore = false;
         if (btn) btn.classList.add('hidden');
       } else {
@@ -145,9 +150,11 @@ async function loadCatalog(reset = true, searchQuery = '') {
         if (btn) btn.classList.remove('hidden');
       }
 
-      catalogOffset += (data.data?.length || 0);
-      
-      document.getElementById('movie-count').textContent = data.total || 0;
+      catalogCursor = data.next_cursor;
+
+      if (data.total !== null && data.total !== undefined) {
+        document.getElementById('movie-count').textContent = data.total;
+      }
       
       if (catalogCurrentSearch && reset) {
         grid.insertAdjacentHTML('afterbegin', `
@@ -997,6 +1004,53 @@ function load3DGraphFromUI() {
   load3DGraph(customerId, depth);
 }
 
+function render3DStats(stats) {
+  document.getElementById('graph-stats').innerHTML = `
+      <div class="bg-zinc-950/50 border border-zinc-800 rounded-2xl p-4">
+        <div class="text-[10px] uppercase tracking-wider text-zinc-500">Nós</div>
+        <div class="text-2xl font-bold text-white">${stats.total_nodes}</div>
+      </div>
+      <div class="bg-zinc-950/50 border border-zinc-800 rounded-2xl p-4">
+        <div class="text-[10px] uppercase tracking-wider text-zinc-500">Conexões</div>
+        <div class="text-2xl font-bold text-white">${stats.total_links}</div>
+      </div>
+      <div class="bg-zinc-950/50 border border-zinc-800 rounded-2xl p-4">
+        <div class="text-[10px] uppercase tracking-wider text-zinc-500">Clientes / Filmes</div>
+        <div class="text-2xl font-bold text-white">${stats.customers} / ${stats.movies}</div>
+      </div>
+    `;
+}
+
+function create3DGraph(container) {
+  container.innerHTML = '';
+  Graph3D = ForceGraph3D()(container)
+    .backgroundColor('rgba(0,0,0,0)')
+    .showNavInfo(false)
+    .nodeLabel(n => `${n.label || n.id}`)
+    .nodeAutoColorBy('group')
+    .nodeVal(n => n.size || 6)
+    .linkWidth(l => (l.value || 1))
+    .linkOpacity(0.45)
+    .linkDirectionalParticles(2)
+    .linkDirectionalParticleSpeed(0.005)
+    .onNodeClick(node => {
+      const distance = 120;
+      const distRatio = 1 + distance / Math.hypot(node.x, node.y, node.z);
+      Graph3D.cameraPosition(
+        { x: node.x * distRatio, y: node.y * distRatio, z: node.z * distRatio },
+        node,
+        900
+      );
+
+      if (node.type === 'movie') {
+        showToast(`🎬 ${node.label}`, 'info');
+      } else if (node.type === 'customer') {
+        showToast(`👤 ${node.label}`, 'info');
+      }
+    });
+  return Graph3D;
+}
+
 async function load3DGraph(customerId, depth = 2) {
   const container = document.getElementById('graph-3d-container');
   const statsContainer = document.getElementById('graph-stats');
@@ -1006,26 +1060,52 @@ async function load3DGraph(customerId, depth = 2) {
   statsContainer.innerHTML = '';
 
   try {
-    const response = await fetch(`${API_BASE_URL}/graph/network/${customerId}?depth=${depth}&limit=50`);
-    if (!response.ok) {
+    // Server-Sent Events: cada nível do BFS é desenhado assim que chega
+    const response = await fetch(`${API_BASE_URL}/graph/network/${customerId}/stream?depth=${depth}&limit=50`);
+    if (!response.ok || !response.body) {
       const raw = await response.text();
-      console.error('❌ /graph/network HTTP Error:', response.status, raw);
+      console.error('❌ /graph/network/stream HTTP Error:', response.status, raw);
       container.innerHTML = `<div class="absolute inset-0 flex items-center justify-center text-red-500">Erro ${response.status}</div>`;
       return;
     }
 
-    const data = await response.json();
+    const nodes = [];
+    const links = [];
+    const stats = { total_nodes: 0, total_links: 0, customers: 0, movies: 0 };
+    let graph = null;
+    let streamError = null;
+
+    await readServerSentEvents(response, (event, data) => {
+      if (event === 'level') {
+        nodes.push(...data.nodes);
+        links.push(...data.links);
+        stats.total_nodes = nodes.length;
+        stats.total_links = links.length;
+        stats.customers = nodes.filter(n => n.type === 'customer').length;
+        stats.movies = stats.total_nodes - stats.customers;
+        if (!graph) graph = create3DGraph(container);
+        graph.graphData({ nodes: [...nodes], links: [...links] });
+        render3DStats(stats);
+      } else if (event === 'done') {
+        render3DStats(data.stats);
+        if (data.stats.truncated && data.stats.truncated.length) {
+          showToast(`Rede grande: exibindo uma amostra (${data.stats.truncated.join(', ')})`, 'info');
+        }
+      } else if (event === 'error') {
+        streamError = data.error;
+      }
+    });
 
-    if (!data.success) {
+    if (streamError && !graph) {
       container.innerHTML =
         `<div class="absolute inset-0 flex items-center justify-center text-red-500 text-center px-6">
           Erro ao carregar grafo<br/>
-          <span class="text-xs text-zinc-400">${data.error || 'Sem detalhes'}</span>
+          <span class="text-xs text-zinc-400">${streamError}</span>
         </div>`;
       return;
     }
 
-    if (!data.nodes || data.nodes.length === 0) {
+    if (nodes.length <= 1) {
       container.innerHTML = `
         <div class="absolute inset-0 flex items-center justify-center text-zinc-400 text-center px-6">
           Nenhum dado para exibir.<br/>
@@ -1035,50 +1115,6 @@ async function load3DGraph(customerId, depth = 2) {
       return;
     }
 
-    const stats = data.stats || { total_nodes: data.nodes.length, total_links: (data.links || []).length, customers: 0, movies: 0 };
-    statsContainer.innerHTML = `
-      <div class="bg-zinc-950/50 border border-zinc-800 rounded-2xl p-4">
-        <div class="text-[10px] uppercase tracking-wider text-zinc-500">Nós</div>
-        <div class="text-2xl font-bold text-white">${stats.total_nodes}</div>
-      </div>
-      <div class="bg-zinc-950/50 border border-zinc-800 rounded-2xl p-4">
-        <div class="text-[10px] uppercase tracking-wider text-zinc-500">Conexões</div>
-        <div class="text-2xl font-bold text-white">${stats.total_links}</div>
-      </div>
-      <div class="bg-zinc-950/50 border border-zinc-800 rounded-2xl p-4">
-        <div class="text-[10px] uppercase tracking-wider text-zinc-500">Clientes / Filmes</div>
-        <div class="text-2xl font-bold text-white">${stats.customers} / ${stats.movies}</div>
-      </div>
-    `;
-
-    container.innerHTML = '';
-    Graph3D = ForceGraph3D()(container)
-      .backgroundColor('rgba(0,0,0,0)')
-      .showNavInfo(false)
-      .nodeLabel(n => `${n.label || n.id}`)
-      .nodeAutoColorBy('group')
-      .nodeVal(n => n.size || 6)
-      .linkWidth(l => (l.value || 1))
-      .linkOpacity(0.45)
-      .linkDirectionalParticles(2)
-      .linkDirectionalParticleSpeed(0.005)
-      .graphData({ nodes: data.nodes, links: data.links || [] })
-      .onNodeClick(node => {
-        const distance = 120;
-        const distRatio = 1 + distance / Math.hypot(node.x, node.y, node.z);
-        Graph3D.cameraPosition(
-          { x: node.x * distRatio, y: node.y * distRatio, z: node.z * distRatio },
-          node,
-          900
-        );
-
-        if (node.type === 'movie') {
-          showToast(`🎬 ${node.label}`, 'info');
-        } else if (node.type === 'customer') {
-          showToast(`👤 ${node.label}`, 'info');
-        }
-      });
-
     setTimeout(() => {
       try {
         Graph3D.zoomToFit(900, 60);
@@ -1114,44 +1150,79 @@ async function handleChatSubmit(e) {
   input.value = '';
 
   const typingId = addTypingBubble();
+  let botText = null;
 
   try {
     const payload = { message: msg };
     if (currentCustomerId) payload.customer_id = currentCustomerId;
 
-    const response = await fetch(`${API_BASE_URL}/chat`, {
+    // Server-Sent Events: cards chegam antes do texto, texto chega token a token
+    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(payload)
     });
 
-    if (!response.ok) {
+    if (!response.ok || !response.body) {
       const raw = await response.text();
-      console.error('❌ /chat HTTP Error:', response.status, raw);
+      console.error('❌ /chat/stream HTTP Error:', response.status, raw);
       removeTypingBubble(typingId);
       addChatMessage('bot', `Ops… minha claquete caiu 😅 (Erro ${response.status}).`);
       return;
     }
 
-    const data = await response.json();
-    removeTypingBubble(typingId);
-
-    if (data.success) {
-      addChatMessage('bot', data.response || 'Sem resposta');
-
-      if (Array.isArray(data.movie_cards) && data.movie_cards.length > 0) {
-        addMovieCardsToChat(data.movie_cards, !!data.graph_used);
+    await readServerSentEvents(response, (event, data) => {
+      if (event === 'cards') {
+        if (Array.isArray(data.movie_cards) && data.movie_cards.length > 0) {
+          addMovieCardsToChat(data.movie_cards, !!data.graph_used);
+        }
+      } else if (event === 'token') {
+        if (!botText) {
+          removeTypingBubble(typingId);
+          botText = addChatMessage('bot', '');
+        }
+        botText.textContent += data.text;
+      } else if (event === 'done') {
+        removeTypingBubble(typingId);
+        if (!botText) addChatMessage('bot', data.response || 'Sem resposta');
+      } else if (event === 'error') {
+        removeTypingBubble(typingId);
+        addChatMessage('bot', `Hmm… deu ruim: ${data.error || 'sem detalhes'}`);
       }
-    } else {
-      addChatMessage('bot', `Hmm… deu ruim: ${data.error || 'sem detalhes'}`);
-    }
+    });
   } catch (error) {
-    console.error('❌ /chat exception:', error);
+    console.error('❌ /chat/stream exception:', error);
     removeTypingBubble(typingId);
     addChatMessage('bot', 'Falhei em falar com o servidor. Tenta de novo em alguns segundos 🙏');
   }
 }
 
+async function readServerSentEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) >= 0) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = 'message';
+      const dataLines = [];
+      block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+      });
+      if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+    }
+  }
+}
+
 function addChatMessage(role, text) {
   const container = document.getElementById('chat-messages');
   const wrap = document.createElement('div');
@@ -1167,6 +1238,7 @@ function addChatMessage(role, text) {
   container.appendChild(wrap);
   container.scrollTop = container.scrollHeight;
   lucide.createIcons();
+  return wrap.querySelector('p');
 }
 
 function addTypingBubble() {
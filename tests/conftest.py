@@ -0,0 +1,100 @@
+"""
+Ambiente dos testes: GenAI em modo stub e banco local SQLite (local_db.py),
+definidos antes do import dos módulos do app (eles leem o ambiente no import)
+"""
+
+from contextlib import contextmanager
+import tempfile
+import sys
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix='cinegen-tests-')
+os.environ.setdefault('GENAI_STUB', '1')
+os.environ.setdefault('DB_BACKEND', 'sqlite')
+os.environ.setdefault('DB_SQLITE_PATH', os.path.join(_tmp, 'local.db'))
+os.environ.setdefault('EMBED_CACHE_PATH', '')
+os.environ.setdefault('MOVIE_CATALOG_PATH', os.path.join(_tmp, 'movie_catalog.npz'))
+
+from local_db import create_pool  # noqa: E402
+
+# Catálogo pequeno e fixo: ratings distintos deixam a ordem dos rankings sem empate
+MOVIES = [(m, f'Filme {m}', f'Sinopse do filme {m}', '{"Dramas": 1}', 5.0 + m / 10, 2000 + m) for m in range(1, 10)]
+CUSTOMERS = [(c, f'Nome{c}', f'Sobrenome{c}', f'c{c}@exemplo.com') for c in range(1, 8)]
+WATCHED = [
+    (1, 1), (1, 2), (1, 3),
+    (2, 1), (2, 2), (2, 4), (2, 5),
+    (3, 2), (3, 3), (3, 5), (3, 6),
+    (4, 1), (4, 6), (4, 7),
+    (5, 4), (5, 8),
+    (6, 3), (6, 5), (6, 7), (6, 9),
+    (7, 9),
+]
+
+
+def seed(pool, movies=MOVIES, customers=CUSTOMERS, watched=WATCHED):
+    conn = pool.acquire()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO MOVIES (MOVIE_ID, TITLE, SUMMARY, GENRES, RATING, YEAR)
+            VALUES (:movie_id, :title, :summary, :genres, :rating, :year)
+        """, [dict(zip(('movie_id', 'title', 'summary', 'genres', 'rating', 'year'), row)) for row in movies])
+        cursor.executemany("""
+            INSERT INTO MOVIES_CUSTOMER (CUST_ID, FIRSTNAME, LASTNAME, EMAIL)
+            VALUES (:cust_id, :first, :last, :email)
+        """, [dict(zip(('cust_id', 'first', 'last', 'email'), row)) for row in customers])
+        cursor.executemany("""
+            INSERT INTO WATCHED_MOVIE (PROMO_CUST_ID, MOVIE_ID, DAY_ID, RATING_GIVEN)
+            VALUES (:cust_id, :movie_id, SYSDATE, NULL)
+        """, [{'cust_id': c, 'movie_id': m} for c, m in watched])
+        conn.commit()
+    finally:
+        pool.release(conn)
+
+
+@pytest.fixture
+def local_pool(tmp_path):
+    """Banco SQLite novo por teste, com o catálogo fixo acima"""
+    pool = create_pool(str(tmp_path / 'test.db'), min=1, max=4)
+    seed(pool)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def local_cursor(local_pool):
+    conn = local_pool.acquire()
+    yield conn.cursor()
+    local_pool.release(conn)
+
+
+class LocalConnections:
+    """get_db_connection sobre o pool do teste; wrappers[-1], se houver, embrulha a conexão entregue"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.wrappers = []
+
+    @contextmanager
+    def __call__(self):
+        conn = self.pool.acquire()
+        try:
+            yield self.wrappers[-1](conn) if self.wrappers else conn
+        finally:
+            self.pool.release(conn)
+
+
+@pytest.fixture
+def connect(request, local_pool, monkeypatch):
+    """
+    Troca o get_db_connection do módulo alvo pelo pool do teste. O módulo vem por
+    parametrização indireta: pytest.mark.parametrize('connect', [modulo], indirect=True)
+    """
+    connections = LocalConnections(local_pool)
+    monkeypatch.setattr(request.param, 'get_db_connection', connections)
+    return connections
@@ -0,0 +1,33 @@
+"""Alocação de CUST_ID em blocos contra o banco local"""
+
+import pytest
+
+from customer_ids import CustomerIdAllocator, SequenceMissingError, setup_statements
+
+
+def create_sequence(cursor, block_size):
+    for statement in setup_statements(cursor, block_size=block_size):
+        cursor.execute(statement)
+
+
+def test_blocks_come_from_sequence(local_cursor):
+    create_sequence(local_cursor, block_size=5)
+    allocator = CustomerIdAllocator(block_size=5)
+
+    first = allocator.next_ids(local_cursor, 3)
+    second = allocator.next_ids(local_cursor, 4)
+
+    # CUSTOMERS do conftest vão até 7: a sequence começa depois do MAX atual
+    assert first == [8, 9, 10]
+    assert second == [11, 12, 13, 14]
+    assert allocator.stats()['blocks_reserved'] == 2
+
+
+def test_missing_sequence_fails_instead_of_max_plus_one(local_cursor):
+    allocator = CustomerIdAllocator(sequence='SEM_SEQUENCE', block_size=5)
+
+    with pytest.raises(SequenceMissingError, match='SEM_SEQUENCE'):
+        allocator.next_ids(local_cursor)
+
+    stats = allocator.stats()
+    assert (stats['sequence_missing'], stats['allocated']) == (1, 0)
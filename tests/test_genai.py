@@ -0,0 +1,135 @@
+"""Clientes compartilhados do GenAI contra o stub local (GENAI_STUB=1)"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import oci
+import pytest
+
+import genai
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    genai.reset_clients()
+    yield
+    genai.reset_clients()
+
+
+def test_inference_client_is_shared():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: genai.get_inference_client(), range(32)))
+
+    assert isinstance(clients[0], genai.StubInferenceClient)
+    assert all(client is clients[0] for client in clients)
+
+
+def test_chat_model_is_shared_per_parameters():
+    chat = genai.get_chat_model(0.7, 300)
+
+    assert isinstance(chat, genai.StubChatModel)
+    assert genai.get_chat_model(0.7, 300) is chat
+    assert genai.get_chat_model(0.2, 300) is not chat
+    assert genai.get_chat_model(0.7, 500) is not chat
+
+    genai.get_llm_response('PERGUNTA: oi')
+    genai.get_llm_response('PERGUNTA: tudo bem?')
+    assert chat.calls == 2
+
+
+def test_reset_clients_discards_instances():
+    client = genai.get_inference_client()
+    chat = genai.get_chat_model()
+
+    genai.reset_clients()
+
+    assert genai.get_inference_client() is not client
+    assert genai.get_chat_model() is not chat
+
+
+def test_embeddings_reuse_client():
+    genai.embedding_cache.clear()
+    client = genai.get_inference_client()
+
+    first = genai.embed_or_none('filme de ficção científica')
+    second = genai.generate_embeddings(['um', 'dois', 'três'])
+
+    assert len(first) == genai.EMBED_DIM
+    assert len(second) == 3
+    assert genai.get_inference_client() is client
+    assert client.calls == 2
+
+
+def test_retry_strategy(monkeypatch):
+    monkeypatch.setitem(genai.GENAI_CONFIG, 'retry_attempts', 4)
+    monkeypatch.setitem(genai.GENAI_CONFIG, 'retry_total_seconds', 20)
+    monkeypatch.setitem(genai.GENAI_CONFIG, 'retry_base_sleep', 0.25)
+    monkeypatch.setitem(genai.GENAI_CONFIG, 'retry_max_sleep', 4)
+
+    strategy = genai.build_retry_strategy()
+
+    assert isinstance(strategy, oci.retry.retry.ExponentialBackoffWithFullJitterEqualForThrottlesRetryStrategy)
+    assert strategy.base_sleep_time_seconds == 0.25
+    assert strategy.max_wait_between_calls_seconds == 4
+    checkers = {type(checker).__name__: checker for checker in strategy.checkers.checkers}
+    assert checkers['LimitBasedRetryChecker'].max_attempts == 4
+    assert checkers['TotalTimeExceededRetryChecker'].time_limit_seconds == 20
+    service_errors = checkers['TimeoutConnectionAndServiceErrorRetryChecker']
+    assert service_errors.retry_any_5xx
+    assert 429 in service_errors.service_error_retry_config
+
+
+def test_retry_strategy_disabled(monkeypatch):
+    monkeypatch.setitem(genai.GENAI_CONFIG, 'retry_attempts', 1)
+
+    assert isinstance(genai.build_retry_strategy(), oci.retry.NoneRetryStrategy)
+
+
+def test_concurrency_bound(monkeypatch):
+    limit = 2
+    monkeypatch.setattr(genai, '_concurrency', threading.BoundedSemaphore(limit))
+    client = genai.get_inference_client()
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    embed_text = client.embed_text
+
+    def tracked(detail):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return embed_text(detail)
+
+    monkeypatch.setattr(client, 'embed_text', tracked)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda i: genai._embed_batch([f'texto {i}']), range(16)))
+
+    assert len(results) == 16
+    assert peak[0] == limit
+
+
+def test_concurrency_bound_covers_chat(monkeypatch):
+    monkeypatch.setattr(genai, '_concurrency', threading.BoundedSemaphore(1))
+    chat = genai.get_chat_model()
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    invoke = chat.invoke
+
+    def tracked(messages):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return invoke(messages)
+
+    monkeypatch.setattr(chat, 'invoke', tracked)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        answers = list(executor.map(lambda i: genai.get_llm_response(f'PERGUNTA: {i}'), range(8)))
+
+    assert answers[3] == '[stub] Resposta para: 3'
+    assert peak[0] == 1
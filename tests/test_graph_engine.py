@@ -0,0 +1,94 @@
+"""Paridade do grafo em memória com os statements de recomendação no banco local"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import graph_engine
+import repository
+from graph_engine import CoWatchGraph, rank_neighbors
+from conftest import MOVIES, WATCHED
+
+
+def build_graph(compact_threshold=10_000):
+    graph = CoWatchGraph(compact_threshold=compact_threshold)
+    graph.build([c for c, _ in WATCHED], [m for _, m in WATCHED], {row[0]: row[4] for row in MOVIES})
+    return graph
+
+
+def customers():
+    return sorted({c for c, _ in WATCHED})
+
+
+def statement_ranking(cursor, cust_id, limit=100):
+    """recommendations.sql (equivalente relacional do recommendations.pgql) como [(movie_id, similar_users)]"""
+    return graph_engine.statement_recommendations(cursor, cust_id, limit)
+
+
+def insert_watch(cursor, cust_id, movie_id):
+    repository.execute(cursor, 'watched.insert', {'cust_id': cust_id, 'movie_id': movie_id, 'rating': None})
+    cursor.connection.commit()
+
+
+@pytest.mark.parametrize('cust_id', customers())
+def test_recommend_matches_statement(local_cursor, cust_id):
+    graph = build_graph()
+
+    assert graph.recommend(cust_id, limit=100) == statement_ranking(local_cursor, cust_id)
+    assert dict(graph.recommend(cust_id, limit=100)) == graph_engine.sql_similar_users(local_cursor, cust_id)
+
+
+@pytest.mark.parametrize('cust_id', customers())
+def test_recommend_respects_limit(local_cursor, cust_id):
+    graph = build_graph()
+
+    assert graph.recommend(cust_id, limit=2) == statement_ranking(local_cursor, cust_id, limit=2)
+
+
+@pytest.mark.parametrize('metric', ['jaccard', 'cosine', 'common'])
+@pytest.mark.parametrize('cust_id', customers())
+def test_similar_customers_match_statement(local_cursor, cust_id, metric):
+    graph = build_graph()
+    expected = rank_neighbors(*graph_engine.sql_customer_overlap(local_cursor, cust_id), k=10, metric=metric)
+
+    assert graph.similar_customers(cust_id, k=10, metric=metric) == expected
+
+
+def test_unknown_customer_has_no_recommendations(local_cursor):
+    graph = build_graph()
+
+    assert graph.recommend(999) == statement_ranking(local_cursor, 999) == []
+    assert graph.similar_customers(999) == []
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_delta_edges_keep_parity(local_cursor, compact):
+    graph = build_graph()
+    # Aresta nova para cliente existente, para cliente sem filmes e com filme sem visualizações
+    for cust_id, movie_id in [(1, 4), (7, 1), (5, 1), (4, 9)]:
+        insert_watch(local_cursor, cust_id, movie_id)
+        assert graph.add_watch(cust_id, movie_id)
+    assert not graph.add_watch(1, 4)
+    if compact:
+        graph.compact()
+        assert graph.stats()['pending_delta'] == 0
+
+    for cust_id in customers():
+        assert graph.recommend(cust_id, limit=100) == statement_ranking(local_cursor, cust_id)
+        expected = rank_neighbors(*graph_engine.sql_customer_overlap(local_cursor, cust_id), k=10)
+        assert graph.similar_customers(cust_id, k=10) == expected
+
+
+def test_concurrent_compaction_merges_delta_once():
+    graph = build_graph(compact_threshold=1)
+    pairs = [(c, m) for c in range(1, 8) for m in range(1, 10) if (c, m) not in set(WATCHED)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        added = list(executor.map(lambda pair: graph.add_watch(*pair), pairs))
+        list(executor.map(lambda _: graph.compact(), range(8)))
+
+    stats = graph.stats()
+    assert all(added)
+    assert stats['pending_delta'] == 0
+    assert stats['edges'] == len(WATCHED) + len(pairs)
+    assert graph.watched(1) == set(range(1, 10))
@@ -0,0 +1,51 @@
+"""Refresh do catálogo em memória pela assinatura de MOVIES/WATCHED_MOVIE no banco local"""
+
+import pytest
+
+import movie_catalog
+from movie_catalog import sync
+
+pytestmark = pytest.mark.parametrize('connect', [movie_catalog], indirect=True, ids=['movie_catalog'])
+
+
+@pytest.fixture(autouse=True)
+def snapshot_path(tmp_path, monkeypatch):
+    monkeypatch.setitem(movie_catalog.CATALOG_CONFIG, 'path', str(tmp_path / 'movie_catalog.npz'))
+
+
+def run(connect, sql, binds=None):
+    with connect() as conn:
+        conn.cursor().execute(sql, binds or {})
+        conn.commit()
+
+
+def test_unchanged_tables_keep_catalog(connect):
+    catalog, _ = sync()
+
+    assert sync(catalog) == (catalog, False)
+
+
+@pytest.mark.parametrize('column, value', [('TITLE', 'Outro título'), ('SUMMARY', 'Outra sinopse'),
+                                           ('GENRES', '{"Comedies": 1}'), ('YEAR', 1999)])
+def test_movie_edit_forces_full_reload(connect, column, value):
+    catalog, _ = sync()
+    run(connect, f"UPDATE MOVIES SET {column} = :value WHERE MOVIE_ID = 3", {'value': value})
+
+    refreshed, changed = sync(catalog)
+
+    record = refreshed.hydrate([3])[3]
+    assert changed
+    assert {'TITLE': record['title'], 'SUMMARY': record['summary'], 'GENRES': record['genres'],
+            'YEAR': record['year']}[column] == ({'Comedies': 1} if column == 'GENRES' else value)
+
+
+def test_new_watch_only_refreshes_counts(connect):
+    catalog, _ = sync()
+    run(connect, "INSERT INTO WATCHED_MOVIE (PROMO_CUST_ID, MOVIE_ID, DAY_ID) VALUES (7, 8, SYSDATE)")
+
+    refreshed, changed = sync(catalog)
+
+    assert changed
+    assert refreshed.titles is catalog.titles
+    assert refreshed.counts([8])[8] == catalog.counts([8])[8] + 1
+
@@ -0,0 +1,27 @@
+"""Backend FAISS sem índice em disco: nada de rebuild na requisição"""
+
+import pytest
+
+import vector_index
+
+
+@pytest.fixture
+def missing_index(tmp_path, monkeypatch):
+    monkeypatch.setitem(vector_index.VECTOR_CONFIG, 'faiss_path', str(tmp_path / 'ausente.faiss'))
+    monkeypatch.setattr(vector_index, '_faiss_index', None)
+
+    def rebuild(*args, **kwargs):
+        raise AssertionError('rebuild no caminho da requisição')
+
+    monkeypatch.setattr(vector_index, 'rebuild_faiss_index', rebuild)
+
+
+def test_missing_faiss_file_falls_back_to_oracle_exact(missing_index):
+    assert vector_index.get_faiss_index() is None
+    assert vector_index.resolve_backend('faiss') == 'oracle_exact'
+    assert vector_index.resolve_backend('oracle_index') == 'oracle_index'
+
+
+def test_search_without_faiss_file_fails_fast(missing_index):
+    with pytest.raises(RuntimeError, match='--rebuild'):
+        vector_index.search_vectors([0.1, 0.2], 5, backend='faiss')
@@ -0,0 +1,71 @@
+"""Write-behind contra o banco local: só o que foi gravado segue para on_flush"""
+
+import pytest
+
+import watch_buffer
+from watch_buffer import WatchBuffer
+
+pytestmark = pytest.mark.parametrize('connect', [watch_buffer], indirect=True, ids=['watch_buffer'])
+
+
+class BrokenConnection:
+    """Conexão que perde o lote inteiro e também falha no rollback"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+
+        def executemany(*args, **kwargs):
+            raise RuntimeError('ORA-03113: end-of-file on communication channel')
+
+        cursor.executemany = executemany
+        return cursor
+
+    def rollback(self):
+        raise RuntimeError('ORA-03114: not connected to ORACLE')
+
+
+@pytest.fixture
+def buffer(tmp_path, connect):
+    flushed, rejected = [], []
+    buffer = WatchBuffer(log_path=str(tmp_path / 'watch_events.log'), on_flush=flushed.extend,
+                         on_reject=rejected.extend, config={'fsync': False})
+    buffer.open()
+    buffer.flushed, buffer.rejected = flushed, rejected
+    yield buffer
+    buffer.stop()
+
+
+def pairs(events):
+    return [(event['cust_id'], event['movie_id']) for event in events]
+
+
+def test_flush_reports_only_written_events(buffer):
+    buffer.append(1, 4, rating=4)
+    buffer.append(1, 999)    # filme inexistente: rejeitado pelo FK
+    buffer.append(2, 9)
+
+    assert buffer.flush() == 3
+    assert pairs(buffer.flushed) == [(1, 4), (2, 9)]
+    assert pairs(buffer.rejected) == [(1, 999)]
+    stats = buffer.stats()
+    assert (stats['flushed'], stats['rejected'], stats['pending']) == (2, 1, 0)
+    assert buffer.pending_for(1) == []
+
+
+def test_failed_rollback_keeps_batch_pending(buffer, connect):
+    buffer.append(1, 4)
+    connect.wrappers.append(BrokenConnection)
+
+    with pytest.raises(RuntimeError, match='ORA-03113'):
+        buffer.flush()
+
+    assert buffer.flushed == [] and buffer.rejected == []
+    assert buffer.stats()['pending'] == 1
+    assert pairs(buffer.pending_for(1)) == [(1, 4)]
+
+    connect.wrappers.clear()
+    assert buffer.flush() == 1
+    assert pairs(buffer.flushed) == [(1, 4)]
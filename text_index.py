@@ -0,0 +1,307 @@
+"""
+CineGen AI - Índice invertido para busca textual em MOVIES
+✅ Tokenização com folding de acentos (ação == acao) e minúsculas, PT/EN
+✅ BM25 com título pesando mais que a sinopse (BM25F simplificado)
+✅ Prefixo no último termo ("matr" encontra "matrix") para busca enquanto digita
+✅ Custo da busca proporcional às listas de postings dos termos, não ao catálogo
+✅ Refresh incremental de filmes novos ou editados (ORA_ROWSCN) + rebuild completo periódico
+
+Uso:
+    python text_index.py "amor em paris"     # busca no console
+"""
+
+from collections import Counter
+import unicodedata
+import threading
+import argparse
+import bisect
+import math
+import time
+import re
+import os
+
+from db import get_db_connection
+import repository
+
+TEXT_INDEX_CONFIG = {
+    # 'memory' usa este índice; 'like' mantém o UPPER(...) LIKE '%q%'
+    'backend': os.getenv('TEXT_SEARCH_BACKEND', 'memory'),
+    'title_weight': float(os.getenv('TEXT_INDEX_TITLE_WEIGHT', 3.0)),
+    'k1': float(os.getenv('TEXT_INDEX_BM25_K1', 1.2)),
+    'b': float(os.getenv('TEXT_INDEX_BM25_B', 0.75)),
+    'max_prefix_expansions': int(os.getenv('TEXT_INDEX_MAX_PREFIX_EXPANSIONS', 50)),
+    'max_results': int(os.getenv('TEXT_INDEX_MAX_RESULTS', 1000)),
+    'refresh_seconds': int(os.getenv('TEXT_INDEX_REFRESH_SECONDS', 300)),
+    'full_refresh_seconds': int(os.getenv('TEXT_INDEX_FULL_REFRESH_SECONDS', 86400)),
+}
+
+# Só saem da consulta quando sobra algum termo útil (buscar "the" ainda funciona)
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de da do das dos em na no nas nos por para com sem e ou que se ao aos
+the an and or of in on at to for with by from is are was be it its his her their this that
+""".split())
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold(text):
+    """Minúsculas e sem acentos: 'Coração' -> 'coracao'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+class TextIndex:
+
+    def __init__(self, title_weight=None, k1=None, b=None):
+        self.title_weight = title_weight or TEXT_INDEX_CONFIG['title_weight']
+        self.k1 = k1 or TEXT_INDEX_CONFIG['k1']
+        self.b = b if b is not None else TEXT_INDEX_CONFIG['b']
+        self._postings = {}      # termo -> {movie_id: tf ponderado}
+        self._doc_terms = {}     # movie_id -> Counter (para remover/atualizar)
+        self._doc_length = {}
+        self._total_length = 0.0
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._lock = threading.RLock()
+        self.max_movie_id = 0
+        self.max_scn = 0         # maior ORA_ROWSCN já indexado
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    # ---------- escrita ----------
+
+    def _weighted_terms(self, title, summary):
+        terms = Counter()
+        for token in tokenize(title):
+            terms[token] += self.title_weight
+        for token in tokenize(summary):
+            terms[token] += 1.0
+        return terms
+
+    def remove(self, movie_id):
+        with self._lock:
+            terms = self._doc_terms.pop(movie_id, None)
+            if terms is None:
+                return
+            for term in terms:
+                postings = self._postings[term]
+                del postings[movie_id]
+                if not postings:
+                    del self._postings[term]
+                    self._vocabulary_dirty = True
+            self._total_length -= self._doc_length.pop(movie_id)
+
+    def upsert(self, movie_id, title, summary):
+        terms = self._weighted_terms(title, summary)
+        with self._lock:
+            self.remove(movie_id)
+            for term, tf in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._vocabulary_dirty = True
+                postings[movie_id] = tf
+            self._doc_terms[movie_id] = terms
+            length = sum(terms.values())
+            self._doc_length[movie_id] = length
+            self._total_length += length
+            self.max_movie_id = max(self.max_movie_id, int(movie_id))
+
+    def load_rows(self, rows):
+        """rows: (MOVIE_ID, TITLE, SUMMARY[, ORA_ROWSCN]); filme já indexado é substituído"""
+        loaded = 0
+        for movie_id, title, summary, *scn in rows:
+            if hasattr(summary, 'read'):
+                summary = summary.read()
+            self.upsert(movie_id, title, summary)
+            if scn:
+                self.max_scn = max(self.max_scn, int(scn[0]))
+            loaded += 1
+        return loaded
+
+    # ---------- leitura ----------
+
+    def _expand(self, token):
+        """Termos do vocabulário que começam com o token (bisect no vocabulário ordenado)"""
+        with self._lock:
+            if self._vocabulary_dirty:
+                self._vocabulary = sorted(self._postings)
+                self._vocabulary_dirty = False
+            vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, token)
+        expansions = []
+        for term in vocabulary[start:start + TEXT_INDEX_CONFIG['max_prefix_expansions']]:
+            if not term.startswith(token):
+                break
+            expansions.append(term)
+        return expansions
+
+    def query_terms(self, query):
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        useful = [t for t in tokens if t not in STOPWORDS]
+        terms = [(t, 1.0) for t in (useful or tokens)]
+        last = tokens[-1]
+        if last in (useful or tokens) and len(last) >= 2:
+            # Prefixos pesam menos que o termo exato
+            terms += [(term, 0.5) for term in self._expand(last) if term != last]
+        return terms
+
+    def search(self, query, limit=None):
+        """[(movie_id, score)] por BM25 decrescente"""
+        limit = limit or TEXT_INDEX_CONFIG['max_results']
+        terms = self.query_terms(query)
+        if not terms:
+            return []
+
+        scores = {}
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+            for term, weight in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for movie_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_length[movie_id] / avg_length)
+                    scores[movie_id] = scores.get(movie_id, 0.0) + weight * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(movie_id, round(score, 4)) for movie_id, score in ranked]
+
+    def stats(self):
+        return {
+            'movies': len(self._doc_terms),
+            'terms': len(self._postings),
+            'postings': sum(len(p) for p in self._postings.values()),
+            'max_movie_id': self.max_movie_id,
+            'max_scn': self.max_scn,
+            'built_at': self.built_at
+        }
+
+
+# ==================== CARGA / REFRESH ====================
+
+_index = None
+_index_lock = threading.Lock()
+_refresh_thread = None
+
+
+def _load(index, after_scn=-1):
+    """
+    Filmes com ORA_ROWSCN acima do último visto: novos e editados. Sem ROWDEPENDENCIES
+    o SCN é do bloco, então vizinhos de bloco voltam junto (reindexados sem custo de
+    correção); exclusões só saem no rebuild completo.
+    """
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        return index.load_rows(repository.execute(cursor, 'text_index.changed', {'after_scn': after_scn}))
+
+
+def rebuild():
+    global _index
+    started = time.perf_counter()
+    index = TextIndex()
+    _load(index)
+    index.built_at = time.time()
+    _index = index
+    print(f"✓ Índice textual: {len(index)} filmes, {len(index._postings)} termos "
+          f"em {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def refresh_changed():
+    """Reindexa os filmes inseridos ou alterados desde o último SCN indexado"""
+    if _index is None:
+        return 0
+    return _load(_index, _index.max_scn)
+
+
+def get_text_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                rebuild()
+        start_refresh_thread()
+    return _index
+
+
+def text_index_stats():
+    return _index.stats() if _index is not None else {'loaded': False}
+
+
+def text_index_enabled():
+    return TEXT_INDEX_CONFIG['backend'] == 'memory'
+
+
+def lexical_search(cursor, query_text, limit=None):
+    """
+    [(movie_id, score)] ranqueado pelo índice BM25; LIKE com TEXT_SEARCH_BACKEND=like
+    ou se o índice falhar. Sem cursor, a conexão só é aberta para o LIKE.
+    """
+    limit = limit or TEXT_INDEX_CONFIG['max_results']
+    if text_index_enabled():
+        try:
+            return get_text_index().search(query_text, limit)
+        except Exception as e:
+            print(f"⚠️  Índice textual indisponível, usando LIKE: {e}")
+    if cursor is None:
+        with get_db_connection() as conn, conn.cursor() as like_cursor:
+            return _search_like(like_cursor, query_text, limit)
+    return _search_like(cursor, query_text, limit)
+
+
+def _search_like(cursor, query_text, limit):
+    rows = repository.fetch_all(cursor, 'movies.search_like', {'query': f'%{query_text}%', 'limit': limit}, rows=limit)
+    return [(row[0], 0.5) for row in rows]
+
+
+def _refresh_loop():
+    last_full = time.time()
+    while True:
+        time.sleep(TEXT_INDEX_CONFIG['refresh_seconds'])
+        try:
+            if time.time() - last_full >= TEXT_INDEX_CONFIG['full_refresh_seconds']:
+                rebuild()
+                last_full = time.time()
+            else:
+                changed = refresh_changed()
+                if changed:
+                    print(f"✓ Índice textual: {changed} filmes novos ou alterados")
+        except Exception as e:
+            print(f"⚠️  Erro no refresh do índice textual: {e}")
+
+
+def start_refresh_thread():
+    global _refresh_thread
+    if _refresh_thread is None and TEXT_INDEX_CONFIG['refresh_seconds'] > 0:
+        _refresh_thread = threading.Thread(target=_refresh_loop, name='text-index-refresh', daemon=True)
+        _refresh_thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Busca textual BM25 sobre MOVIES')
+    parser.add_argument('query')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    index = get_text_index()
+    started = time.perf_counter()
+    hits = index.search(args.query, args.limit)
+    print(f"{len(hits)} resultados em {(time.perf_counter() - started) * 1000:.2f} ms")
+    for movie_id, score in hits:
+        print(f"  {movie_id:>6}  {score:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+CineGen AI - Backends de busca vetorial
+✅ oracle_exact: ORDER BY VECTOR_DISTANCE (varredura exata no Oracle)
+✅ oracle_index: FETCH APPROX FIRST (usa o vector index do Oracle)
+✅ faiss: índice em processo (flat/ivf/hnsw) construído de MOVIE_VECTORS,
+   persistido em disco e carregado via mmap no startup
+
+Todos os backends devolvem [(movie_id, score)] com score = similaridade de
+cosseno; a hidratação dos metadados fica com quem chama (uma única query).
+
+Rebuild do índice FAISS só pela linha de comando (varre MOVIE_VECTORS inteira):
+    python vector_index.py --rebuild --index-type hnsw
+"""
+
+import threading
+import argparse
+import time
+import json
+import os
+
+import numpy as np
+
+from db import SCHEMA, get_db_connection
+import repository
+
+try:
+    import faiss
+except ImportError as e:
+    faiss = None
+    print(f"⚠️  FAISS não disponível, backend 'faiss' desabilitado: {e}")
+
+VECTOR_BACKENDS = ('oracle_exact', 'oracle_index', 'faiss')
+FAISS_INDEX_TYPES = ('flat', 'ivf', 'hnsw')
+
+VECTOR_CONFIG = {
+    'backend': os.getenv('VECTOR_BACKEND', 'oracle_exact'),
+    'faiss_index_type': os.getenv('FAISS_INDEX_TYPE', 'hnsw'),
+    'faiss_path': os.getenv('FAISS_INDEX_PATH', 'cache/movie_vectors.faiss'),
+    'ivf_nlist': int(os.getenv('FAISS_IVF_NLIST', 64)),
+    'ivf_nprobe': int(os.getenv('FAISS_IVF_NPROBE', 8)),
+    'hnsw_m': int(os.getenv('FAISS_HNSW_M', 32)),
+    'hnsw_ef_search': int(os.getenv('FAISS_HNSW_EF_SEARCH', 64)),
+    'target_accuracy': int(os.getenv('VECTOR_TARGET_ACCURACY', 90)),
+}
+
+
+def vector_literal(embedding):
+    return '[' + ','.join(f'{float(x):.7g}' for x in embedding) + ']'
+
+
+def parse_vector(value):
+    """VECTOR vem como array.array (oracledb >= 2.2), LOB ou texto '[...]'"""
+    if hasattr(value, 'read'):
+        value = value.read()
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+# ==================== ORACLE ====================
+
+# A acurácia alvo entra no texto: registrados aqui, junto da configuração
+repository.statement('vectors.exact', f"""
+    SELECT mv.MOVIE_ID,
+           VECTOR_DISTANCE(mv.EMBEDDING, TO_VECTOR(:query_vec), COSINE) as distance
+    FROM {SCHEMA}.MOVIE_VECTORS mv
+    ORDER BY distance ASC
+    FETCH FIRST :top_k ROWS ONLY
+""", rows=50)
+
+repository.statement('vectors.approx', f"""
+    SELECT mv.MOVIE_ID,
+           VECTOR_DISTANCE(mv.EMBEDDING, TO_VECTOR(:query_vec), COSINE) as distance
+    FROM {SCHEMA}.MOVIE_VECTORS mv
+    ORDER BY distance ASC
+    FETCH APPROX FIRST :top_k ROWS ONLY WITH TARGET ACCURACY {VECTOR_CONFIG['target_accuracy']}
+""", rows=50)
+
+
+def _search_oracle(cursor, name, query_embedding, top_k):
+    rows = repository.fetch_all(cursor, name, {'query_vec': vector_literal(query_embedding), 'top_k': top_k},
+                                rows=top_k)
+    return [(row[0], float(1 - float(row[1]))) for row in rows]
+
+
+def search_oracle_exact(cursor, query_embedding, top_k):
+    return _search_oracle(cursor, 'vectors.exact', query_embedding, top_k)
+
+
+def search_oracle_index(cursor, query_embedding, top_k):
+    return _search_oracle(cursor, 'vectors.approx', query_embedding, top_k)
+
+
+# ==================== FAISS ====================
+
+class FaissMovieIndex:
+    """Índice de produto interno sobre vetores normalizados (= cosseno), com MOVIE_ID como id"""
+
+    def __init__(self, index, index_type):
+        self.index = index
+        self.index_type = index_type
+        self.configure()
+
+    @classmethod
+    def build(cls, movie_ids, vectors, index_type='hnsw'):
+        if faiss is None:
+            raise RuntimeError('faiss-cpu não instalado')
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        ids = np.asarray(movie_ids, dtype=np.int64)
+        dim = vectors.shape[1]
+
+        if index_type == 'flat':
+            base = faiss.IndexFlatIP(dim)
+        elif index_type == 'ivf':
+            nlist = max(1, min(VECTOR_CONFIG['ivf_nlist'], len(ids) // 39))
+            base = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            base.train(vectors)
+        elif index_type == 'hnsw':
+            base = faiss.IndexHNSWFlat(dim, VECTOR_CONFIG['hnsw_m'], faiss.METRIC_INNER_PRODUCT)
+        else:
+            raise ValueError(f"Tipo de índice FAISS inválido: {index_type}")
+
+        index = faiss.IndexIDMap2(base)
+        index.add_with_ids(vectors, ids)
+        return cls(index, index_type)
+
+    @classmethod
+    def load(cls, path):
+        if faiss is None:
+            raise RuntimeError('faiss-cpu não instalado')
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception:
+            # Nem todo tipo de índice suporta mmap; cai para leitura normal
+            index = faiss.read_index(path)
+        base = type(faiss.downcast_index(index.index)).__name__
+        index_type = {'IndexFlatIP': 'flat', 'IndexIVFFlat': 'ivf', 'IndexHNSWFlat': 'hnsw'}.get(base, base)
+        return cls(index, index_type)
+
+    def configure(self):
+        base = faiss.downcast_index(self.index.index)
+        if hasattr(base, 'nprobe'):
+            base.nprobe = VECTOR_CONFIG['ivf_nprobe']
+        if hasattr(base, 'hnsw'):
+            base.hnsw.efSearch = VECTOR_CONFIG['hnsw_ef_search']
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+
+    def search(self, query_embedding, top_k):
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(query)
+        scores, ids = self.index.search(query, top_k)
+        return [(int(movie_id), float(score)) for movie_id, score in zip(ids[0], scores[0]) if movie_id != -1]
+
+    def stats(self):
+        return {'type': self.index_type, 'size': int(self.index.ntotal), 'dim': int(self.index.d)}
+
+
+def load_movie_vectors():
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        movie_ids = []
+        vectors = []
+        for movie_id, embedding in repository.execute(cursor, 'vectors.all'):
+            movie_ids.append(movie_id)
+            vectors.append(parse_vector(embedding))
+    return movie_ids, np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+
+_faiss_index = None
+_faiss_lock = threading.Lock()
+_faiss_missing_logged = False
+
+
+def rebuild_faiss_index(index_type=None):
+    global _faiss_index
+    index_type = index_type or VECTOR_CONFIG['faiss_index_type']
+    if index_type not in FAISS_INDEX_TYPES:
+        raise ValueError(f"Tipo de índice FAISS inválido: {index_type}")
+    started = time.perf_counter()
+    movie_ids, vectors = load_movie_vectors()
+    if not movie_ids:
+        raise RuntimeError('MOVIE_VECTORS vazio; rode backfill_embeddings.py primeiro')
+    index = FaissMovieIndex.build(movie_ids, vectors, index_type)
+    index.save(VECTOR_CONFIG['faiss_path'])
+    with _faiss_lock:
+        _faiss_index = index
+    print(f"✓ Índice FAISS ({index_type}) com {len(movie_ids)} vetores em {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def get_faiss_index():
+    """Índice do processo (mmap do arquivo salvo) ou None se ainda não foi construído pela CLI"""
+    global _faiss_index, _faiss_missing_logged
+    if _faiss_index is None:
+        with _faiss_lock:
+            if _faiss_index is None:
+                if not os.path.exists(VECTOR_CONFIG['faiss_path']):
+                    # Nunca constrói no caminho da requisição: varrer MOVIE_VECTORS é trabalho da CLI
+                    if not _faiss_missing_logged:
+                        _faiss_missing_logged = True
+                        print(f"⚠️  Índice FAISS ausente em {VECTOR_CONFIG['faiss_path']}, usando oracle_exact; "
+                              f"rode python vector_index.py --rebuild")
+                    return None
+                _faiss_index = FaissMovieIndex.load(VECTOR_CONFIG['faiss_path'])
+                print(f"✓ Índice FAISS carregado de {VECTOR_CONFIG['faiss_path']}")
+    return _faiss_index
+
+
+def resolve_backend(backend=None):
+    """Backend que vai atender: 'faiss' sem índice em disco vira 'oracle_exact'"""
+    backend = backend or VECTOR_CONFIG['backend']
+    if backend == 'faiss' and get_faiss_index() is None:
+        return 'oracle_exact'
+    return backend
+
+
+# ==================== API ====================
+
+def search_vectors(query_embedding, top_k, backend=None, cursor=None):
+    backend = backend or VECTOR_CONFIG['backend']
+    if backend == 'faiss':
+        index = get_faiss_index()
+        if index is None:
+            raise RuntimeError('Índice FAISS ausente; rode python vector_index.py --rebuild')
+        return index.search(query_embedding, top_k)
+    if backend == 'oracle_index':
+        return search_oracle_index(cursor, query_embedding, top_k)
+    if backend == 'oracle_exact':
+        return search_oracle_exact(cursor, query_embedding, top_k)
+    raise ValueError(f"Backend vetorial inválido: {backend}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice FAISS sobre MOVIE_VECTORS')
+    parser.add_argument('--rebuild', action='store_true', help='reconstrói o índice a partir de MOVIE_VECTORS')
+    parser.add_argument('--index-type', choices=FAISS_INDEX_TYPES, default=VECTOR_CONFIG['faiss_index_type'])
+    args = parser.parse_args()
+
+    index = rebuild_faiss_index(args.index_type) if args.rebuild else get_faiss_index()
+    if index is not None:
+        print(index.stats())
+
+
+if __name__ == '__main__':
+    main()
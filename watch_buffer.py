@@ -0,0 +1,288 @@
+"""
+CineGen AI - Write-behind de visualizações (opcional, WATCH_WRITE_BEHIND=1)
+✅ mark_as_watched só anexa o evento num log local (NDJSON append-only + fsync)
+   e responde; nada de commit no banco por clique
+✅ Worker em background grava os eventos pendentes com o mesmo MERGE em lote
+   da ingestão (watch_ingest.write_batch)
+✅ Atraso limitado: flush a cada flush_interval_ms ou quando o lote enche;
+   acima de max_pending a escrita espera o worker (backpressure)
+✅ Checkpoint do último seq gravado: no restart os eventos após o checkpoint
+   são reaplicados (MERGE é idempotente, então reaplicar é seguro)
+✅ on_flush só recebe os eventos que o banco aceitou; os rejeitados (batcherrors)
+   vão para on_reject, para quem mostrou o evento pendente desfazer o que montou
+"""
+
+from collections import deque
+from datetime import datetime
+import threading
+import atexit
+import json
+import time
+import os
+
+from db import get_db_connection
+from watch_ingest import IngestReport, write_batch
+
+WRITE_BEHIND_CONFIG = {
+    'enabled': os.getenv('WATCH_WRITE_BEHIND', '0') == '1',
+    'log_path': os.getenv('WATCH_LOG_PATH', os.path.join('cache', 'watch_events.log')),
+    'fsync': os.getenv('WATCH_LOG_FSYNC', '1') == '1',
+    'flush_interval_ms': int(os.getenv('WATCH_FLUSH_INTERVAL_MS', 200)),
+    'max_batch': int(os.getenv('WATCH_FLUSH_MAX_BATCH', 1000)),
+    'max_pending': int(os.getenv('WATCH_MAX_PENDING', 50000)),
+    'retry_seconds': float(os.getenv('WATCH_FLUSH_RETRY_SECONDS', 2)),
+    # Log é truncado quando tudo foi gravado e ele passou deste tamanho
+    'rotate_bytes': int(os.getenv('WATCH_LOG_ROTATE_BYTES', 16 * 1024 * 1024)),
+}
+
+
+def _encode(seq, event):
+    return json.dumps({**event, 'seq': seq, 'day_id': event['day_id'].isoformat()}) + '\n'
+
+
+def _decode(line):
+    record = json.loads(line)
+    seq = record.pop('seq')
+    record['day_id'] = datetime.fromisoformat(record['day_id'])
+    return seq, record
+
+
+class WatchBuffer:
+
+    def __init__(self, log_path=None, on_flush=None, on_reject=None, config=None):
+        self.config = {**WRITE_BEHIND_CONFIG, **(config or {})}
+        self.log_path = log_path or self.config['log_path']
+        self.checkpoint_path = f'{self.log_path}.checkpoint'
+        self.on_flush = on_flush
+        self.on_reject = on_reject
+        self._pending = deque()          # (seq, evento) ainda não gravados
+        self._by_customer = {}           # cust_id -> {movie_id: evento} pendentes (overlay do perfil)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._stopped = False
+        self._next_seq = 1
+        self._flushed_seq = 0
+        self._log = None
+        self.metrics = {'appended': 0, 'flushed': 0, 'rejected': 0, 'flushes': 0, 'failures': 0,
+                        'replayed': 0, 'backpressure_waits': 0}
+        self.last_error = None
+
+    # ---------- log / checkpoint ----------
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                return int(json.load(f)['flushed_seq'])
+        except FileNotFoundError:
+            return 0
+
+    def _save_checkpoint(self, seq):
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'flushed_seq': seq}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def open(self):
+        """Abre o log, reaplica o que ficou depois do checkpoint e devolve esses eventos"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        self._flushed_seq = self._load_checkpoint()
+        replayed = []
+        last_seq = self._flushed_seq
+        torn_tail = False
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding='utf-8') as f:
+                for line in f:
+                    torn_tail = not line.endswith('\n')
+                    try:
+                        seq, event = _decode(line)
+                    except (ValueError, KeyError):
+                        # Linha cortada por um crash no meio do append
+                        continue
+                    last_seq = max(last_seq, seq)
+                    if seq > self._flushed_seq:
+                        replayed.append((seq, event))
+        self._next_seq = last_seq + 1
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        if torn_tail:
+            # Fecha a linha cortada para o próximo append não colar nela
+            self._log.write('\n')
+
+        with self._cond:
+            for seq, event in replayed:
+                self._track(seq, event)
+        self.metrics['replayed'] = len(replayed)
+        if replayed:
+            print(f"↻ Write-behind: {len(replayed)} visualizações pendentes reaplicadas do log")
+        return [event for _, event in replayed]
+
+    def _track(self, seq, event):
+        self._pending.append((seq, event))
+        self._by_customer.setdefault(event['cust_id'], {})[event['movie_id']] = event
+
+    # ---------- escrita ----------
+
+    def append(self, cust_id, movie_id, rating=None):
+        """Grava o evento no log local e o enfileira; volta antes do banco"""
+        event = {'cust_id': int(cust_id), 'movie_id': int(movie_id),
+                 'rating': float(rating) if rating is not None else None,
+                 'day_id': datetime.now().replace(microsecond=0)}
+        with self._cond:
+            while len(self._pending) >= self.config['max_pending'] and not self._stopped:
+                self.metrics['backpressure_waits'] += 1
+                self._cond.notify_all()
+                self._cond.wait(timeout=1.0)
+            seq = self._next_seq
+            self._next_seq += 1
+            self._log.write(_encode(seq, event))
+            self._log.flush()
+            if self.config['fsync']:
+                os.fsync(self._log.fileno())
+            self._track(seq, event)
+            self.metrics['appended'] += 1
+            if len(self._pending) >= self.config['max_batch']:
+                self._cond.notify_all()
+        return event
+
+    def pending_for(self, cust_id):
+        """Eventos ainda não gravados do cliente (mais recente primeiro)"""
+        with self._cond:
+            events = list(self._by_customer.get(int(cust_id), {}).values())
+        return sorted(events, key=lambda e: e['day_id'], reverse=True)
+
+    def flush(self):
+        """Grava um lote pendente; devolve quantos eventos saíram da fila (exceção se o lote falhar)"""
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending)[:self.config['max_batch']]
+            if not batch:
+                return 0
+
+            report = IngestReport()
+            with get_db_connection() as conn, conn.cursor() as cursor:
+                written = write_batch(conn, cursor, batch, report)
+            if report.failed_batches:
+                # Nada foi gravado: o lote continua na fila (e no log) para a próxima tentativa
+                raise RuntimeError(report.errors[-1]['error'])
+
+            # Rejeitadas pelo banco (cliente/filme inexistente) não voltam para a fila
+            for error in report.errors:
+                print(f"⚠️  Write-behind: evento seq {error['line']} rejeitado: {error['error']}")
+            self.metrics['rejected'] += report.failed
+            self.metrics['flushed'] += len(written)
+            self.metrics['flushes'] += 1
+
+            last_seq = batch[-1][0]
+            self._save_checkpoint(last_seq)
+            with self._cond:
+                for _ in batch:
+                    seq, event = self._pending.popleft()
+                    movies = self._by_customer.get(event['cust_id'], {})
+                    if movies.get(event['movie_id']) is event:
+                        del movies[event['movie_id']]
+                        if not movies:
+                            del self._by_customer[event['cust_id']]
+                self._flushed_seq = last_seq
+                self._cond.notify_all()
+                self._maybe_rotate()
+
+        accepted = {id(event) for event in written}
+        rejected = [event for _, event in batch if id(event) not in accepted]
+        for callback, events in ((self.on_flush, written), (self.on_reject, rejected)):
+            if callback is None or not events:
+                continue
+            try:
+                callback(events)
+            except Exception as e:
+                print(f"⚠️  Write-behind: erro no pós-flush: {e}")
+        return len(batch)
+
+    def _maybe_rotate(self):
+        if self._pending or self._log.tell() < self.config['rotate_bytes']:
+            return
+        self._log.close()
+        self._log = open(self.log_path, 'w', encoding='utf-8')
+
+    # ---------- worker ----------
+
+    def _run(self):
+        interval = self.config['flush_interval_ms'] / 1000
+        while True:
+            with self._cond:
+                if not self._pending:
+                    if self._stopped:
+                        return
+                    self._cond.wait(timeout=interval)
+                    continue
+                # Atraso limitado: espera o lote encher ou o intervalo passar
+                if len(self._pending) < self.config['max_batch'] and not self._stopped:
+                    self._cond.wait(timeout=interval)
+            try:
+                self.flush()
+            except Exception as e:
+                self.metrics['failures'] += 1
+                self.last_error = str(e)
+                print(f"⚠️  Write-behind: flush falhou, nova tentativa em {self.config['retry_seconds']}s: {e}")
+                if self._stopped:
+                    # Desligando com o banco fora: os eventos ficam no log para o próximo start
+                    return
+                time.sleep(self.config['retry_seconds'])
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='watch-write-behind', daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout=10):
+        """Para o worker depois de tentar esvaziar a fila"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        if self._log is not None:
+            self._log.close()
+
+    def stats(self):
+        with self._cond:
+            oldest = self._pending[0][1]['day_id'] if self._pending else None
+            pending = len(self._pending)
+        return {
+            **self.metrics,
+            'pending': pending,
+            'lag_seconds': round((datetime.now() - oldest).total_seconds(), 1) if oldest else 0.0,
+            'flushed_seq': self._flushed_seq,
+            'last_error': self.last_error
+        }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return WRITE_BEHIND_CONFIG['enabled']
+
+
+def get_watch_buffer(on_flush=None, on_replay=None, on_reject=None):
+    """Buffer do processo: abre o log, reaplica pendências (on_replay) e sobe o worker"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = WatchBuffer(on_flush=on_flush, on_reject=on_reject)
+                replayed = buffer.open()
+                if replayed and on_replay is not None:
+                    on_replay(replayed)
+                buffer.start()
+                atexit.register(buffer.stop)
+                _buffer = buffer
+    return _buffer
+
+
+def pending_watches(cust_id):
+    return _buffer.pending_for(cust_id) if _buffer is not None else []
+
+
+def watch_buffer_stats():
+    return _buffer.stats() if _buffer is not None else {'enabled': write_behind_enabled()}
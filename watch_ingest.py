@@ -0,0 +1,252 @@
+"""
+CineGen AI - Ingestão em lote de visualizações (WATCHED_MOVIE)
+✅ Lê NDJSON ou CSV em streaming: (customer_id, movie_id, rating, timestamp)
+✅ Upsert com MERGE + executemany (array binds): um round trip e um commit por lote
+✅ batcherrors: uma linha inválida (cliente/filme inexistente) não derruba o lote,
+   vira um erro com o número da linha de entrada
+✅ Erro do lote inteiro (ex.: conexão) é reportado com o intervalo de linhas e a
+   ingestão segue para o próximo lote
+
+Uso:
+    python watch_ingest.py historico.ndjson
+    python watch_ingest.py historico.csv --batch-size 5000
+    cat eventos.ndjson | python watch_ingest.py - --format ndjson
+
+O CLI grava direto no banco: um servidor já no ar só enxerga as linhas novas
+quando recarrega o grafo em memória e os caches expiram. Para que o servidor
+atualize tudo na hora, envie para POST /api/watch/bulk.
+"""
+
+from datetime import datetime, timezone
+import argparse
+import json
+import time
+import csv
+import sys
+import os
+
+import oracledb
+
+from db import get_db_connection
+import repository
+
+INGEST_CONFIG = {
+    'batch_size': int(os.getenv('WATCH_INGEST_BATCH_SIZE', 1000)),
+    'max_reported_errors': int(os.getenv('WATCH_INGEST_MAX_ERRORS', 100)),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+# Nomes aceitos para cada campo (CSV com cabeçalho ou chaves do JSON)
+FIELD_ALIASES = {
+    'cust_id': ('customer_id', 'cust_id', 'promo_cust_id', 'customer'),
+    'movie_id': ('movie_id', 'movie'),
+    'rating': ('rating', 'rating_given'),
+    'day_id': ('timestamp', 'watched_at', 'day_id', 'ts'),
+}
+
+
+# ==================== PARSE ====================
+
+def _field(raw, name):
+    for alias in FIELD_ALIASES[name]:
+        value = raw.get(alias)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def parse_timestamp(value):
+    """ISO 8601 ('2024-05-01T20:15:00Z', '2024-05-01') ou epoch em segundos -> datetime sem fuso (UTC)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '', 1).isdigit()):
+        return datetime.fromtimestamp(float(value), tz=timezone.utc).replace(tzinfo=None)
+    parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def normalize_event(raw):
+    """dict de entrada -> binds do MERGE; ValueError com a causa quando inválido"""
+    if not isinstance(raw, dict):
+        raise ValueError('evento deve ser um objeto')
+    cust_id, movie_id = _field(raw, 'cust_id'), _field(raw, 'movie_id')
+    if cust_id is None or movie_id is None:
+        raise ValueError('customer_id e movie_id são obrigatórios')
+    rating = _field(raw, 'rating')
+    try:
+        event = {
+            'cust_id': int(cust_id),
+            'movie_id': int(movie_id),
+            'rating': float(rating) if rating is not None else None,
+        }
+    except (TypeError, ValueError):
+        raise ValueError('customer_id/movie_id devem ser inteiros e rating numérico')
+    try:
+        event['day_id'] = parse_timestamp(_field(raw, 'day_id'))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValueError(f"timestamp inválido: {_field(raw, 'day_id')}")
+    return event
+
+
+def iter_events(lines, fmt='ndjson'):
+    """
+    Gera (nº da linha, evento normalizado, erro) a partir de um iterável de linhas de texto.
+    Linhas em branco são ignoradas; no CSV a linha 1 é o cabeçalho.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            line_no = reader.line_num
+            try:
+                yield line_no, normalize_event({(k or '').strip().lower(): (v or '').strip() for k, v in row.items()}), None
+            except ValueError as e:
+                yield line_no, None, str(e)
+        return
+
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, normalize_event(json.loads(line)), None
+        except ValueError as e:
+            # json.JSONDecodeError também é ValueError
+            yield line_no, None, str(e)
+
+
+def detect_format(name=None, content_type=None):
+    if content_type and 'csv' in content_type:
+        return 'csv'
+    if name and name.lower().endswith('.csv'):
+        return 'csv'
+    return 'ndjson'
+
+
+# ==================== ESCRITA ====================
+
+class IngestReport:
+
+    def __init__(self, max_errors=None):
+        self.max_errors = max_errors or INGEST_CONFIG['max_reported_errors']
+        self.received = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, **details):
+        self.failed += details.pop('count', 1)
+        if len(self.errors) < self.max_errors:
+            self.errors.append(details)
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'received': self.received,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'failed_batches': self.failed_batches,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'elapsed_seconds': round(elapsed, 3),
+            'events_per_second': round(self.written / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+def write_batch(conn, cursor, batch, report):
+    """
+    MERGE de um lote [(nº da linha, evento)]; devolve os eventos gravados.
+    Linhas rejeitadas pelo banco entram no relatório com o erro do Oracle.
+    """
+    report.batches += 1
+    try:
+        # Tipos fixos: um None na primeira linha não pode decidir o tipo do bind
+        cursor.setinputsizes(rating=oracledb.DB_TYPE_NUMBER, day_id=oracledb.DB_TYPE_DATE)
+        repository.execute_many(cursor, 'watched.merge', [event for _, event in batch], batcherrors=True)
+        rejected = {}
+        for error in cursor.getbatcherrors():
+            rejected[error.offset] = error.message
+        conn.commit()
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception as rollback_error:
+            # Conexão perdida: o pool descarta a sessão; o erro que importa é o do lote
+            print(f"⚠️  Rollback do lote {report.batches} falhou: {rollback_error}")
+        report.failed_batches += 1
+        report.error(batch=report.batches, lines=[batch[0][0], batch[-1][0]], error=str(e), count=len(batch))
+        print(f"❌ Lote {report.batches} (linhas {batch[0][0]}-{batch[-1][0]}) falhou: {e}")
+        return []
+
+    written = []
+    for offset, (line_no, event) in enumerate(batch):
+        if offset in rejected:
+            report.error(batch=report.batches, line=line_no, error=rejected[offset])
+        else:
+            written.append(event)
+    report.written += len(written)
+    return written
+
+
+def ingest(events, batch_size=None, on_batch=None, report=None):
+    """
+    Consome iter_events(...) em lotes de batch_size. on_batch(eventos gravados) roda
+    depois de cada commit (o servidor usa para invalidar caches e atualizar o grafo).
+    """
+    batch_size = batch_size or INGEST_CONFIG['batch_size']
+    report = report or IngestReport()
+    batch = []
+
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        def flush():
+            written = write_batch(conn, cursor, batch, report)
+            if written and on_batch is not None:
+                on_batch(written)
+            batch.clear()
+
+        for line_no, event, error in events:
+            report.received += 1
+            if error is not None:
+                report.error(line=line_no, error=error)
+                continue
+            batch.append((line_no, event))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingestão em lote de visualizações em WATCHED_MOVIE')
+    parser.add_argument('path', help="arquivo NDJSON/CSV ou '-' para stdin")
+    parser.add_argument('--format', choices=FORMATS, help='padrão: pela extensão do arquivo (ndjson)')
+    parser.add_argument('--batch-size', type=int, default=INGEST_CONFIG['batch_size'],
+                        help='eventos por executemany + commit')
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(name=args.path)
+    source = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+    try:
+        report = ingest(iter_events(source, fmt), batch_size=args.batch_size).to_dict()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    for error in report['errors']:
+        print(f"  ⚠️  {error}")
+    print(f"{'✓' if not report['failed'] else '⚠️ '} {report['written']} visualizações gravadas, "
+          f"{report['failed']} com erro, {report['batches']} lotes em {report['elapsed_seconds']}s "
+          f"({report['events_per_second']}/s)")
+    raise SystemExit(0 if not report['failed'] else 1)
+
+
+if __name__ == '__main__':
+    main()